@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customerprofile_whatsapp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerprofile',
+            index=models.Index(fields=['phone'], name='customer_phone_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerprofile',
+            index=models.Index(fields=['whatsapp'], name='customer_whatsapp_idx'),
+        ),
+    ]
@@ -80,11 +80,28 @@ class CustomerProfile(models.Model):
     whatsapp = models.CharField(max_length=14, blank=True, null=True)
     full_name = models.CharField(max_length=50, blank=True)
     profile_photo = models.ImageField(upload_to="user/profile_picture/", blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["phone"], name="customer_phone_idx"),
+            models.Index(fields=["whatsapp"], name="customer_whatsapp_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the values as loaded so signal handlers can see what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_value(self, attname, default=None):
+        return getattr(self, "_loaded_values", {}).get(attname, default)
     
     def save(self, *args, **kwargs):
         if not self.profile_uuid:
             self.profile_uuid = uuid.uuid4().hex
         super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
 
     def __str__(self) -> str:
         return f"Customer Profile of {self.user.email}" if self.user else f"{self.full_name}"
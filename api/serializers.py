@@ -33,6 +33,16 @@ class SiteSettingsSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(pic.url)
         return pic.url
 
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    # Pass fields=[...] to serialize only a subset of Meta.fields
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -47,6 +57,14 @@ class CategorySerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(pic.url)
         return pic.url
 
+class CategoryTreeSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Category
+        fields = [
+            "id", "name", "slug", "parent", "icon", "banner_image", "description",
+            "seo_title", "seo_description", "sort_order", "depth",
+        ]
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -83,6 +101,17 @@ class ProductSerializer(serializers.ModelSerializer):
         return pic.url
 
 
+class ProductListSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Product
+        fields = [
+            "id", "uuid", "title", "slug", "sku", "barcode", "product_type", "category", "brand",
+            "short_description", "description_html", "description_json", "price", "discount_price",
+            "compare_at_price", "inventory_quantity", "weight", "dimensions", "seo", "tags", "status",
+            "metadata", "created_at", "updated_at",
+        ]
+
+
 class DeliveryChargeCalculateSerializer(serializers.Serializer):
     district = serializers.CharField()
     upazilla = serializers.CharField(required=False)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import api_welcome_message, SiteSettingsAPIViews, CategoryAPIViews, TagAPIViews, AttributeAPIViews, MainSliderAPIViews, ProductAPIViews, DeliveryChargeCalculate
+from .views import api_welcome_message, SiteSettingsAPIViews, CategoryAPIViews, CategoryTreeAPIViews, TagAPIViews, AttributeAPIViews, MainSliderAPIViews, ProductAPIViews, DeliveryChargeCalculate
 from .order_api import OrderCreateAPIViews
 from rest_framework.routers import DefaultRouter
 
@@ -15,6 +15,7 @@ urlpatterns = [
     path("main-slider/", MainSliderAPIViews.as_view(), name="main_slider_api"),
 
     path("category/", CategoryAPIViews.as_view(), name="category_api"),
+    path("category/tree/", CategoryTreeAPIViews.as_view(), name="category_tree_api"),
     path("tag/", TagAPIViews.as_view(), name="tag_api"),
     
     path("get-delivery-charge", DeliveryChargeCalculate.as_view(), name="delivery_charge_api"),
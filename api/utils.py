@@ -0,0 +1,171 @@
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from catalog.models import CategoryTree, Product, ProductTag
+from catalog.utix import CATEGORY_STATUS, PRODUCT_STATUS
+from .serializers import CategoryTreeSerializer, ProductListSerializer
+import django_filters
+import hashlib
+import json
+
+
+class CategoryTreePayloadCache:
+    # The active category hierarchy as nested JSON, assembled from the in-process
+    # CategoryTree (one query when the tree version moves) and cached per tree version,
+    # site host (banner URLs are absolute) and request options.
+    PAYLOAD_CACHE_KEY = "api:category_tree:{version}:{options}"
+    DEFAULT_FIELDS = ["id", "name", "slug", "parent", "icon", "banner_image", "sort_order", "depth"]
+    MAX_DEPTH = 10
+    TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, request, depth=None, fields=None, root=None):
+        self.request = request
+        self.depth = self.get_depth(depth)
+        self.fields = self.get_fields(fields)
+        self.root = self.get_root(root)
+
+    def get_depth(self, depth):
+        if depth in (None, ""):
+            return self.MAX_DEPTH
+        try:
+            depth = int(depth)
+        except (TypeError, ValueError):
+            raise ValueError("depth must be a number")
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        return min(depth, self.MAX_DEPTH)
+
+    def get_fields(self, fields):
+        if not fields:
+            return self.DEFAULT_FIELDS
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in CategoryTreeSerializer.Meta.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return [field for field in CategoryTreeSerializer.Meta.fields if field in fields]
+
+    def get_root(self, root):
+        if root in (None, ""):
+            return None
+        try:
+            return int(root)
+        except (TypeError, ValueError):
+            raise ValueError("category must be a number")
+
+    def get_cache_key(self, tree):
+        options = json.dumps(
+            [self.request.build_absolute_uri("/"), self.depth, self.fields, self.root], separators=(",", ":")
+        )
+        return self.PAYLOAD_CACHE_KEY.format(
+            version=tree.version, options=hashlib.md5(options.encode()).hexdigest()
+        )
+
+    @staticmethod
+    def is_active(category):
+        return category.status == CATEGORY_STATUS.ACTIVE
+
+    def build_nodes(self, tree, categories, level):
+        categories = [category for category in categories if self.is_active(category)]
+        data = CategoryTreeSerializer(categories, many=True, fields=self.fields, context={"request": self.request}).data
+        for category, item in zip(categories, data):
+            if level < self.depth:
+                item["children"] = self.build_nodes(tree, tree.get_children(category.id), level + 1)
+        return data
+
+    def build(self, tree):
+        if self.root is None:
+            categories = tree.get_children()
+        else:
+            # A hidden ancestor hides the whole branch
+            ancestors = tree.get_ancestors(self.root, include_self=True)
+            if not ancestors or not all(self.is_active(category) for category in ancestors):
+                return None
+            categories = tree.get_children(self.root)
+        body = json.dumps(self.build_nodes(tree, categories, 1), cls=DjangoJSONEncoder, sort_keys=True)
+        return {"etag": f'"{hashlib.md5(body.encode()).hexdigest()}"', "data": json.loads(body)}
+
+    def get(self):
+        # Keyed by the version the in-process tree was built from, never a newer one
+        tree = CategoryTree.get()
+        key = self.get_cache_key(tree)
+        entry = cache.get(key)
+        if entry is None:
+            entry = self.build(tree)
+            if entry is None:
+                return None
+            cache.set(key, entry, self.TIMEOUT)
+        return entry
+
+
+class ProductFilter(django_filters.FilterSet):
+    category = django_filters.NumberFilter(method="filter_category")
+    brand = django_filters.CharFilter(method="filter_brand")
+    min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    status = django_filters.ChoiceFilter(choices=PRODUCT_STATUS.choices)
+    tag = django_filters.CharFilter(method="filter_tag")
+
+    class Meta:
+        model = Product
+        fields = ["category", "brand", "min_price", "max_price", "status", "tag"]
+
+    def filter_category(self, queryset, name, value):
+        # The category and everything below it, resolved from the in-process tree
+        return queryset.filter(category_id__in=CategoryTree.get().get_descendant_ids(int(value)))
+
+    def filter_brand(self, queryset, name, value):
+        if value.isdigit():
+            return queryset.filter(brand_id=int(value))
+        return queryset.filter(brand__slug=value)
+
+    def filter_tag(self, queryset, name, value):
+        tags = ProductTag.objects.filter(product=OuterRef("pk"), tag__slug=value)
+        return queryset.filter(Exists(tags))
+
+
+class ProductCursorPagination(CursorPagination):
+    # Newest first on (created_at, id), served by product_created_id_idx
+    ordering = ("-created_at", "-id")
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "status": True,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "data": data,
+            }
+        )
+
+
+class ProductFieldSelector:
+    # Turns ?fields=a,b into the serializer field list and the matching only() columns, so
+    # list pages never load description_html/description_json unless they are asked for.
+    DEFAULT_FIELDS = [
+        "id", "uuid", "title", "slug", "sku", "product_type", "category", "brand", "short_description",
+        "price", "discount_price", "compare_at_price", "inventory_quantity", "tags", "status",
+        "created_at", "updated_at",
+    ]
+    # Needed by the cursor whatever the client selects
+    REQUIRED_COLUMNS = ["id", "created_at"]
+
+    def __init__(self, fields=None):
+        self.fields = self.get_fields(fields)
+
+    def get_fields(self, fields):
+        if not fields:
+            return self.DEFAULT_FIELDS
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in ProductListSerializer.Meta.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return [field for field in ProductListSerializer.Meta.fields if field in fields]
+
+    def apply(self, queryset):
+        columns = list(dict.fromkeys(self.REQUIRED_COLUMNS + self.fields))
+        return queryset.only(*columns)
@@ -1,9 +1,10 @@
 from django.http import JsonResponse
 from rest_framework import views, status, permissions, viewsets, exceptions
 from rest_framework.response import Response
-from .serializers import SiteSettingsSerializer, CategorySerializer, TagSerializer, AttributeSerializer, MainSliderSerializer, ProductSerializer, DeliveryChargeCalculateSerializer
+from .serializers import SiteSettingsSerializer, CategorySerializer, TagSerializer, AttributeSerializer, MainSliderSerializer, ProductSerializer, ProductListSerializer, DeliveryChargeCalculateSerializer
 from settings_app.models import SiteSettings, Tag, MainSlider
-from catalog.models import Category, Attribute, Product
+from catalog.models import Category, CategoryTree, Attribute, Product
+from .utils import CategoryTreePayloadCache, ProductFilter, ProductCursorPagination, ProductFieldSelector
 
 
 def api_welcome_message(request):
@@ -50,24 +51,23 @@ class CategoryAPIViews(views.APIView):
     def get(self, request, *args, **kwargs):
         try:
             category_id = request.query_params.get('category')
+            tree = CategoryTree.get()
             if category_id:
-                try:
-                    category = Category.objects.get(id=category_id)
-                    sub_category = category.children.all()
-                    return Response(
-                        {
-                            "status": True,
-                            "data": CategorySerializer(sub_category, many=True).data
-                        }, status=status.HTTP_200_OK
-                    )
-                except Category.DoesNotExist:
+                category = tree.get_node(int(category_id)) if category_id.isdigit() else None
+                if category is None:
                     return Response(
                         {
                             "status": False,
                             "message": "Category not found"
                         }, status=status.HTTP_404_NOT_FOUND
                     )
-            categories = Category.objects.filter(parent__isnull=True)
+                return Response(
+                    {
+                        "status": True,
+                        "data": CategorySerializer(tree.get_children(category.id), many=True).data
+                    }, status=status.HTTP_200_OK
+                )
+            categories = tree.get_children()
             return Response(
                 {
                     "status": True,
@@ -82,6 +82,51 @@ class CategoryAPIViews(views.APIView):
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class CategoryTreeAPIViews(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            payload_cache = CategoryTreePayloadCache(
+                request,
+                depth=request.query_params.get("depth"),
+                fields=request.query_params.get("fields"),
+                root=request.query_params.get("category"),
+            )
+        except ValueError as e:
+            return Response(
+                {
+                    "status": False,
+                    "message": str(e)
+                }, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            entry = payload_cache.get()
+            if entry is None:
+                return Response(
+                    {
+                        "status": False,
+                        "message": "Category not found"
+                    }, status=status.HTTP_404_NOT_FOUND
+                )
+
+            headers = {"ETag": entry["etag"], "Cache-Control": "public, max-age=0, must-revalidate"}
+            if entry["etag"] in request.headers.get("If-None-Match", ""):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(
+                {
+                    "status": True,
+                    "data": entry["data"]
+                }, status=status.HTTP_200_OK, headers=headers
+            )
+        except Exception as e:
+            return Response(
+                {
+                    "status": False,
+                    "message": str(e)
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class TagAPIViews(views.APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -172,16 +217,16 @@ class ProductAPIViews(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
+    filterset_class = ProductFilter
+    pagination_class = ProductCursorPagination
 
     def list(self, request, *args, **kwargs):
         try:
-            products = self.get_queryset()
-            return Response(
-                {
-                    "status": True,
-                    "data": ProductSerializer(products, many=True, context={"request": request}).data
-                }, status=status.HTTP_200_OK
-            )
+            selector = ProductFieldSelector(request.query_params.get("fields"))
+            products = selector.apply(self.filter_queryset(self.get_queryset()))
+            page = self.paginate_queryset(products)
+            data = ProductListSerializer(page, many=True, fields=selector.fields, context={"request": request}).data
+            return self.get_paginated_response(data)
         except Exception as e:
             return Response(
                 {
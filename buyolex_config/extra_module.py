@@ -1,3 +1,5 @@
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.files.storage import default_storage
 
 
@@ -11,3 +13,17 @@ def previous_image_delete_os(old_picture, new_picture):
         default_storage.delete(old_picture.name)
         return True
 
+
+class BoundedLocMemCache(LocMemCache):
+    # Per-process cache: signal invalidations never reach other workers, so no entry
+    # (not even timeout=None version tokens) outlives OPTIONS["MAX_TIMEOUT"] seconds.
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.max_timeout = int(params.get("OPTIONS", {}).get("MAX_TIMEOUT", 60))
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None or timeout > self.max_timeout:
+            timeout = self.max_timeout
+        return super().get_backend_timeout(timeout)
@@ -153,6 +153,33 @@ else:
     }
 
 
+# Cache======================================================================================
+# Cached data is invalidated by model signals and many keys never expire, so every worker
+# process must share one cache. In production set CACHE_ENGINE=redis with
+# CACHE_LOCATION=redis://host:6379/1 (or memcached with host:11211): reads stay off the
+# database. The default is the database cache, which works everywhere but costs one SQL
+# query per cache read; its table is created by settings_app's migrations. locmem is per
+# process and only fit for a single-process dev server; its entries are capped at
+# CACHE_LOCAL_MAX_TIMEOUT.
+CACHE_BACKEND_MAP = {
+    "locmem": "buyolex_config.extra_module.BoundedLocMemCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "database": "django.core.cache.backends.db.DatabaseCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+}
+CACHE_ENGINE = os.getenv("CACHE_ENGINE", "database").lower()
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND_MAP.get(CACHE_ENGINE, CACHE_BACKEND_MAP["database"]),
+        "LOCATION": os.getenv("CACHE_LOCATION", "buyolex_cache"),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "300")),
+    }
+}
+if CACHE_ENGINE == "locmem":
+    CACHES["default"]["OPTIONS"] = {"MAX_TIMEOUT": int(os.getenv("CACHE_LOCAL_MAX_TIMEOUT", "60"))}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def get_path(category_id, seen=()):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            if parent_id in parents and parent_id not in seen:
+                paths[category_id] = f"{get_path(parent_id, seen + (category_id,))}{category_id}/"
+            else:
+                paths[category_id] = f"/{category_id}/"
+        return paths[category_id]
+
+    categories = [
+        Category(id=category_id, path=get_path(category_id), depth=get_path(category_id).count('/') - 2)
+        for category_id in parents
+    ]
+    Category.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_producttag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,15 @@ from settings_app.utils import generate_unique_slug, image_delete_os, previous_i
 from .utils import generate_product_sku
 import uuid
 from settings_app.models import Tag
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField, Prefetch, F
+from django.db.models.functions import Concat, Substr
+from collections import defaultdict
+import threading
+import time
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
@@ -16,17 +25,86 @@ class Category(models.Model):
     seo_description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=50, choices=CATEGORY_STATUS.choices, default=CATEGORY_STATUS.ACTIVE)
     sort_order = models.IntegerField(default=0)
+    # Materialized path of ids from the root, e.g. "/3/7/12/", kept in sync by save()
+    path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    TREE_VERSION_CACHE_KEY = "catalog:category_tree:version"
+
     def save(self, *args, **kwargs):
-        old_slug = Category.objects.get(pk=self.pk) if self.pk else None
-        self.slug = generate_unique_slug(Category, self.name, old_slug.slug if old_slug else None)
+        old = Category.objects.filter(pk=self.pk).values("slug", "path", "depth").first() if self.pk else None
+        self.slug = generate_unique_slug(Category, self.name, old["slug"] if old else None)
+
+        with transaction.atomic():
+            result = super().save(*args, **kwargs)
+            self.update_path(old)
+        return result
+
+    def update_path(self, old=None):
+        parent_path = "/"
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or "/"
+            if f"/{self.pk}/" in parent_path:
+                raise ValueError("A category cannot be moved under itself or one of its subcategories")
+        path = f"{parent_path}{self.pk}/"
+        depth = path.count("/") - 2
+        if old and old["path"] == path:
+            self.path, self.depth = path, depth
+            return
+        Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+        if old and old["path"]:
+            # Re-parenting: move the whole subtree with two string operations in one UPDATE
+            Category.objects.filter(path__startswith=old["path"]).exclude(pk=self.pk).update(
+                path=Concat(Value(path), Substr("path", len(old["path"]) + 1)),
+                depth=F("depth") + (depth - old["depth"]),
+            )
+        self.path, self.depth = path, depth
+
+    @classmethod
+    def rebuild_paths(cls):
+        rows = {row["id"]: row for row in cls.objects.values("id", "parent_id", "path", "depth")}
+        paths = {}
+
+        def get_path(category_id, seen=()):
+            if category_id not in paths:
+                parent_id = rows[category_id]["parent_id"]
+                if parent_id in rows and parent_id not in seen:
+                    paths[category_id] = f"{get_path(parent_id, seen + (category_id,))}{category_id}/"
+                else:
+                    paths[category_id] = f"/{category_id}/"
+            return paths[category_id]
+
+        changed = []
+        for category_id, row in rows.items():
+            path = get_path(category_id)
+            if row["path"] != path:
+                changed.append(cls(id=category_id, path=path, depth=path.count("/") - 2))
+        cls.objects.bulk_update(changed, ["path", "depth"], batch_size=500)
+        return len(changed)
+
+    @classmethod
+    def get_tree_version(cls):
+        version = cache.get(cls.TREE_VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(cls.TREE_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.TREE_VERSION_CACHE_KEY)
+        return version
+
+    @classmethod
+    def bump_tree_version(cls):
+        # After commit, so a request racing the save cannot cache the uncommitted tree under the new version
+        def bump():
+            cache.set(cls.TREE_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            CategoryTree.clear()
+        transaction.on_commit(bump, robust=True)
 
-        return super().save(*args, **kwargs)
-    
     @property
     def get_category_path(self):
+        tree = CategoryTree.get()
+        if self.pk in tree.nodes:
+            return tree.get_path_string(self.pk)
         path = []
         category = self
         while category:
@@ -44,6 +122,90 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+
+@receiver(post_save, sender=Category)
+def category_tree_saved(sender, instance, **kwargs):
+    Category.bump_tree_version()
+
+
+@receiver(post_delete, sender=Category)
+def category_tree_deleted(sender, instance, **kwargs):
+    # Children were detached by SET_NULL and become roots
+    Category.rebuild_paths()
+    Category.bump_tree_version()
+
+
+class CategoryTree:
+    # The whole category table held in process memory, rebuilt from one query whenever
+    # the shared tree version moves, so paths, ancestors and descendants need no queries.
+    # The shared version is read at most once per VERSION_CHECK_SECONDS, so per-row
+    # properties such as Product.category_path never touch the cache; edits made by
+    # this process drop its copy at once, other workers see them within that interval.
+    VERSION_CHECK_SECONDS = 5
+    _cached = None
+    _lock = threading.Lock()
+
+    def __init__(self, categories, version=None):
+        self.version = version
+        self.nodes = {category.id: category for category in categories}
+        self.children = defaultdict(list)
+        for category in sorted(categories, key=lambda category: (category.sort_order, category.id)):
+            parent_id = category.parent_id if category.parent_id in self.nodes else None
+            self.children[parent_id].append(category)
+
+    @classmethod
+    def get(cls):
+        cached = cls._cached
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < cls.VERSION_CHECK_SECONDS:
+            return cached[2]
+        version = Category.get_tree_version()
+        with cls._lock:
+            cached = cls._cached
+            if cached is None or cached[0] != version:
+                cached = (version, now, cls(list(Category.objects.all()), version))
+            else:
+                cached = (version, now, cached[2])
+            cls._cached = cached
+        return cached[2]
+
+    @classmethod
+    def clear(cls):
+        cls._cached = None
+
+    def get_node(self, category_id):
+        return self.nodes.get(category_id)
+
+    def get_children(self, category_id=None):
+        return self.children.get(category_id, [])
+
+    def get_ancestors(self, category_id, include_self=False):
+        category = self.nodes.get(category_id)
+        if category is None:
+            return []
+        ids = [int(part) for part in category.path.strip("/").split("/") if part] or [category_id]
+        if not include_self:
+            ids = ids[:-1]
+        return [self.nodes[pk] for pk in ids if pk in self.nodes]
+
+    def get_descendants(self, category_id, include_self=False):
+        descendants = [self.nodes[category_id]] if include_self and category_id in self.nodes else []
+        stack = list(reversed(self.get_children(category_id)))
+        while stack:
+            category = stack.pop()
+            descendants.append(category)
+            stack.extend(reversed(self.get_children(category.id)))
+        return descendants
+
+    def get_descendant_ids(self, category_id, include_self=True):
+        return [category.id for category in self.get_descendants(category_id, include_self=include_self)]
+
+    def get_path_string(self, category_id):
+        # Same format as before: the category first, then its parents up to the root
+        ancestors = self.get_ancestors(category_id, include_self=True)
+        return " -> ".join(category.name for category in reversed(ancestors)) or None
+
+
 class Brand(models.Model):
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -94,6 +256,23 @@ class AttributeValue(models.Model):
 
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_media(self):
+        # Images primary first then by position, and active variants with their images,
+        # in three extra queries however many products are listed
+        primary_first = Case(When(role=PRODUCT_MEDIA_ROLE.PRIMARY, then=Value(0)), default=Value(1), output_field=IntegerField())
+        return self.prefetch_related(
+            Prefetch("images", queryset=ProductImage.objects.order_by(primary_first, "position", "id")),
+            Prefetch(
+                "variants",
+                queryset=ProductVariant.objects.filter(is_active=True).prefetch_related(
+                    Prefetch("images", queryset=ProductImage.objects.order_by("position", "id"))
+                ),
+                to_attr="prefetched_active_variants",
+            ),
+        )
+
+
 class Product(models.Model):
     uuid = models.CharField(max_length=255, unique=True, editable=False)
     title = models.CharField(max_length=512)
@@ -125,27 +304,59 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_id_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='product_status_created_idx'),
+        ]
+
     @property
     def active_variante(self):
+        if hasattr(self, "prefetched_active_variants"):
+            return self.prefetched_active_variants
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("variants")
+        if prefetched is not None:
+            return [variant for variant in prefetched if variant.is_active]
         return self.variants.filter(is_active=True)
     
     @property
     def category_path(self):
-        if not self.category:
+        if not self.category_id:
             return []
+        tree = CategoryTree.get()
+        if self.category_id in tree.nodes:
+            return tree.get_path_string(self.category_id)
         return self.category.get_category_path
     
+    @property
+    def primary_image_object(self):
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("images")
+        if prefetched is not None:
+            images = list(prefetched)
+            return next((image for image in images if image.role == PRODUCT_MEDIA_ROLE.PRIMARY), None) or (images[0] if images else None)
+        return self.images.filter(role=PRODUCT_MEDIA_ROLE.PRIMARY).first() or self.images.first()
+
     @property
     def primary_image(self):
-        primary_image = self.images.filter(role=PRODUCT_MEDIA_ROLE.PRIMARY).first()
-        if primary_image:
-            return primary_image.image.url
-        first_image = self.images.first()
-        if first_image:
-            return first_image.image.url
+        image = self.primary_image_object
+        if image:
+            return image.image.url
         return None
 
 
+    PICKER_CACHE_KEY = "catalog:product_picker"
+
+    @classmethod
+    def get_picker_options(cls, cached=None):
+        # Lightweight slug/title list for filter dropdowns, dropped whenever a product changes
+        options = cached if cached is not None else cache.get(cls.PICKER_CACHE_KEY)
+        if options is None:
+            options = list(cls.objects.order_by("title").values("id", "slug", "title"))
+            cache.set(cls.PICKER_CACHE_KEY, options, None)
+        return options
+
     def save(self, *args, **kwargs):
         old_slug = Category.objects.get(pk=self.pk) if self.pk else None
         self.slug = generate_unique_slug(Category, self.title, old_slug.slug if old_slug else None)
@@ -172,6 +383,12 @@ class Product(models.Model):
 #     def __str__(self) -> str:
 #         return f"Item details of {self.product.title}"
 
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_picker_cache_clear(sender, instance, **kwargs):
+    # After commit, so a request racing the save cannot re-cache the old list with no expiry
+    transaction.on_commit(lambda: cache.delete(Product.PICKER_CACHE_KEY), robust=True)
+
 class ProductVariant(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
     sku = models.CharField(max_length=128, unique=True, blank=True, null=True)
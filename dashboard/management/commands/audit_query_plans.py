@@ -0,0 +1,144 @@
+import re
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test import RequestFactory
+from django.utils import timezone
+from accounts.models import CustomerProfile
+from catalog.models import Product
+from orders.models import Order, OrderItem, OrderSearchDocument, Shipment
+from dashboard.views import OrderView
+from dashboard.utils import DashboardMetricsEngine
+
+
+class RollbackSeed(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every dashboard and API query shape against a seeded database and fail "
+        "when one of them needs a full scan of a large table. Seed data is rolled back."
+    )
+
+    # Tables that grow with orders; a sequential scan of any of these is a failure
+    WATCHED_TABLES = {
+        Order._meta.db_table, OrderItem._meta.db_table, CustomerProfile._meta.db_table,
+        OrderSearchDocument._meta.db_table, Shipment._meta.db_table,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=5000, help="Number of orders to seed.")
+        parser.add_argument("--no-seed", action="store_true", help="Explain against the existing data only.")
+
+    def seed(self, total):
+        product = Product.objects.create(title=f"Audit {uuid.uuid4().hex[:8]}", price=100, discount_price=90)
+        customers = CustomerProfile.objects.bulk_create([
+            CustomerProfile(profile_uuid=uuid.uuid4().hex, full_name=f"Audit Customer {i}", phone=f"017{i:08d}")
+            for i in range(max(total // 2, 1))
+        ], batch_size=1000)
+        statuses = [choice for choice, _ in Order._meta.get_field("order_status").choices]
+        orders = Order.objects.bulk_create([
+            Order(
+                order_uuid=uuid.uuid4().hex, order_id=f"AUD{i:06d}", customer=customers[i % len(customers)],
+                order_status=statuses[i % len(statuses)], shipping_total=60,
+                shipping_address=f"House {i}, Road {i % 50}, Dhaka",
+            )
+            for i in range(total)
+        ], batch_size=1000)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, c_unit_price=100, d_unit_price=90, total_price=100, discount_total_price=90)
+            for order in orders
+        ], batch_size=1000)
+        OrderSearchDocument.index_queryset(Order.objects.filter(id__in=[order.id for order in orders]))
+        now = timezone.now()
+        for offset in range(0, total, 1000):
+            Order.objects.filter(id__in=[order.id for order in orders[offset:offset + 1000]]).update(
+                placed_at=now - timedelta(days=offset // 1000)
+            )
+        return product, orders[0]
+
+    def get_order_list(self, query_string):
+        request = RequestFactory().get("/dashboard/order-list/", data=query_string)
+        return OrderView().get_filtered_orders(request).for_list()
+
+    def get_query_shapes(self, product, order):
+        placed_at = timezone.now()
+        today = placed_at.date().isoformat()
+        return {
+            "dashboard metrics": DashboardMetricsEngine().rollups.order_by(),
+            "order list": self.get_order_list({})[:20],
+            "order list by status": self.get_order_list({"status": "confirmed"})[:20],
+            "order list by date range": self.get_order_list({"start_date": today, "end_date": today})[:20],
+            "order list by status and date": self.get_order_list({"status": "new", "start_date": today})[:20],
+            "order list by product": self.get_order_list({"product": product.slug})[:20],
+            "order list search text": self.get_order_list({"q": "customer 12"})[:20],
+            "order list search phone": self.get_order_list({"q": "0170000"})[:20],
+            "order list keyset page": self.get_order_list({}).filter(
+                Q(placed_at__lt=placed_at) | Q(placed_at=placed_at, id__lt=order.id)
+            ).order_by("-placed_at", "-id")[:20],
+            "order status counts": Order.objects.order_by().values("order_status").annotate(total=Count("id")),
+            "order detail": Order.objects.filter(id=order.id),
+            "order items": OrderItem.objects.filter(order_id=order.id),
+            "shipment info": Shipment.objects.filter(order__id=order.id),
+            "customer by phone": CustomerProfile.objects.filter(phone="01700000001"),
+        }
+
+    def get_full_scans(self, plan):
+        tables = set()
+        if connection.vendor == "postgresql":
+            for match in re.finditer(r"Seq Scan on (\w+)", plan):
+                tables.add(match.group(1))
+            return tables & self.WATCHED_TABLES
+        for line in plan.splitlines():
+            match = re.search(r"\bSCAN (\w+)(?: AS (\w+))?(.*)$", line)
+            if not match or "USING" in match.group(3) or "VIRTUAL TABLE" in match.group(3):
+                continue
+            if match.group(1) in self.WATCHED_TABLES or re.fullmatch(r"U\d+", match.group(1)):
+                tables.add(match.group(1))
+        return tables
+
+    def explain_all(self, shapes):
+        if connection.vendor == "postgresql":
+            # Make the planner take an index whenever one can serve the query, so the
+            # audit reports missing indexes and not small-table cost decisions.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        failures = {}
+        for name, queryset in shapes.items():
+            plan = queryset.explain()
+            scans = self.get_full_scans(plan)
+            if self.verbosity > 1 or scans:
+                self.stdout.write(f"--- {name}\n{plan}\n")
+            if scans:
+                failures[name] = scans
+        return failures
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError(f"Query plan audit supports PostgreSQL and SQLite, not {connection.vendor}.")
+
+        failures = {}
+        try:
+            with transaction.atomic():
+                if options["no_seed"]:
+                    order = Order.objects.order_by("-id").first()
+                    product = Product.objects.order_by("-id").first()
+                    if not order or not product:
+                        raise CommandError("--no-seed needs at least one product and one order.")
+                else:
+                    product, order = self.seed(options["orders"])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                failures = self.explain_all(self.get_query_shapes(product, order))
+                raise RollbackSeed()
+        except RollbackSeed:
+            pass
+
+        if failures:
+            lines = [f"{name}: full scan of {', '.join(sorted(tables))}" for name, tables in failures.items()]
+            raise CommandError("Sequential scans found:\n" + "\n".join(lines))
+        self.stdout.write(self.style.SUCCESS("No sequential scans on watched tables."))
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import DashboardView, product_list, add_product, CategoryView, add_category, get_category, delete_category, OrderView, OrderDetailView, OrderInvoiceView, ProductListView
+from .views import DashboardView, product_list, add_product, CategoryView, add_category, get_category, delete_category, OrderView, OrderDetailView, OrderInvoiceView, OrderBulkUpdateView, OrderExportView, ProductListView
 
 urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
@@ -13,6 +13,8 @@ urlpatterns = [
     path('delete-category/<int:id>/', delete_category, name='delete_category'),
 
     path('order-list/', OrderView.as_view(), name='order_list'),
+    path('order-export/', OrderExportView.as_view(), name='order_export'),
+    path('order-bulk-update/', OrderBulkUpdateView.as_view(), name='order_bulk_update'),
     path('order-detail/<int:id>/', OrderDetailView.as_view(), name='order_detail'),
     path('order/<int:id>/invoice/', OrderInvoiceView.as_view(), name='order_invoice'),
 ]
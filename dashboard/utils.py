@@ -0,0 +1,312 @@
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q, Sum, F, DecimalField, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+import base64
+import binascii
+import csv
+import hashlib
+import re
+import json
+from orders.models import DailySalesRollup, OrderItem
+from orders.utix import ORDER_STATUS
+
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+@dataclass(frozen=True)
+class DashboardMetrics:
+    total_orders: int = 0
+    total_order_amount: Decimal = Decimal("0")
+    today_order_count: int = 0
+    today_sales_amount: Decimal = Decimal("0")
+    new_orders_count: int = 0
+    status_amounts: dict = field(default_factory=dict)
+
+    def as_context(self):
+        return {
+            "total_orders": self.total_orders,
+            "total_order_amount": self.total_order_amount,
+            "today_order_count": self.today_order_count,
+            "today_sales_amount": self.today_sales_amount,
+            "new_orders_count": self.new_orders_count,
+            "status_amounts": self.status_amounts,
+        }
+
+
+class DashboardMetricsEngine:
+    # All dashboard KPIs in one conditional aggregation over the daily sales rollup,
+    # so the cost follows the number of (day, status) buckets, not the number of orders.
+    def __init__(self, rollups=None, today=None):
+        self.rollups = rollups if rollups is not None else DailySalesRollup.objects.all()
+        self.today = today or timezone.now().date()
+
+    def get_amount_expression(self):
+        return F("discount_total") + F("shipping_total")
+
+    def get_aggregates(self):
+        today = Q(date=self.today)
+        amount = self.get_amount_expression()
+        aggregates = {
+            "total_orders": Sum("order_count"),
+            "total_order_amount": Sum(amount, output_field=AMOUNT_FIELD),
+            "today_order_count": Sum("order_count", filter=today),
+            "today_sales_amount": Sum(amount, filter=today, output_field=AMOUNT_FIELD),
+            "new_orders_count": Sum("order_count", filter=Q(order_status=ORDER_STATUS.NEW)),
+        }
+        for status_key, _ in ORDER_STATUS.choices:
+            aggregates[f"status_{status_key}"] = Sum(amount, filter=Q(order_status=status_key), output_field=AMOUNT_FIELD)
+        return aggregates
+
+    def compute(self) -> DashboardMetrics:
+        row = self.rollups.order_by().aggregate(**self.get_aggregates())
+        return self.build_metrics(row)
+
+    def build_metrics(self, row) -> DashboardMetrics:
+        zero = Decimal("0")
+        status_amounts = {
+            status_key: row.get(f"status_{status_key}") or zero
+            for status_key, _ in ORDER_STATUS.choices
+        }
+        # Returned + Refunded combine
+        status_amounts["returned_refund"] = status_amounts[ORDER_STATUS.RETURNED] + status_amounts[ORDER_STATUS.REFUNDED]
+        return DashboardMetrics(
+            total_orders=row.get("total_orders") or 0,
+            total_order_amount=row.get("total_order_amount") or zero,
+            today_order_count=row.get("today_order_count") or 0,
+            today_sales_amount=row.get("today_sales_amount") or zero,
+            new_orders_count=row.get("new_orders_count") or 0,
+            status_amounts=status_amounts,
+        )
+
+
+class KeysetPage:
+    def __init__(self, object_list, per_page, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    # Cursor pagination on (placed_at, id) newest first. Each page is an index range
+    # scan from the cursor, so page 5000 costs the same as page 1 and needs no COUNT.
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset.filter(placed_at__isnull=False).order_by()
+        self.per_page = per_page
+
+    @staticmethod
+    def encode_cursor(direction, order):
+        payload = json.dumps([direction, order.placed_at.isoformat(), order.pk], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, placed_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ("next", "prev"):
+                return None
+            return direction, datetime.fromisoformat(placed_at), int(pk)
+        except (ValueError, TypeError, binascii.Error):
+            return None
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset.order_by("-placed_at", "-id")[:self.per_page + 1])
+            has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+            return self.build_page(rows, has_next=has_more, has_previous=False)
+
+        direction, placed_at, pk = decoded
+        if direction == "next":
+            rows = list(
+                self.queryset
+                .filter(Q(placed_at__lt=placed_at) | Q(placed_at=placed_at, id__lt=pk))
+                .order_by("-placed_at", "-id")[:self.per_page + 1]
+            )
+            has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+            return self.build_page(rows, has_next=has_more, has_previous=True)
+
+        rows = list(
+            self.queryset
+            .filter(Q(placed_at__gt=placed_at) | Q(placed_at=placed_at, id__gt=pk))
+            .order_by("placed_at", "id")[:self.per_page + 1]
+        )
+        has_more, rows = len(rows) > self.per_page, rows[:self.per_page]
+        rows.reverse()
+        return self.build_page(rows, has_next=True, has_previous=has_more)
+
+    def build_page(self, rows, has_next, has_previous):
+        next_cursor = self.encode_cursor("next", rows[-1]) if rows and has_next else None
+        previous_cursor = self.encode_cursor("prev", rows[0]) if rows and has_previous else None
+        return KeysetPage(rows, self.per_page, next_cursor, previous_cursor)
+
+
+class CachedCountPaginator(Paginator):
+    # Page number pagination whose total comes from get_approximate_count
+    def __init__(self, object_list, per_page, count_cache_key, cached_count=None, **kwargs):
+        self.count_cache_key = count_cache_key
+        self.cached_count = cached_count
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        return get_approximate_count(self.object_list, self.count_cache_key, cached=self.cached_count)
+
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def get_count_cache_key(prefix, params):
+    digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{prefix}:count:{digest}"
+
+
+def get_approximate_count(queryset, cache_key, timeout=COUNT_CACHE_TIMEOUT, cached=None):
+    # Counts are cached per filter combination for a short time. An unfiltered table on
+    # PostgreSQL uses the planner's row estimate instead of a full COUNT(*).
+    # `cached` is a value the caller already read for cache_key (e.g. with get_many).
+    count = cached if cached is not None else cache.get(cache_key)
+    if count is not None:
+        return count
+    if connection.vendor == "postgresql" and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            if row and row[0] and row[0] > 0:
+                count = row[0]
+    if count is None:
+        count = queryset.order_by().count()
+    cache.set(cache_key, count, timeout)
+    return count
+
+
+def get_day_range(start_date=None, end_date=None):
+    # [start_date 00:00, end_date + 1 day 00:00). Only start_date means that one day,
+    # only end_date means everything up to the end of that day. Bad dates are ignored.
+    try:
+        start_day = parse_date(start_date) if start_date else None
+        end_day = parse_date(end_date) if end_date else None
+    except ValueError:
+        start_day = end_day = None
+    if start_day and not end_day and not end_date:
+        end_day = start_day
+    start = datetime.combine(start_day, time.min) if start_day else None
+    end = datetime.combine(end_day, time.min) + timedelta(days=1) if end_day else None
+    return start, end
+
+
+class EchoBuffer:
+    def write(self, value):
+        return value
+
+
+class OrderCSVExporter:
+    # Streams orders as CSV rows. The queryset is walked with iterator(chunk_size), which is
+    # a server-side cursor on PostgreSQL; customers are joined and items are prefetched once
+    # per chunk, so memory stays at one chunk whatever the size of the export.
+    FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+    # +8801711223344 or 01711-223344: only digits, so nothing to run, and left untouched
+    PLAIN_NUMBER = re.compile(r"[+-]?[\d\s-]+")
+    HEADERS = [
+        "Order ID", "Placed At", "Order Status", "Payment Status", "Delivery Type", "Delivery Date",
+        "Customer", "Phone", "WhatsApp", "Shipping Address", "Items", "Item Count", "Quantity",
+        "Gross Total", "Discount Total", "Shipping Total", "Grand Total",
+    ]
+    FIELDS = [
+        "id", "order_id", "placed_at", "order_status", "payment_status", "delivery_type", "delivery_date",
+        "shipping_address", "items_count", "total_quantity", "gross_total", "discount_total", "shipping_total",
+        "grand_total", "customer__id", "customer__full_name", "customer__phone", "customer__whatsapp",
+    ]
+
+    def __init__(self, queryset, chunk_size=2000):
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+
+    def get_queryset(self):
+        # product title is the fallback for orders whose items carry no snapshot
+        items = OrderItem.objects.select_related("product").only("id", "order_id", "quantity", "product_snapshot", "product__title")
+        return (
+            self.queryset
+            .select_related("customer")
+            .only(*self.FIELDS)
+            .prefetch_related(Prefetch("items", queryset=items))
+            .order_by("-placed_at", "-id")
+        )
+
+    @staticmethod
+    def format_address(address):
+        if isinstance(address, dict):
+            return ", ".join(str(value) for value in address.values() if value)
+        return address or ""
+
+    @staticmethod
+    def get_item_title(item):
+        title = (item.product_snapshot or {}).get("title")
+        if not title and item.product:
+            title = item.product.title
+        return title or ""
+
+    def format_items(self, order):
+        return "; ".join(f"{self.get_item_title(item)} x {item.quantity}" for item in order.items.all())
+
+    @classmethod
+    def escape(cls, value):
+        # Text starting with a formula character would run as a formula in Excel/Sheets
+        if isinstance(value, str) and value.startswith(cls.FORMULA_PREFIXES) and not cls.PLAIN_NUMBER.fullmatch(value):
+            return "'" + value
+        return value
+
+    def get_row(self, order):
+        customer = order.customer
+        return [
+            order.order_id,
+            order.placed_at.strftime("%Y-%m-%d %H:%M") if order.placed_at else "",
+            order.get_order_status_display(),
+            order.get_payment_status_display(),
+            order.get_delivery_type_display(),
+            order.delivery_date or "",
+            customer.full_name if customer else "",
+            customer.phone if customer else "",
+            customer.whatsapp if customer else "",
+            self.format_address(order.shipping_address),
+            self.format_items(order),
+            order.items_count,
+            order.total_quantity,
+            order.gross_total,
+            order.discount_total,
+            order.shipping_total,
+            order.grand_total,
+        ]
+
+    def iter_rows(self):
+        yield self.HEADERS
+        for order in self.get_queryset().iterator(chunk_size=self.chunk_size):
+            yield [self.escape(value) for value in self.get_row(order)]
+
+    def stream(self):
+        writer = csv.writer(EchoBuffer())
+        # BOM so Excel opens Bangla text as UTF-8
+        yield "\ufeff"
+        for row in self.iter_rows():
+            yield writer.writerow(row)
@@ -3,10 +3,11 @@ from django.shortcuts import render, get_object_or_404, redirect
 from catalog.models import Product, Category
 from catalog.utix import CATEGORY_STATUS
 from django.views import View
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db import transaction
+from django.core.cache import cache
 from http import HTTPStatus
-from orders.models import Order
+from orders.models import Order, OrderItem, OrderSearchDocument, OrderStatusCount
 from orders.utix import ORDER_STATUS, DELIVERY_TYPE
 import json
 from django.db import transaction
@@ -16,86 +17,28 @@ from django.utils.text import slugify
 from django.contrib.auth.decorators import login_required
 from accounts.utix import USER_TYPE
 from django.core.paginator import Paginator
-from django.db.models import Count, Q, Sum, F, Value, DecimalField
+from django.db.models import Q, Sum, F, Value, DecimalField, Prefetch
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 from django.db.models.functions import Coalesce
 from django.db.models import Sum, F, Value, DecimalField
 from django.db.models.functions import Coalesce
-from orders.utils import SteadFastParcelAPI
+from orders.utils import SteadFastParcelAPI, OrderBulkUpdater
 from orders.models import DeliveryOption
+from .utils import DashboardMetricsEngine, KeysetPaginator, CachedCountPaginator, OrderCSVExporter, get_count_cache_key, get_day_range
 
 
 class DashboardView(LoginRequiredMixin, View):
     login_url = 'admin_login'
 
-    # Today Order Count
-    def get_today_order_count(self, orders):
-        today = timezone.now().date()
-        return orders.filter(placed_at__date=today).count()
-    
-        # New Orders Count
-    def new_orders_count (self, orders):
-        return orders.filter(order_status=ORDER_STATUS.NEW).count()
-
-        # Total Order Amount
-    def get_total_order_amount(self, orders):
-        return orders.aggregate(
-            total_amount=Coalesce(
-                Sum('items__discount_total_price') + Sum('shipping_total'),
-                Value(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        )['total_amount']
-    
-
-    # Today Sales Amount
-    def get_today_sales_amount(self, orders):
-        today = timezone.now().date()
-        return orders.filter(
-            placed_at__date=today
-        ).aggregate(
-            total=Coalesce(
-                Sum(F("items__discount_total_price") + F("shipping_total")),
-                Value(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        )["total"]
-
-    # Status Wise Amounts
-    def get_status_amounts(self, orders):
-        amounts = {}
-
-        for status_key, _ in ORDER_STATUS.choices:
-            amounts[status_key] = orders.filter(
-                order_status=status_key
-            ).aggregate(
-                total=Coalesce(
-                    Sum(F("items__discount_total_price") + F("shipping_total")),
-                    Value(0),
-                    output_field=DecimalField(max_digits=12, decimal_places=2)
-                )
-            )["total"]
+    def get_metrics(self):
+        return DashboardMetricsEngine().compute()
 
-        # Returned + Refunded combine (MODEL CHANGE chara)
-        amounts["returned_refund"] = (
-            amounts.get("returned", 0) +
-            amounts.get("refunded", 0)
-        )
-
-        return amounts
-
-    
     def get(self, request):
-        orders = Order.objects.all().order_by("-placed_at")
+        orders = Order.objects.for_list().order_by("-placed_at")
         context = {
             "orders": orders[:10],
-            "total_order_amount": self.get_total_order_amount(orders),
-            "total_orders": orders.count(),
-            "today_order_count": self.get_today_order_count(orders),
-            "new_orders_count": self.new_orders_count(orders),
-            "today_sales_amount": self.get_today_sales_amount(orders),
-            "status_amounts": self.get_status_amounts(orders),
+            **self.get_metrics().as_context(),
         }
         if request.htmx:
             return render(request, "db_home/main_wrapper.html", context)
@@ -108,14 +51,14 @@ class ProductListView(LoginRequiredMixin, View):
 
     def get(self, request, *args, **kwargs):
         # products = Product.objects.annotate(variant_count=Count("variants"))
-        products = Product.objects.all()
+        products = Product.objects.with_media()
         if request.htmx:
             return render(request, "db_product/partial/partial_product_list.html", {"products": products})
         return render(request, "db_product/product_list.html", {"products": products})
 
 @login_required(login_url='admin_login')
 def product_list(request):
-    products = Product.objects.all()
+    products = Product.objects.with_media()
     if request.htmx:
         return render(request, "db_product/partial/partial_product_list.html", {"products": products})
     return render(request, "db_product/product_list.html", {"products": products})
@@ -144,7 +87,7 @@ def add_category(request):
 # @login_required(login_url='admin_login')
 class CategoryView(View):
     def get(self, request):
-        categories = Category.objects.all()
+        categories = Category.objects.select_related("parent")
         if request.htmx:
             return render(request, "db_category/partial/partial_category_list.html", {"categories": categories})
         return render(request, "db_category/category_list.html", {"categories": categories})
@@ -236,20 +179,14 @@ def delete_category(request, id):
 class OrderView(LoginRequiredMixin, View):
     login_url = 'admin_login'
     
-    def status_wise_order_count(self):
-        qs = (
-            Order.objects
-            .values('order_status')
-            .annotate(total=Count('id'))
-        )
-        order_count = {status: 0 for status, _ in ORDER_STATUS.choices}
-        print("ORDER_STATUS: ", ORDER_STATUS.values)
-        for row in qs:
-            order_count[row['order_status']] = row['total']
-        order_count['all'] = sum(order_count.values())
-        return order_count
+    def status_wise_order_count(self, cached=None):
+        return OrderStatusCount.get_counts(cached=cached)
+
+    def get_cached(self, count_cache_key):
+        # The list reads three cache keys; fetch them in one round trip
+        return cache.get_many([count_cache_key, Product.PICKER_CACHE_KEY, OrderStatusCount.CACHE_KEY])
     
-    def get_order_queryset(self, request):
+    def get_filtered_orders(self, request):
         status = request.GET.get('status')
         search = request.GET.get('q', '')
         orders = Order.objects.all().order_by("-placed_at")
@@ -262,42 +199,49 @@ class OrderView(LoginRequiredMixin, View):
         if status and status in ORDER_STATUS.values:
             orders = orders.filter(order_status=status)
         
-            # Product filter
+            # Product filter (semi join, so multi item orders are not repeated)
         if product_slug:
             orders = orders.filter(
-                items__product__slug=product_slug
+                id__in=OrderItem.objects.filter(product__slug=product_slug).values("order_id")
             )
-            print("COUNT AFTER FILTER:", orders.count())
                     
-        if start_date and end_date:
-            # Range filter
-            orders = orders.filter(placed_at__date__gte=start_date, placed_at__date__lte=end_date)
-        elif start_date:
-            # Only start_date: orders on that date
-            orders = orders.filter(placed_at__date=start_date)
-        elif end_date:
-            # Only end_date: orders up to that date
-            orders = orders.filter(placed_at__date__lte=end_date)
+        # Half open datetime ranges, so the placed_at index can be used
+        start, end = get_day_range(start_date, end_date)
+        if start:
+            orders = orders.filter(placed_at__gte=start)
+        if end:
+            orders = orders.filter(placed_at__lt=end)
 
 
         if search:
-            orders = orders.filter(
-                Q(order_id__icontains=search) |
-                Q(customer__full_name__icontains=search) |
-                Q(customer__phone__icontains=search) |
-                Q(customer__whatsapp__icontains=search) |
-                Q(order_status__icontains=search) |
-                Q(payment_status__icontains=search) |
-                Q(delivery_type__icontains=search) |
-                Q(shipping_address__icontains=search)
-            )
+            # Order id, customer name, phones and address through the search index
+            orders = orders.filter(id__in=OrderSearchDocument.search(search))
+        return orders
+
+    def get_filter_params(self, request):
+        return {
+            name: request.GET.get(name, "")
+            for name in ("status", "q", "product", "start_date", "end_date")
+        }
+
+    def is_cursor_mode(self, request):
+        return bool(request.GET.get("cursor")) or request.GET.get("pagination") == "cursor"
+
+    def get_order_queryset(self, request):
+        orders = self.get_filtered_orders(request).for_list()
         
         page_number = request.GET.get('page', 1)
         per_page = int(request.GET.get('per_page', 10))
-        paginator = Paginator(orders, per_page)
-        orders = paginator.get_page(page_number)
-        products = Product.objects.all().distinct()
-        return orders, paginator, per_page, page_number, products
+        count_cache_key = get_count_cache_key("orders", self.get_filter_params(request))
+        cached = self.get_cached(count_cache_key)
+        if self.is_cursor_mode(request):
+            paginator = None
+            orders = KeysetPaginator(orders, per_page).get_page(request.GET.get("cursor"))
+        else:
+            paginator = CachedCountPaginator(orders, per_page, count_cache_key, cached_count=cached.get(count_cache_key))
+            orders = paginator.get_page(page_number)
+        products = Product.get_picker_options(cached=cached.get(Product.PICKER_CACHE_KEY))
+        return orders, paginator, per_page, page_number, products, cached
     
     def permission_denied(self, request):
         if not request.user.is_authenticated:
@@ -306,19 +250,19 @@ class OrderView(LoginRequiredMixin, View):
             return redirect('product_landing_page')
     
     def get(self, request):
-        orders, paginator, per_page, page_number, products = self.get_order_queryset(request)
+        orders, paginator, per_page, page_number, products, cached = self.get_order_queryset(request)
         context = {
             "orders": orders,
             "paginator": paginator,
             "per_page": per_page,
             "page_number": page_number,
-            "order_count": self.status_wise_order_count(),
+            "order_count": self.status_wise_order_count(cached.get(OrderStatusCount.CACHE_KEY)),
             "current_status": request.GET.get('status', 'all'),
             "current_search": request.GET.get('q', ''),
             "current_product_slug":  request.GET.get("product", ""),
             "products": products,
+            "cursor_mode": paginator is None,
         }
-        print("current product slug: ", request.GET.get("product", ""))
         if request.htmx:
             return render(request, "db_order/partial/partial_order_list.html", context)
         return render(request, "db_order/order_list.html", context)
@@ -371,6 +315,21 @@ class OrderView(LoginRequiredMixin, View):
 
 
 
+class OrderExportView(LoginRequiredMixin, View):
+    login_url = 'admin_login'
+
+    def get(self, request):
+        if request.user.user_type not in [USER_TYPE.ADMIN, USER_TYPE.STAFF, USER_TYPE.SUPER_ADMIN]:
+            return redirect('product_landing_page')
+
+        orders = OrderView().get_filtered_orders(request)
+        exporter = OrderCSVExporter(orders)
+        filename = f"orders-{timezone.now().strftime('%Y%m%d-%H%M')}.csv"
+        response = StreamingHttpResponse(exporter.stream(), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 class OrderDetailView(View):
     def get(self, request, id):
         if not request.user.is_authenticated:
@@ -385,7 +344,8 @@ class OrderDetailView(View):
         return render(request, "db_order/order_detail.html", {"order": order})
 
     def get_order(self, id):
-        return get_object_or_404(Order, id=id)
+        items = OrderItem.objects.select_related("product", "variant").prefetch_related("variant__images", "product__images")
+        return get_object_or_404(Order.objects.select_related("customer").prefetch_related(Prefetch("items", queryset=items)), id=id)
 
     def generate_unique_username(self, name):
         base = slugify(name) or "user"
@@ -464,6 +424,46 @@ class OrderDetailView(View):
             return self.patch(request, *args, **kwargs)
         return super().dispatch(request, *args, **kwargs)
 
+class OrderBulkUpdateView(LoginRequiredMixin, View):
+    login_url = 'admin_login'
+
+    def get_payload(self, request):
+        if request.content_type == "application/json":
+            payload = json.loads(request.body or "{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            return payload
+        data = request.POST
+        payload = {
+            "order_ids": data.getlist("order_ids"),
+            "order_status": data.get("order_status"),
+            "payment_status": data.get("payment_status"),
+        }
+        if "work_assign" in data:
+            payload["work_assign"] = data.get("work_assign")
+        return payload
+
+    def post(self, request):
+        if request.user.user_type not in [USER_TYPE.ADMIN, USER_TYPE.STAFF, USER_TYPE.SUPER_ADMIN]:
+            return JsonResponse({
+                "success": False,
+                "message": "Permission denied"
+            }, status=HTTPStatus.FORBIDDEN)
+        try:
+            payload = self.get_payload(request)
+            updater = OrderBulkUpdater(payload.get("order_ids"), payload, user=request.user)
+            results = updater.run()
+            return JsonResponse({
+                "success": True,
+                "message": f"{sum(1 for result in results if result.get('updated'))} orders updated",
+                "results": results,
+            }, status=HTTPStatus.OK)
+        except ValueError as e:
+            return JsonResponse({
+                "success": False,
+                "message": str(e)
+            }, status=HTTPStatus.BAD_REQUEST)
+
 class OrderInvoiceView(View):
     def get_order(self, id):
         return get_object_or_404(Order, id=id)
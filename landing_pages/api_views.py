@@ -3,19 +3,11 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from django.db import transaction
-from django.shortcuts import get_object_or_404
 
-from decimal import Decimal
+from orders.utils import CheckoutService
 
-from catalog.models import Product, ProductVariant
-from orders.models import Order, OrderItem
-from accounts.models import CustomerProfile, CustomerAddress
-from landing_pages.models import HomePageLandingPage
-
-from .serializers import LandingPageProductSerializer
 from rest_framework.permissions import AllowAny
-from django.core.exceptions import ObjectDoesNotExist
-from .utils import OrderConfirmatinoEmailSend
+from .utils import OrderConfirmatinoEmailSend, LandingProductPayloadCache
 
 
 # ===============================
@@ -27,39 +19,29 @@ class LandingPageProductAPIView(APIView):
         code = request.query_params.get("code")
         product_id = request.query_params.get("product_id")
 
-        product = None
-
-        if code:
-            landing = HomePageLandingPage.objects.filter(
-                code=code,
-                is_active=True
-            ).first()
-
-            if not landing or not landing.product:
-                return Response({
-                    "success": False,
-                    "message": "Invalid or inactive landing code"
-                }, status=status.HTTP_404_NOT_FOUND)
-
-            product = landing.product
-        elif product_id:
-            product = get_object_or_404(Product, id=product_id)
-
-        else:
+        if not code and not product_id:
             return Response({
                 "success": False,
                 "message": "code or product_id is required"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = LandingPageProductSerializer(
-            product,
-            context={"request": request}
-        )
+        payload_cache = LandingProductPayloadCache(request)
+        product_id = payload_cache.get_product_id(code=code, product_id=product_id)
+        entry = payload_cache.get(product_id) if product_id else None
+        if entry is None:
+            return Response({
+                "success": False,
+                "message": "Invalid or inactive landing code" if code else "Product not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        headers = {"ETag": entry["etag"], "Cache-Control": "public, max-age=0, must-revalidate"}
+        if entry["etag"] in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
         return Response({
             "success": True,
-            "product": serializer.data
-        }, status=status.HTTP_200_OK)
+            "product": entry["product"]
+        }, status=status.HTTP_200_OK, headers=headers)
 
 # ===============================
 
@@ -68,30 +50,6 @@ class LandingPageProductAPIView(APIView):
 class LandingPageOrderAPIView(APIView):
     permission_classes = [AllowAny]
 
-    def get_make_address(self, customer: CustomerProfile, district: str, address: str, upazila=None, area=None):
-        address = CustomerAddress.objects.create(
-            customer=customer,
-            address= address,
-            # area= area,
-            # upazila= upazila,
-            district= district,
-        )
-        return address.get_address
-
-    def get_product(self, id):
-        try:
-            product = get_object_or_404(Product, id=id)
-            return product
-        except Product.DoesNotExist as e:
-            raise ObjectDoesNotExist("Product Not Found or Wrong Product ID")
-
-    def get_product_variant(self, product: object, sku: str):
-        try:
-            variant = get_object_or_404(ProductVariant, product=product, sku=sku)
-            return variant, variant.discount_price
-        except ProductVariant.DoesNotExist as e:
-            raise ObjectDoesNotExist("Product Variant Not Found or Wrong Product ID")
-
     def verify_input(self, data):
         required_fields = [
             "product_id", "delivery_charge",
@@ -103,23 +61,21 @@ class LandingPageOrderAPIView(APIView):
         missing_fields = [field for field in required_fields if not data.get(field)]
         return missing_fields
 
-    def get_price(self, variant: object, product: Product):
-        if variant:
-            c_unit_price = variant.price
-            d_unit_price = variant.discount_price or variant.price
-        else:
-            c_unit_price = product.price
-            d_unit_price = product.discount_price or product.price
-        return c_unit_price, d_unit_price
-
-    def get_customer(self, phone: str, full_name: str):
-        if CustomerProfile.objects.filter(phone=phone).exists():
-            customer = CustomerProfile.objects.filter(phone=phone).first()
-            customer.full_name = full_name
-            customer.save()
-        else:
-            customer = CustomerProfile.objects.create(phone=phone, full_name=full_name)
-        return customer
+    def get_metadata(self, data, phone, qty):
+        return {
+            "source": "landing_page",
+
+            "name": data.get("name"),
+            "phone": phone,
+
+            "address": data.get("address"),
+            "district": data.get("district"),
+
+            "qty": qty,
+            "product_id": data.get("product_id"),
+            "variant_sku": data.get("variant"),
+            "delivery_charge": str(data.get("delivery_charge")),
+        }
 
     def post(self, request):
         data = request.data
@@ -134,86 +90,31 @@ class LandingPageOrderAPIView(APIView):
         
         try:
             phone = str(data.get("phone")).strip()
-            name = data.get("name", "").strip()
-            address = data.get("address", "").strip()
-            city = data.get("district").strip()
-            qty = int(data.get("qty", 1))
-            delivery_charge = data.get("delivery_charge", 0)
+            qty = data.get("qty", 1)
+            checkout = CheckoutService(
+                product_id=data.get("product_id"),
+                variant_sku=data.get("variant"),
+                quantity=qty,
+                name=data.get("name"),
+                phone=phone,
+                district=data.get("district"),
+                address=data.get("address"),
+                shipping_total=data.get("delivery_charge", 0),
+                metadata=self.get_metadata(data, phone, qty),
+                idempotency_key=request.headers.get("Idempotency-Key") or data.get("idempotency_key"),
+            )
 
             with transaction.atomic():
-                product = self.get_product(data.get("product_id"))
-                variant = data.get("variant", None)
-                if variant:
-                    variant, price = self.get_product_variant(product, variant)
-                
-                if qty <= 0:
-                    return Response({
-                        "success": False,
-                        "message": "Quantity must be greater than 0"
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                c_unit_price, d_unit_price = self.get_price(variant, product)
-                customer = self.get_customer(phone, name)
-                address = self.get_make_address(customer, city, address)
-
-                # Create Order Object----
-                order = Order.objects.create(
-                    customer=customer,
-                    billing_address=address,
-                    shipping_address=address,
-                    shipping_total=Decimal(str(delivery_charge or 0)),
-                    metadata={
-                        "source": "landing_page",
-
-                        "name": data.get("name"),
-                        "phone": phone,
-
-                        "address": data.get("address"),
-                        "district": data.get("district"),
-
-                        "qty": qty,
-                        "product_id": product.id,
-                        "product_title": product.title,
-
-                        "variant_id": variant.id if variant else None,
-                        "variant_attributes": getattr(variant, "attributes", None),
-
-                        "unit_price": str(d_unit_price),
-                        "delivery_charge": str(delivery_charge),
-                        "total_estimate": str((d_unit_price * qty) + delivery_charge),
-                    }
-                )
-
-                # Order Item Create---
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    variant=variant,
-                    quantity=int(qty),
-
-                    c_unit_price=c_unit_price,
-                    d_unit_price=d_unit_price,
-
-                    total_price=Decimal(c_unit_price) * Decimal(qty),
-                    discount_total_price=Decimal(d_unit_price) * int(qty),
-
-                    product_snapshot={
-                        "product_id": product.id,
-                        "title": product.title,
-                        "variant_id": variant.id if variant else None,
-                        "attributes": getattr(variant, "attributes", None),
-                    }
-                )
-
-                if data.get("email"):
-                    send_mail = OrderConfirmatinoEmailSend(order, data.get("email"))
-                    send_mail.order_confirmation_mail_send()
-
-                return Response({
-                    "success": True,
-                    "order_id": order.order_id,
-                    "message": "Order placed successfully"
-                }, status=status.HTTP_201_CREATED)
+                result = checkout.place()
+                order = result.order
+                if result.created and data.get("email"):
+                    OrderConfirmatinoEmailSend(order, data.get("email")).enqueue()
+
+            return Response({
+                "success": True,
+                "order_id": order.order_id,
+                "message": "Order placed successfully" if result.created else "Order already placed"
+            }, status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK)
 
         except Exception as e:
             return Response({
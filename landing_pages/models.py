@@ -1,6 +1,13 @@
 from django.db import models
-from catalog.models import Product
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from catalog.models import Product, ProductVariant, ProductImage
+from settings_app.models import WhyBuyolex, DeliveryReturnPolicy
+from marketing.models import MarketingIntegration
 from .utix import LandingPageHeroType
+import uuid
 
 
 class HomePageLandingPage(models.Model):
@@ -14,5 +21,93 @@ class HomePageLandingPage(models.Model):
     hero_type = models.CharField(max_length=20, choices=LandingPageHeroType.choices, default=LandingPageHeroType.IMAGE)
     is_active = models.BooleanField(default=False)
 
+    CODES_CACHE_KEY = "landing:codes"
+    ACTIVE_CACHE_KEY = "landing:active"
+    PAGE_VERSION_CACHE_KEY = "landing:page:version"
+    PRODUCT_VERSION_CACHE_KEY = "landing:product:{product_id}:version"
+
+    @classmethod
+    def get_active_landing(cls):
+        # {"id", "product_id"} of the landing served at /, or {} when none is active
+        active = cache.get(cls.ACTIVE_CACHE_KEY)
+        if active is None:
+            active = cls.objects.filter(is_active=True).values("id", "product_id").first() or {}
+            cache.set(cls.ACTIVE_CACHE_KEY, active, None)
+        return active
+
+    @classmethod
+    def get_page_version(cls):
+        version = cache.get(cls.PAGE_VERSION_CACHE_KEY)
+        if version is None:
+            cache.add(cls.PAGE_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.PAGE_VERSION_CACHE_KEY)
+        return version
+
+    @classmethod
+    def bump_page_version(cls):
+        # After commit, like bump_product_version
+        transaction.on_commit(lambda: cache.set(cls.PAGE_VERSION_CACHE_KEY, uuid.uuid4().hex, None), robust=True)
+
+    @classmethod
+    def get_active_codes(cls):
+        # {code: product_id} for active landings, dropped whenever a landing changes
+        codes = cache.get(cls.CODES_CACHE_KEY)
+        if codes is None:
+            codes = dict(
+                cls.objects.filter(is_active=True, code__isnull=False, product__isnull=False).values_list("code", "product_id")
+            )
+            cache.set(cls.CODES_CACHE_KEY, codes, None)
+        return codes
+
+    @classmethod
+    def get_product_version(cls, product_id):
+        # Random token rather than a counter, so an evicted version never revives an old payload
+        key = cls.PRODUCT_VERSION_CACHE_KEY.format(product_id=product_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    @classmethod
+    def bump_product_version(cls, product_id):
+        # After commit, so a request racing the save cannot cache uncommitted data under the new version
+        if product_id:
+            key = cls.PRODUCT_VERSION_CACHE_KEY.format(product_id=product_id)
+            transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None), robust=True)
+
     def __str__(self) -> str:
         return f"Landing Page for Home - {self.product.title if self.product else "No Product"}"
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def landing_product_cache_product_changed(sender, instance, **kwargs):
+    HomePageLandingPage.bump_product_version(instance.id)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def landing_product_cache_media_changed(sender, instance, **kwargs):
+    HomePageLandingPage.bump_product_version(instance.product_id)
+
+
+@receiver(post_save, sender=HomePageLandingPage)
+@receiver(post_delete, sender=HomePageLandingPage)
+def landing_product_cache_landing_changed(sender, instance, **kwargs):
+    keys = [HomePageLandingPage.CODES_CACHE_KEY, HomePageLandingPage.ACTIVE_CACHE_KEY]
+    transaction.on_commit(lambda: cache.delete_many(keys), robust=True)
+    HomePageLandingPage.bump_page_version()
+    HomePageLandingPage.bump_product_version(instance.product_id)
+
+
+@receiver(post_save, sender=WhyBuyolex)
+@receiver(post_delete, sender=WhyBuyolex)
+@receiver(post_save, sender=DeliveryReturnPolicy)
+@receiver(post_delete, sender=DeliveryReturnPolicy)
+@receiver(post_save, sender=MarketingIntegration)
+@receiver(post_delete, sender=MarketingIntegration)
+def landing_page_cache_content_changed(sender, instance, **kwargs):
+    HomePageLandingPage.bump_page_version()
@@ -46,5 +46,5 @@ class LandingPageProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_variants(self, obj):
-        variants = obj.variants.filter(is_active=True)
+        variants = obj.active_variante
         return LandingPageVariantSerializer(variants, many=True).data
\ No newline at end of file
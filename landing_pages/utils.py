@@ -1,127 +1,166 @@
-from marketing.models import EmailConfig
-from marketing.utix import EmailConfigMailType, EmailConfigServerType
-from smtplib import SMTP, SMTP_SSL
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
-from email.utils import formataddr
-from accounts.models import CustomUser
-from accounts.utix import USER_TYPE
-from django.shortcuts import get_object_or_404
+from marketing.models import EmailOutbox
+from marketing.utix import EmailConfigMailType, EmailOutboxTemplate
+from marketing.utils import EmailTemplateRenderer
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.middleware.csrf import get_token
+from django.core.serializers.json import DjangoJSONEncoder
+from catalog.models import Product
+from orders.models import Order, OrderItem
+from .models import HomePageLandingPage
+from .serializers import LandingPageProductSerializer
+import hashlib
+import json
 
 
 class OrderConfirmatinoEmailSend:
-    def __init__(self, order, email) -> None:
+    # Order confirmation mail. Rendering works on whole batches: the orders and their
+    # items come from two queries however many orders are rendered.
+    TEMPLATE = EmailOutboxTemplate.ORDER_CONFIRMATION
+
+    def __init__(self, order, email=None) -> None:
         self.order = order
         self.email = email
 
-    def order_confirmation_mail_send(self):
-        email_server = EmailConfig.objects.filter(mail_type=EmailConfigMailType.NO_REPLY, is_active=True).first()
-        if email_server.server_type == EmailConfigServerType.SMTP:
-            subject = f"Successfully Confirm Your Order #{self.order.order_id}!"
-            html_body = self.get_dynamical_block_update(email_server)
-
-            mime_msg = MIMEMultipart('alternative')
-            mime_msg['Subject'] = str(Header(subject, 'utf-8'))
-            mime_msg['From'] = formataddr((email_server.name, email_server.email))
-            mime_msg['To'] = self.email
-            mime_msg["Reply-To"] = formataddr(("Samim Osman", email_server.reply_to))
-            mime_msg.attach(MIMEText(html_body, 'html', 'utf-8'))
-            
-            server = SMTP(host=email_server.host, port=email_server.port)
-            server.starttls()
-            server.login(email_server.host_user, email_server.host_password)
-            print("server login: ", server)
-            server.sendmail(
-                from_addr=email_server.email, to_addrs=self.email, msg=mime_msg.as_string()
+    def enqueue(self):
+        # Written in the caller's transaction; EmailOutboxWorker renders and sends it
+        return EmailOutbox.enqueue(
+            self.email,
+            template=self.TEMPLATE,
+            object_id=self.order.id,
+            mail_type=EmailConfigMailType.NO_REPLY,
+            dedupe_key=f"{self.TEMPLATE}:{self.order.id}:{self.email}",
+        )
+
+    @classmethod
+    def enqueue_many(cls, order_ids, campaign):
+        # Resend campaign: one outbox row per order whose customer has an email,
+        # deduplicated per campaign so rerunning it does not mail twice
+        orders = Order.objects.filter(id__in=order_ids, customer__user__email__isnull=False).values_list(
+            "id", "customer__user__email",
+        )
+        outbox = [
+            EmailOutbox(
+                to_email=email, template=cls.TEMPLATE, object_id=order_id, mail_type=EmailConfigMailType.NO_REPLY,
+                dedupe_key=f"{cls.TEMPLATE}:{order_id}:{email}:{campaign}",
             )
-            server.quit()
-            return True
-        return True
-    
-    def order_items_template(self):
-        order_items_html = ""
-        for item in self.order.items.all():
-            order_items_html += f"""
-                <tr>
-                    <td style='padding:10px;'>{item.product.title}</td>
-                    <td style='padding:10px;'>{item.quantity}</td>
-                    <td style='padding:10px;'>৳{item.d_unit_price}</td>
-                </tr>
-            """
-        return order_items_html
-    
-    def get_dynamical_block_update(self, email_server):
-        user = get_object_or_404(CustomUser, email=self.email, user_type=USER_TYPE.CUSTOMER)
-        if user:
-            user = user.customer_profile
-        order = self.order
-        order_items = self.order_items_template()
-        msg_body = f"""<!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>Order Confirmation</title>
-        </head>
-        <body style="margin:0; padding:0; font-family:Arial, Helvetica, sans-serif; background-color:#f4f4f4;">
-            <div style="max-width:600px; margin:20px auto; background:#ffffff; border-radius:8px; overflow:hidden; box-shadow:0 2px 8px rgba(0,0,0,0.1);">
-
-                <!-- Header -->
-                <div style="background:#177484; padding:20px; color:#ffffff; text-align:center;">
-                    <h2 style="margin:0; font-size:24px;">Order Confirmation</h2>
-                    <p style="margin:5px 0 0;">Thank you for shopping with us!</p>
-                </div>
-
-                <!-- Greeting -->
-                <div style="padding:20px;">
-                    <p style="font-size:16px; margin:0 0 10px;">Dear {user.full_name},</p>
-                    <p style="font-size:15px; line-height:1.6; color:#333333;">
-                        We’re happy to let you know that your order has been successfully placed.  
-                        Below are the details of your order:
-                    </p>
-
-                    <!-- Order Info -->
-                    <div style="background:#f9f9f9; padding:15px; border-left:4px solid #177484; margin:20px 0; border-radius:5px;">
-                        <p style="margin:5px 0; font-size:15px;"><strong>Order ID:</strong> #{order.order_id}</p>
-                        <p style="margin:5px 0; font-size:15px;"><strong>Order Date:</strong> {order.placed_at.strftime("%d %B %Y")}</p>
-                        <p style="margin:5px 0; font-size:15px;"><strong>Total Amount:</strong> ৳ <span style="text-decoration:line-through; color:#888;">{order.get_current_total }</span> <span style="color:#d32f2f; font-weight:bold; margin-left:5px;">{ order.get_discount_total }</span> ({order.get_discount_percentage}% OFF)</p>
-                        <p style="margin:5px 0; font-size:15px;"><strong>Payment Method:</strong> {order.payment_status}</p>
-                    </div>
-
-                    <!-- Items Table (Optional)
-                    Add if you have order items -->
-                    
-                    <h3 style="font-size:18px; margin-bottom:10px;">Order Items</h3>
-                    <table width="100%" style="border-collapse:collapse;">
-                        <tr style="background:#f1f1f1;">
-                            <th style="padding:10px; text-align:left;">Product</th>
-                            <th style="padding:10px; text-align:left;">Qty</th>
-                            <th style="padding:10px; text-align:left;">Price</th>
-                        </tr>
-                        {order_items}
-                    </table>
-                    
-
-                    <p style="font-size:15px; margin-top:20px; color:#333;">
-                        You will receive another email when your order is shipped.
-                    </p>
-
-                    <p style="font-size:15px; margin-top:25px;">
-                        If you have any questions, feel free to reply to this email.
-                    </p>
-
-                    <p style="font-size:16px; margin-top:20px;"><strong>Best regards,</strong><br>Your Company Team</p>
-                </div>
-
-                <!-- Footer -->
-                <div style="background:#eeeeee; padding:15px; text-align:center; font-size:12px; color:#555;">
-                    &copy; {order.placed_at.year} Your Company. All rights reserved.
-                </div>
-
-            </div>
-        </body>
-        </html>"""
-
-        return msg_body
-    
+            for order_id, email in orders if email
+        ]
+        EmailOutbox.objects.bulk_create(outbox, batch_size=500, ignore_conflicts=True)
+        return EmailOutbox.objects.filter(dedupe_key__in=[message.dedupe_key for message in outbox])
+
+    @staticmethod
+    def get_queryset():
+        items = OrderItem.objects.select_related("product").only(
+            "id", "order_id", "quantity", "d_unit_price", "product_snapshot", "product__id", "product__title",
+        )
+        return Order.objects.select_related("customer").prefetch_related(Prefetch("items", queryset=items))
+
+    @staticmethod
+    def get_context(order):
+        customer = order.customer
+        items = [
+            {
+                "title": item.product_snapshot.get("title") or (item.product.title if item.product else ""),
+                "quantity": item.quantity,
+                "unit_price": item.d_unit_price,
+            }
+            for item in order.items.all()
+        ]
+        # Guest checkouts have no user account; the name comes from the order's customer profile
+        customer_name = (customer.full_name if customer else "") or order.metadata.get("name") or "Customer"
+        return {"order": order, "customer_name": customer_name, "items": items}
+
+    def render(self):
+        return EmailTemplateRenderer(self.TEMPLATE).render(self.get_context(self.order))
+
+    @classmethod
+    def render_many(cls, order_ids):
+        orders = cls.get_queryset().in_bulk(list(order_ids))
+        return EmailTemplateRenderer(cls.TEMPLATE).render_many(
+            {order_id: cls.get_context(order) for order_id, order in orders.items()}
+        )
+
+    @classmethod
+    def render_outbox(cls, messages):
+        rendered = cls.render_many({message.object_id for message in messages})
+        return {
+            message.id: rendered.get(message.object_id) or ValueError(f"Order {message.object_id} not found")
+            for message in messages
+        }
+
+
+class LandingProductPayloadCache:
+    # Serialized landing product payload, cached per product and per site host (the image
+    # URLs are absolute) under the product's cache version. Catalog and landing signals
+    # bump the version, so edits show up on the next request without deleting keys.
+    PAYLOAD_CACHE_KEY = "landing:product:{product_id}:{version}:{host}"
+    TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_product_id(self, code=None, product_id=None):
+        if code:
+            return HomePageLandingPage.get_active_codes().get(code)
+        try:
+            return int(product_id)
+        except (TypeError, ValueError):
+            return None
+
+    def get_cache_key(self, product_id):
+        host = hashlib.md5(self.request.build_absolute_uri("/").encode()).hexdigest()[:12]
+        version = HomePageLandingPage.get_product_version(product_id)
+        return self.PAYLOAD_CACHE_KEY.format(product_id=product_id, version=version, host=host)
+
+    def build(self, product_id):
+        product = Product.objects.with_media().filter(id=product_id).first()
+        if product is None:
+            return None
+        data = LandingPageProductSerializer(product, context={"request": self.request}).data
+        body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        return {"etag": f'"{hashlib.md5(body.encode()).hexdigest()}"', "product": json.loads(body)}
+
+    def get(self, product_id):
+        key = self.get_cache_key(product_id)
+        entry = cache.get(key)
+        if entry is None:
+            entry = self.build(product_id)
+            if entry is None:
+                return None
+            cache.set(key, entry, self.TIMEOUT)
+        return entry
+
+
+class LandingPageCache:
+    # Rendered HTML of the landing page, keyed on the active landing, the page version
+    # (landing, site content, pixel settings) and the product's cache version, so a hit
+    # needs only cache reads. The CSRF token is left as a placeholder in the cached HTML
+    # and filled in per request.
+    PAGE_CACHE_KEY = "landing:page:{landing_id}:{page_version}:{product_version}"
+    CSRF_PLACEHOLDER = "__landing_csrf_token__"
+    TIMEOUT = 60 * 60 * 24
+
+    def __init__(self, request):
+        self.request = request
+
+    def get_cache_key(self):
+        active = HomePageLandingPage.get_active_landing()
+        if not active or not active["product_id"]:
+            return None
+        return self.PAGE_CACHE_KEY.format(
+            landing_id=active["id"],
+            page_version=HomePageLandingPage.get_page_version(),
+            product_version=HomePageLandingPage.get_product_version(active["product_id"]),
+        )
+
+    def get(self, key):
+        html = cache.get(key) if key else None
+        if html is None:
+            return None
+        return html.replace(self.CSRF_PLACEHOLDER, get_token(self.request))
 
+    def set(self, key, html):
+        if key:
+            cache.set(key, html, self.TIMEOUT)
+        return html.replace(self.CSRF_PLACEHOLDER, get_token(self.request))
@@ -1,28 +1,38 @@
 from datetime import datetime
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.template.loader import render_to_string
+from django.db.models import Prefetch
 from .models import HomePageLandingPage
 from catalog.utix import PRODUCT_MEDIA_ROLE
 from .utix import LandingPageHeroType
 from settings_app.models import WhyBuyolex, DeliveryReturnPolicy
 import time
 from django.views import View
-from catalog.models import Product, ProductVariant
+from catalog.models import Product
 from http import HTTPStatus
-from django.core.exceptions import ObjectDoesNotExist
-from orders.models import Order, OrderItem
-from accounts.models import CustomUser, CustomerProfile, CustomerAddress
-from .utils import OrderConfirmatinoEmailSend
+from orders.models import Order
+from orders.utils import CheckoutService
+from .utils import OrderConfirmatinoEmailSend, LandingPageCache
 from django.db import transaction
-from django.utils.text import slugify
-from decimal import Decimal
 
 
 def product_landing_page(request):
     try:
-        landing_page_product = HomePageLandingPage.objects.filter(is_active=True).first()
+        page_cache = None if request.user.is_authenticated else LandingPageCache(request)
+        cache_key = page_cache.get_cache_key() if page_cache else None
+        html = page_cache.get(cache_key) if page_cache else None
+        if html is not None:
+            return HttpResponse(html)
+
+        landing_page_product = (
+            HomePageLandingPage.objects
+            .filter(is_active=True)
+            .prefetch_related(Prefetch("product", queryset=Product.objects.with_media()))
+            .first()
+        )
         product = landing_page_product.product
-        primary_hero = product.images.filter(role=PRODUCT_MEDIA_ROLE.PRIMARY).first()
+        primary_hero = next((image for image in product.images.all() if image.role == PRODUCT_MEDIA_ROLE.PRIMARY), None)
         # if len(product.videos.all()) > 0 and landing_page_product.hero_type == LandingPageHeroType.VIDEO:
         #     primary_hero = product.videos.all().first()
         # else:
@@ -33,7 +43,11 @@ def product_landing_page(request):
             "whybuyolex": WhyBuyolex.objects.first(),
             "deliveryreturnpolicy": DeliveryReturnPolicy.objects.first()
         }
-        return render(request, "02/product_landing_page.html", context)
+        if page_cache is None:
+            return render(request, "02/product_landing_page.html", context)
+        context["csrf_token"] = LandingPageCache.CSRF_PLACEHOLDER
+        html = render_to_string("02/product_landing_page.html", context, request=request)
+        return HttpResponse(page_cache.set(cache_key, html))
     except Exception as e:
         return JsonResponse(
             {
@@ -52,70 +66,6 @@ class CreateOrderView(View):
             }, status=HTTPStatus.METHOD_NOT_ALLOWED
         )
     
-    def get_product(self, id):
-        try:
-            product = get_object_or_404(Product, id=id)
-            return product
-        except Product.DoesNotExist as e:
-            raise ObjectDoesNotExist("Product Not Found or Wrong Product ID")
-
-    def get_product_variante(self, product: object, sku: str):
-        try:
-            variante = get_object_or_404(ProductVariant, product=product, sku=sku)
-            return variante, variante.discount_price
-        except ProductVariant.DoesNotExist as e:
-            raise ObjectDoesNotExist("Product Variante Not Found or Wrong Product ID")
-    
-    def price_verify___(self, input_price, price):
-        if Decimal(price) != Decimal(input_price):
-            raise Exception("Input Price and Product Price not Same!")
-        return True
-
-    def generate_unique_username(self, name):
-        base = slugify(name) or "user"
-        username = base
-        counter = 1
-        while CustomUser.objects.filter(username=username).exists():
-            username = f"{username}-{counter}"
-            counter += 1
-        return username
-
-    def get_user_profile(self, name, phone, whatsapp=None, email=None):
-        if email:
-            user = CustomUser.objects.filter(email=email).first()
-            if user:
-                customer_profile = user.customer_profile
-                if whatsapp:
-                    customer_profile.whatsapp = whatsapp
-                customer_profile.save()
-                return customer_profile
-            
-            user = CustomUser.objects.create(
-                email=email, full_name=name, username=self.generate_unique_username(name)
-            )
-            customer = user.customer_profile
-            customer.phone = phone
-            if whatsapp:
-                customer.whatsapp = whatsapp
-            customer.save()
-            return customer
-        else:
-            customer, created = CustomerProfile.objects.get_or_create(
-                phone=phone, whatsapp=whatsapp,
-                defaults={"full_name": name}
-            )
-        return customer
-    
-    def get_make_address(self, customer, district, upazila, area, address):
-        address = CustomerAddress.objects.create(
-            customer=customer,
-            address= address,
-            # area= area,
-            # upazila= upazila,
-            district= district,
-        )
-        return address.get_address
-    
     def verify_input(self, data):
         required_fields = [
             "product_id", "product_price", "name", "phone",
@@ -157,45 +107,34 @@ class CreateOrderView(View):
                     status=HTTPStatus.BAD_REQUEST
                 )
 
+            checkout = CheckoutService(
+                product_id=data.get("product_id"),
+                variant_sku=data.get("variante"),
+                quantity=data.get("qty"),
+                name=data.get("name"),
+                phone=data.get("phone"),
+                whatsapp=data.get("whatsapp"),
+                email=data.get("email"),
+                district=data.get("district"),
+                upazila=data.get("upazila"),
+                area=data.get("area"),
+                address=data.get("address"),
+                shipping_total=data.get("delivery_charge"),
+                metadata={"note": data.get("notes"), "extra_personal_info": extra_personal_info},
+                idempotency_key=request.headers.get("Idempotency-Key") or data.get("idempotency_key"),
+                expected_unit_price=data.get("product_price"),
+            )
             with transaction.atomic():
-                product = self.get_product(data.get("product_id"))
-                variante = None
-                if data.get("variante"):
-                    variante, price = self.get_product_variante(product, data.get("variante"))
-                
-                self.price_verify___(data.get("product_price"), product.discount_price)
-                customer = self.get_user_profile(data.get("name"), data.get("phone"), data.get("whatsapp"), data.get("email") or None)
-
-                address = self.get_make_address(customer, data.get("district"), data.get("upazila", None), data.get("area", None), data.get("address", None))
-                
-                qty = data.get("qty")
-                metadata = {"note": data.get("notes"), "extra_personal_info": extra_personal_info}
-                order = Order.objects.create(
-                    customer = customer,
-                    billing_address = address,
-                    shipping_address = address,
-                    metadata=metadata,
-                    shipping_total=data.get("delivery_charge")
-                )
-                
-                OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    variant=variante,
-                    quantity=int(qty),
-                    c_unit_price=product.price,
-                    d_unit_price=product.discount_price,
-                )
-                if data.get("email"):
-                    send_mail = OrderConfirmatinoEmailSend(order, data.get("email"))
-                    send_mail.order_confirmation_mail_send()
+                result = checkout.place()
+                if result.created and data.get("email"):
+                    OrderConfirmatinoEmailSend(result.order, data.get("email")).enqueue()
 
-                return JsonResponse(
-                    {
-                        "success": True,
-                        "message": "Order Successfully Created!"
-                    }, status=HTTPStatus.CREATED
-                )
+            return JsonResponse(
+                {
+                    "success": True,
+                    "message": "Order Successfully Created!" if result.created else "Order Already Created!"
+                }, status=HTTPStatus.CREATED if result.created else HTTPStatus.OK
+            )
         except Exception as e:
             print("Error in CreateOrderView: ", e)
             return JsonResponse(
@@ -4,4 +4,4 @@ from .models import *
 admin.site.register(MarketingIntegration)
 admin.site.register(MarketingEventLog)
 admin.site.register(EmailConfig)
-
+admin.site.register(EmailOutbox)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from marketing.utils import EmailOutboxWorker, SMTPConnectionPool
+from marketing.utix import EmailOutboxStatus
+import time
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process one batch and exit.")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds to wait when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        worker = EmailOutboxWorker(batch_size=options["batch_size"])
+        try:
+            while True:
+                messages = worker.run_once()
+                for message in messages:
+                    style = self.style.SUCCESS if message.status == EmailOutboxStatus.SENT else self.style.WARNING
+                    self.stdout.write(style(f"{message.to_email}: {message.status} (attempt {message.attempts}) {message.last_error or ''}"))
+                if options["once"]:
+                    break
+                if not messages:
+                    time.sleep(options["sleep"])
+        finally:
+            SMTPConnectionPool.close_all()
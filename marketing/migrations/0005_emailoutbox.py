@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 16:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketing', '0004_alter_marketingintegration_provider_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mail_type', models.CharField(choices=[('info', 'Info'), ('no_reply', 'No Reply'), ('contact', 'Contact'), ('career', 'Career')], default='no_reply', max_length=25)),
+                ('template', models.CharField(blank=True, choices=[('order_confirmation', 'Order Confirmation')], max_length=50, null=True)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('to_email', models.EmailField(max_length=255)),
+                ('subject', models.CharField(blank=True, max_length=255, null=True)),
+                ('html_body', models.TextField(blank=True, null=True)),
+                ('text_body', models.TextField(blank=True, null=True)),
+                ('dedupe_key', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('config', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox', to='marketing.emailconfig')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
-from .utix import EmailConfigServerType, EmailConfigMailType, MarketingIntegrationProviderChoices, MarketingIntegrationStatusChoices
+from django.db.models import F, Q
+from django.core.cache import cache
+from django.utils import timezone
+from .utix import EmailConfigServerType, EmailConfigMailType, MarketingIntegrationProviderChoices, MarketingIntegrationStatusChoices, EmailOutboxStatus, EmailOutboxTemplate
 
 class MarketingIntegration(models.Model):
     provider = models.CharField(max_length=64, choices=MarketingIntegrationProviderChoices.choices)
@@ -48,10 +51,65 @@ class EmailConfig(models.Model):
     today_complete = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     
+    DOWN_CACHE_KEY = "marketing:email_config:{id}:down"
+    DOWN_SECONDS = 120
+
+    @classmethod
+    def reset_daily_counts(cls, **filters):
+        # Rows still counting a previous day start today from zero
+        today = timezone.now().date()
+        return cls.objects.filter(**filters).filter(
+            Q(today_date__isnull=True) | ~Q(today_date=today) | Q(today_count__isnull=True)
+        ).update(today_count=0, today_date=today, today_complete=False)
+
+    @property
+    def remaining_quota(self):
+        if self.daily_limit is None:
+            return None
+        if self.today_date != timezone.now().date():
+            return self.daily_limit
+        return max(self.daily_limit - (self.today_count or 0), 0)
+
+    def reserve_quota(self, count):
+        # Takes up to count sends from today's quota with a conditional F() increment,
+        # so concurrent workers never push a config past daily_limit. Returns the grant.
+        today = timezone.now().date()
+        for _ in range(3):
+            row = EmailConfig.objects.filter(pk=self.pk).values("today_count", "today_date").first()
+            if row is None:
+                return 0
+            if row["today_date"] != today or row["today_count"] is None:
+                EmailConfig.reset_daily_counts(pk=self.pk)
+                continue
+            granted = count if self.daily_limit is None else min(count, self.daily_limit - row["today_count"])
+            if granted <= 0:
+                EmailConfig.objects.filter(pk=self.pk, today_date=today).update(today_complete=True)
+                self.today_complete = True
+                return 0
+            queryset = EmailConfig.objects.filter(pk=self.pk, today_date=today)
+            if self.daily_limit is not None:
+                queryset = queryset.filter(today_count__lte=self.daily_limit - granted)
+            complete = self.daily_limit is not None and row["today_count"] + granted >= self.daily_limit
+            if queryset.update(today_count=F("today_count") + granted, today_complete=complete):
+                self.today_count = row["today_count"] + granted
+                self.today_date = today
+                self.today_complete = complete
+                return granted
+        return 0
+
+    def release_quota(self, count):
+        # Gives back reserved sends that were never delivered
+        if count <= 0:
+            return 0
+        return EmailConfig.objects.filter(
+            pk=self.pk, today_date=timezone.now().date(), today_count__gte=count,
+        ).update(today_count=F("today_count") - count, today_complete=False)
+
     def increase_today_count(self):
-        self.today_count += 1
-        if self.today_count == self.daily_limit:
-            self.today_complete = True
+        return self.reserve_quota(1) == 1
+
+    def mark_down(self):
+        cache.set(self.DOWN_CACHE_KEY.format(id=self.pk), True, self.DOWN_SECONDS)
     
     def save(self, *args, **kwargs):
         return super().save(*args, **kwargs)
@@ -62,3 +120,44 @@ class EmailConfig(models.Model):
         return f"{self.email} | {self.host} | LIMIT {self.daily_limit} | Active: {self.is_active}" if self.email else f"{self.server} | {self.api_key}"
 
 
+class EmailOutbox(models.Model):
+    # Outgoing mail, written in the caller's transaction and sent by the
+    # run_email_outbox_worker command. Template messages are rendered at send time
+    # from object_id; others carry their own subject and bodies.
+    mail_type = models.CharField(max_length=25, choices=EmailConfigMailType.choices, default=EmailConfigMailType.NO_REPLY)
+    template = models.CharField(max_length=50, choices=EmailOutboxTemplate.choices, blank=True, null=True)
+    object_id = models.PositiveBigIntegerField(blank=True, null=True)
+    to_email = models.EmailField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True, null=True)
+    html_body = models.TextField(blank=True, null=True)
+    text_body = models.TextField(blank=True, null=True)
+    dedupe_key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=EmailOutboxStatus.choices, default=EmailOutboxStatus.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    config = models.ForeignKey(EmailConfig, on_delete=models.SET_NULL, null=True, blank=True, related_name="outbox")
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="email_outbox_due_idx"),
+        ]
+
+    @classmethod
+    def enqueue(cls, to_email, template=None, object_id=None, mail_type=EmailConfigMailType.NO_REPLY, dedupe_key=None, **message):
+        if dedupe_key:
+            outbox, _ = cls.objects.get_or_create(
+                dedupe_key=dedupe_key,
+                defaults={"to_email": to_email, "template": template, "object_id": object_id, "mail_type": mail_type, **message},
+            )
+            return outbox
+        return cls.objects.create(to_email=to_email, template=template, object_id=object_id, mail_type=mail_type, **message)
+
+    def __str__(self):
+        return f"{self.template or self.subject} to {self.to_email} ({self.status})"
@@ -1,3 +1,262 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from datetime import timedelta
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+import threading
+from accounts.models import CustomUser, CustomerProfile
+from landing_pages.utils import OrderConfirmatinoEmailSend
+from catalog.models import Product
+from orders.models import Order, OrderItem
+from .models import EmailConfig, EmailOutbox
+from .utils import EmailOutboxWorker, SMTPConnectionPool
+from .utix import EmailConfigMailType, EmailOutboxStatus
+
+
+class FakeSMTPHandler(StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 fake ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-fake")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                server.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                if server.reject_with:
+                    self.reply(server.reject_with)
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b""):
+                        break
+                    lines.append(data.decode())
+                server.messages.append("".join(lines))
+                self.reply("250 OK")
+            elif verb in ("NOOP", "RSET"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer:
+    # Plain-text SMTP stand-in that records connections, logins and messages
+    def __init__(self):
+        ThreadingTCPServer.allow_reuse_address = True
+        self.server = ThreadingTCPServer(("127.0.0.1", 0), FakeSMTPHandler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.logins = 0
+        self.server.messages = []
+        self.server.reject_with = None
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class EmailOutboxWorkerTests(TestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer().__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        self.addCleanup(SMTPConnectionPool.close_all)
+        cache.clear()
+        self.config = EmailConfig.objects.create(
+            mail_type=EmailConfigMailType.NO_REPLY, host="127.0.0.1", port=str(self.smtp.port), tls=False,
+            host_user="noreply@example.com", host_password="secret", email="noreply@example.com", name="Shop",
+        )
+
+    def test_batch_shares_one_session_across_runs(self):
+        for index in range(3):
+            EmailOutbox.enqueue(f"customer{index}@example.com", subject="Hello", html_body="<p>Hi</p>")
+
+        EmailOutboxWorker().run_once()
+        EmailOutbox.enqueue("late@example.com", subject="Hello", html_body="<p>Hi</p>")
+        EmailOutboxWorker().run_once()
+
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatus.SENT, config=self.config).count(), 4)
+        self.assertEqual(len(self.smtp.server.messages), 4)
+        self.assertEqual((self.smtp.server.connections, self.smtp.server.logins), (1, 1))
+
+    def create_order(self, customer=None):
+        customer = customer or CustomerProfile.objects.create(full_name="Rahim", phone="01711111111")
+        order = Order.objects.create(customer=customer)
+        product = Product.objects.filter(title="Panjabi").first() or Product.objects.create(title="Panjabi", price=100, discount_price=90)
+        OrderItem.objects.create(order=order, product=product, quantity=2, c_unit_price=100, d_unit_price=90)
+        return order
+
+    def test_guest_order_confirmation_is_rendered_at_send_time(self):
+        order = self.create_order()
+        outbox = OrderConfirmatinoEmailSend(order, "guest@example.com").enqueue()
+        self.assertEqual(OrderConfirmatinoEmailSend(order, "guest@example.com").enqueue(), outbox)
+
+        EmailOutboxWorker().run_once()
+
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, EmailOutboxStatus.SENT, outbox.last_error)
+        self.assertIn(order.order_id, outbox.subject)
+        self.assertEqual(len(self.smtp.server.messages), 1)
+        self.assertIn("text/plain", self.smtp.server.messages[0])
+        self.assertIn("text/html", self.smtp.server.messages[0])
+
+    def test_batch_render_uses_constant_queries(self):
+        customer = CustomerProfile.objects.create(full_name="Rahim & Sons", phone="01711111111")
+        orders = [self.create_order(customer) for _ in range(5)]
+
+        with self.assertNumQueries(2):
+            rendered = OrderConfirmatinoEmailSend.render_many([order.id for order in orders])
+
+        subject, html_body, text_body = rendered[orders[0].id]
+        self.assertEqual(subject, f"Successfully Confirm Your Order #{orders[0].order_id}!")
+        self.assertIn("Rahim &amp; Sons", html_body)
+        self.assertIn("Dear Rahim & Sons,", text_body)
+        self.assertIn("- Panjabi x 2", text_body)
+
+    def test_resend_campaign_enqueues_once_per_order(self):
+        user = CustomUser.objects.create(username="rahim", email="rahim@example.com")
+        orders = [self.create_order(user.customer_profile), self.create_order()]
+
+        OrderConfirmatinoEmailSend.enqueue_many([order.id for order in orders], campaign="eid")
+        OrderConfirmatinoEmailSend.enqueue_many([order.id for order in orders], campaign="eid")
+
+        self.assertEqual(list(EmailOutbox.objects.values_list("object_id", "to_email")), [(orders[0].id, "rahim@example.com")])
+
+    def test_rejections_fail_or_retry_by_smtp_code(self):
+        EmailOutbox.enqueue("busy@example.com", subject="Hello", html_body="<p>Hi</p>")
+        self.smtp.server.reject_with = "451 Try again later"
+        EmailOutboxWorker().run_once()
+        outbox = EmailOutbox.objects.get()
+        self.assertEqual((outbox.status, outbox.attempts), (EmailOutboxStatus.QUEUED, 1))
+        self.assertGreater(outbox.next_attempt_at, outbox.updated_at)
+
+        EmailOutbox.objects.update(next_attempt_at=outbox.updated_at)
+        self.smtp.server.reject_with = "550 No such user"
+        EmailOutboxWorker().run_once()
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, EmailOutboxStatus.FAILED)
+        self.assertFalse(self.smtp.server.messages)
+
+    def test_unsendable_address_fails_without_stopping_the_batch(self):
+        self.config.daily_limit = 10
+        self.config.save()
+        EmailOutbox.enqueue("user@bücher.de", subject="Hello", html_body="<p>Hi</p>")
+        EmailOutbox.enqueue("customer@example.com", subject="Hello", html_body="<p>Hi</p>")
+
+        EmailOutboxWorker().run_once()
+
+        idn = EmailOutbox.objects.get(to_email="user@bücher.de")
+        self.assertEqual(idn.status, EmailOutboxStatus.FAILED)
+        self.assertIn("UnicodeEncodeError", idn.last_error)
+        self.assertEqual(EmailOutbox.objects.get(to_email="customer@example.com").status, EmailOutboxStatus.SENT)
+        self.config.refresh_from_db()
+        self.assertEqual(self.config.today_count, 1)
+
+    def test_stale_message_on_its_last_attempt_is_failed(self):
+        outbox = EmailOutbox.enqueue("customer@example.com", subject="Hello", html_body="<p>Hi</p>")
+        EmailOutbox.objects.filter(id=outbox.id).update(
+            status=EmailOutboxStatus.RUNNING, attempts=outbox.max_attempts, locked_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertEqual(EmailOutboxWorker().run_once(), [])
+
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, EmailOutboxStatus.FAILED)
+        self.assertFalse(self.smtp.server.messages)
+
+
+class EmailSenderPoolTests(TestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer().__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        self.addCleanup(SMTPConnectionPool.close_all)
+        cache.clear()
+
+    def create_config(self, port=None, **kwargs):
+        return EmailConfig.objects.create(
+            mail_type=EmailConfigMailType.NO_REPLY, host="127.0.0.1", port=str(port or self.smtp.port), tls=False,
+            email="noreply@example.com", **kwargs,
+        )
+
+    def enqueue(self, count):
+        for index in range(count):
+            EmailOutbox.enqueue(f"customer{index}@example.com", subject="Hello", html_body="<p>Hi</p>")
+
+    def test_quota_limits_and_spreads_sends(self):
+        small = self.create_config(daily_limit=3)
+        large = self.create_config(daily_limit=100)
+        self.enqueue(30)
+
+        EmailOutboxWorker().run_once()
+
+        small.refresh_from_db()
+        large.refresh_from_db()
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatus.SENT).count(), 30)
+        self.assertLessEqual(small.today_count, 3)
+        self.assertEqual(small.today_count + large.today_count, 30)
+        self.assertEqual(small.today_complete, small.today_count == 3)
+
+    def test_exhausted_pool_requeues(self):
+        config = self.create_config(daily_limit=2)
+        self.enqueue(3)
+
+        EmailOutboxWorker().run_once()
+
+        config.refresh_from_db()
+        self.assertEqual((config.today_count, config.today_complete), (2, True))
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatus.SENT).count(), 2)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatus.QUEUED).count(), 1)
+
+    def test_counts_reset_on_a_new_day(self):
+        config = self.create_config(
+            daily_limit=2, today_count=2, today_complete=True, today_date=timezone.now().date() - timedelta(days=1),
+        )
+        self.enqueue(1)
+
+        EmailOutboxWorker().run_once()
+
+        config.refresh_from_db()
+        self.assertEqual((config.today_count, config.today_date, config.today_complete), (1, timezone.now().date(), False))
+
+    def test_unreachable_server_fails_over(self):
+        with FakeSMTPServer() as closed:
+            port = closed.port
+        down = self.create_config(port=port)
+        up = self.create_config(daily_limit=50)
+        self.enqueue(10)
+
+        EmailOutboxWorker().run_once()
+
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutboxStatus.SENT, config=up).count(), 10)
+        down.refresh_from_db()
+        self.assertEqual(down.today_count, 0)
+        self.assertTrue(cache.get(EmailConfig.DOWN_CACHE_KEY.format(id=down.id)))
 
-# Create your tests here.
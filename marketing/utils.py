@@ -0,0 +1,371 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+from smtplib import SMTP, SMTP_SSL, SMTPAuthenticationError, SMTPException, SMTPRecipientsRefused, SMTPResponseException, SMTPServerDisconnected
+from .models import EmailConfig, EmailOutbox
+from .utix import EmailConfigServerType, EmailOutboxStatus, EmailOutboxTemplate
+import os
+import random
+import socket
+import threading
+import time
+
+
+class SMTPConnectionPool:
+    # Long-lived SMTP sessions per EmailConfig (and its credentials), shared by every
+    # batch the process sends. A session is recycled after MAX_MESSAGES or MAX_AGE, and
+    # checked with NOOP before a batch when it has been idle.
+    TIMEOUT = 30
+    MAX_MESSAGES = 100
+    MAX_AGE = 300
+    IDLE_CHECK = 30
+    _connections = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_key(config):
+        return (config.id, config.host, config.port, config.host_user, config.host_password, config.ssl, config.tls)
+
+    @classmethod
+    def open(cls, config):
+        smtp_class = SMTP_SSL if config.ssl else SMTP
+        connection = smtp_class(host=config.host, port=int(config.port or (465 if config.ssl else 587)), timeout=cls.TIMEOUT)
+        if config.tls and not config.ssl:
+            connection.starttls()
+        if config.host_user:
+            connection.login(config.host_user, config.host_password)
+        return {"connection": connection, "sent": 0, "opened_at": time.monotonic(), "used_at": time.monotonic()}
+
+    @classmethod
+    def is_usable(cls, entry):
+        now = time.monotonic()
+        if entry["sent"] >= cls.MAX_MESSAGES or now - entry["opened_at"] >= cls.MAX_AGE:
+            return False
+        if now - entry["used_at"] >= cls.IDLE_CHECK:
+            try:
+                return entry["connection"].noop()[0] == 250
+            except (SMTPException, OSError):
+                return False
+        return True
+
+    @classmethod
+    def get(cls, config):
+        key = cls.get_key(config)
+        with cls._lock:
+            entry = cls._connections.pop(key, None)
+        if entry is not None and not cls.is_usable(entry):
+            cls.close_entry(entry)
+            entry = None
+        return entry or cls.open(config)
+
+    @classmethod
+    def release(cls, config, entry):
+        entry["used_at"] = time.monotonic()
+        key = cls.get_key(config)
+        with cls._lock:
+            previous = cls._connections.get(key)
+            cls._connections[key] = entry
+        if previous is not None and previous is not entry:
+            cls.close_entry(previous)
+
+    @staticmethod
+    def close_entry(entry):
+        try:
+            entry["connection"].quit()
+        except (SMTPException, OSError):
+            try:
+                entry["connection"].close()
+            except OSError:
+                pass
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            entries = list(cls._connections.values())
+            cls._connections.clear()
+        for entry in entries:
+            cls.close_entry(entry)
+
+
+class EmailTemplateRenderer:
+    # Subject, HTML and plain-text parts of one kind of email, from
+    # emails/<name>/subject.txt, body.html and body.txt. Compiled templates are kept for
+    # the life of the process, so rendering a batch costs no template loading.
+    PARTS = ("subject.txt", "body.html", "body.txt")
+    _templates = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+        self.templates = self.get_templates(name)
+
+    @classmethod
+    def get_templates(cls, name):
+        templates = cls._templates.get(name)
+        if templates is None:
+            templates = tuple(get_template(f"emails/{name}/{part}") for part in cls.PARTS)
+            with cls._lock:
+                cls._templates[name] = templates
+        return templates
+
+    def render(self, context):
+        subject, html_body, text_body = (template.render(context) for template in self.templates)
+        return " ".join(subject.split()), html_body, text_body.strip() + "\n"
+
+    def render_many(self, contexts):
+        return {key: self.render(context) for key, context in contexts.items()}
+
+
+class EmailSenderPool:
+    # Active SMTP configs of one mail_type, weighted by the quota they have left today.
+    # Configs that are complete for the day or marked down after a failure are skipped.
+    UNLIMITED_WEIGHT = 1000
+
+    def __init__(self, mail_type):
+        self.mail_type = mail_type
+        EmailConfig.reset_daily_counts(mail_type=mail_type)
+        configs = list(EmailConfig.objects.filter(
+            mail_type=mail_type, is_active=True, server_type=EmailConfigServerType.SMTP, today_complete=False,
+        ).order_by("id"))
+        down = cache.get_many([EmailConfig.DOWN_CACHE_KEY.format(id=config.id) for config in configs])
+        self.configs = [config for config in configs if EmailConfig.DOWN_CACHE_KEY.format(id=config.id) not in down]
+
+    def get_weight(self, config):
+        remaining = config.remaining_quota
+        return self.UNLIMITED_WEIGHT if remaining is None else remaining
+
+    def allocate(self, messages, exclude=()):
+        configs = [config for config in self.configs if config.id not in exclude and self.get_weight(config) > 0]
+        if not configs:
+            return []
+        weights = [self.get_weight(config) for config in configs]
+        groups = defaultdict(list)
+        for message, config in zip(messages, random.choices(configs, weights=weights, k=len(messages))):
+            groups[config.id].append(message)
+        return [(config, groups[config.id]) for config in configs if groups[config.id]]
+
+
+class EmailOutboxWorker:
+    # Sends queued EmailOutbox rows. Rows are claimed with a conditional UPDATE
+    # (status queued -> running), rendered in bulk per template, grouped per EmailConfig
+    # and sent through one pooled SMTP session per config.
+    LEASE_SECONDS = 300
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 3600
+    MAX_BATCH_SIZE = 500
+    RENDERERS = {
+        EmailOutboxTemplate.ORDER_CONFIRMATION: "landing_pages.utils.OrderConfirmatinoEmailSend",
+    }
+
+    def __init__(self, worker_id=None, batch_size=50):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = min(batch_size, self.MAX_BATCH_SIZE)
+
+    def release_stale(self):
+        # Rows on their last attempt are failed rather than queued again, so a message
+        # that keeps killing the worker cannot loop forever.
+        now = timezone.now()
+        stale = EmailOutbox.objects.filter(
+            status=EmailOutboxStatus.RUNNING, locked_at__lt=now - timedelta(seconds=self.LEASE_SECONDS),
+        )
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status=EmailOutboxStatus.FAILED, locked_at=None, locked_by=None, updated_at=now,
+            last_error="Worker lease expired on the last attempt",
+        )
+        return stale.update(status=EmailOutboxStatus.QUEUED, locked_at=None, locked_by=None, updated_at=now)
+
+    def claim(self):
+        now = timezone.now()
+        due = list(
+            EmailOutbox.objects
+            .filter(status=EmailOutboxStatus.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", "attempts", "max_attempts")[:self.batch_size]
+        )
+        exhausted = [outbox_id for outbox_id, attempts, max_attempts in due if attempts >= max_attempts]
+        if exhausted:
+            EmailOutbox.objects.filter(id__in=exhausted, status=EmailOutboxStatus.QUEUED).update(
+                status=EmailOutboxStatus.FAILED, updated_at=now,
+            )
+        due = [outbox_id for outbox_id, attempts, max_attempts in due if attempts < max_attempts]
+        if not due:
+            return []
+        EmailOutbox.objects.filter(id__in=due, status=EmailOutboxStatus.QUEUED).update(
+            status=EmailOutboxStatus.RUNNING, locked_at=now, locked_by=self.worker_id,
+            attempts=F("attempts") + 1, updated_at=now,
+        )
+        return list(EmailOutbox.objects.filter(
+            id__in=due, status=EmailOutboxStatus.RUNNING, locked_by=self.worker_id, locked_at=now,
+        ))
+
+    def get_backoff(self, attempts):
+        delay = min(self.BACKOFF_BASE * 2 ** max(attempts - 1, 0), self.BACKOFF_MAX)
+        return timedelta(seconds=delay + random.uniform(0, self.BACKOFF_BASE))
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, SMTPRecipientsRefused):
+            return all(code < 500 for code, _ in error.recipients.values())
+        if isinstance(error, SMTPResponseException):
+            return error.smtp_code < 500
+        return True
+
+    def render(self, messages):
+        # Fills subject/html_body/text_body on template messages; returns the ones ready to send
+        ready = [message for message in messages if not message.template]
+        by_template = defaultdict(list)
+        for message in messages:
+            if message.template:
+                by_template[message.template].append(message)
+        for template, template_messages in by_template.items():
+            path = self.RENDERERS.get(template)
+            if path is None:
+                for message in template_messages:
+                    self.fail(message, f"No renderer for template {template}", retryable=False)
+                continue
+            try:
+                rendered = import_string(path).render_outbox(template_messages)
+            except Exception as e:
+                for message in template_messages:
+                    self.fail(message, f"Render failed: {e}")
+                continue
+            for message in template_messages:
+                result = rendered.get(message.id)
+                if isinstance(result, Exception) or result is None:
+                    self.fail(message, str(result or "Nothing to render"), retryable=False)
+                    continue
+                message.subject, message.html_body, message.text_body = result
+                ready.append(message)
+        return ready
+
+    @staticmethod
+    def build_message(config, message):
+        mime_msg = MIMEMultipart("alternative")
+        mime_msg["Subject"] = str(Header(message.subject or "", "utf-8"))
+        mime_msg["From"] = formataddr((config.name or "", config.email))
+        mime_msg["To"] = message.to_email
+        if config.reply_to:
+            mime_msg["Reply-To"] = formataddr((config.name or "", config.reply_to))
+        if message.text_body:
+            mime_msg.attach(MIMEText(message.text_body, "plain", "utf-8"))
+        if message.html_body:
+            mime_msg.attach(MIMEText(message.html_body, "html", "utf-8"))
+        return mime_msg.as_string()
+
+    def send_batch(self, config, messages):
+        # Returns (sent, retry): retry holds messages never tried because the server
+        # could not be reached, so the caller can hand them to another config.
+        sent = []
+        try:
+            entry = SMTPConnectionPool.get(config)
+        except (SMTPException, OSError):
+            return sent, list(messages)
+        for index, message in enumerate(messages):
+            try:
+                entry["connection"].sendmail(config.email, [message.to_email], self.build_message(config, message))
+            except SMTPServerDisconnected:
+                # The server dropped the session; reopen once and retry this message
+                SMTPConnectionPool.close_entry(entry)
+                try:
+                    entry = SMTPConnectionPool.open(config)
+                    entry["connection"].sendmail(config.email, [message.to_email], self.build_message(config, message))
+                except (SMTPException, OSError):
+                    return sent, list(messages[index:])
+            except SMTPResponseException as e:
+                if e.smtp_code in (421, 454) or isinstance(e, SMTPAuthenticationError):
+                    SMTPConnectionPool.close_entry(entry)
+                    return sent, list(messages[index:])
+                self.fail(message, str(e), retryable=self.is_retryable(e))
+                continue
+            except SMTPException as e:
+                self.fail(message, str(e), retryable=self.is_retryable(e))
+                continue
+            except OSError:
+                SMTPConnectionPool.close_entry(entry)
+                return sent, list(messages[index:])
+            except Exception as e:
+                # Message that cannot be sent at all (e.g. UnicodeEncodeError on an IDN
+                # address); the session may be mid-transaction, so reset it.
+                self.fail(message, f"{type(e).__name__}: {e}", retryable=False)
+                try:
+                    entry["connection"].rset()
+                except (SMTPException, OSError):
+                    SMTPConnectionPool.close_entry(entry)
+                    return sent, list(messages[index + 1:])
+                continue
+            entry["sent"] += 1
+            sent.append(message)
+        SMTPConnectionPool.release(config, entry)
+        return sent, []
+
+    def dispatch(self, mail_type, messages):
+        # Spread messages over the sender pool; exhausted or unreachable configs drop out
+        # and their share goes to the rest in the next round.
+        pool = EmailSenderPool(mail_type)
+        pending, excluded = list(messages), set()
+        while pending:
+            groups = pool.allocate(pending, exclude=excluded)
+            if not groups:
+                for message in pending:
+                    self.fail(message, f"No SMTP config with quota left for {mail_type}")
+                return
+            pending = []
+            for config, group in groups:
+                reserved = config.reserve_quota(len(group))
+                if reserved < len(group):
+                    excluded.add(config.id)
+                sent, retry = [], []
+                try:
+                    if reserved:
+                        sent, retry = self.send_batch(config, group[:reserved])
+                finally:
+                    config.release_quota(reserved - len(sent))
+                if sent:
+                    self.mark_sent(config, sent)
+                if retry:
+                    config.mark_down()
+                    excluded.add(config.id)
+                pending += retry + group[reserved:]
+
+    def mark_sent(self, config, messages):
+        now = timezone.now()
+        for message in messages:
+            message.status = EmailOutboxStatus.SENT
+            message.config = config
+            message.sent_at = now
+            message.last_error = None
+            message.locked_at = message.locked_by = None
+            message.updated_at = now
+        EmailOutbox.objects.bulk_update(
+            messages,
+            ["status", "config", "sent_at", "subject", "last_error", "locked_at", "locked_by", "updated_at"],
+        )
+
+    def fail(self, message, error, retryable=True):
+        if retryable and message.attempts < message.max_attempts:
+            message.status = EmailOutboxStatus.QUEUED
+            message.next_attempt_at = timezone.now() + self.get_backoff(message.attempts)
+        else:
+            message.status = EmailOutboxStatus.FAILED
+        message.last_error = error
+        message.locked_at = message.locked_by = None
+        message.save(update_fields=["status", "next_attempt_at", "last_error", "locked_at", "locked_by", "updated_at"])
+        return message
+
+    def run_once(self):
+        self.release_stale()
+        messages = self.claim()
+        by_mail_type = defaultdict(list)
+        for message in self.render(messages):
+            by_mail_type[message.mail_type].append(message)
+        for mail_type, type_messages in by_mail_type.items():
+            self.dispatch(mail_type, type_messages)
+        return messages
@@ -20,3 +20,12 @@ class EmailConfigServerType(models.TextChoices):
     SMTP = "smtp"
     API = "api"
 
+
+class EmailOutboxStatus(models.TextChoices):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SENT = "sent"
+    FAILED = "failed"
+
+class EmailOutboxTemplate(models.TextChoices):
+    ORDER_CONFIRMATION = "order_confirmation"
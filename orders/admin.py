@@ -10,3 +10,10 @@ admin.site.register(Payment)
 admin.site.register(Refund)
 admin.site.register(Review)
 admin.site.register(DeliveryOption)
+admin.site.register(DailySalesRollup)
+admin.site.register(OrderSearchDocument)
+admin.site.register(OrderStatusCount)
+admin.site.register(OrderAuditLog)
+admin.site.register(CourierBookingJob)
+admin.site.register(ShipmentSyncRun)
+admin.site.register(OrderNumberBlock)
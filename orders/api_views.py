@@ -2,7 +2,7 @@ from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from .models import DeliveryOption, Shipment, Order
+from .models import DeliveryOption, Shipment, Order, CourierBookingJob
 from .serializers import DeliveryOptionSerializer, ShipmentSerializer
 
 
@@ -10,11 +10,12 @@ from django.http import JsonResponse
 from django.views import View
 from http import HTTPStatus
 from django.db import transaction
-from orders.utix import DELIVERY_TYPE
+from django.urls import reverse
+from orders.utils import CourierRegistry
+from orders.utix import DELIVERY_TYPE, BOOKING_JOB_STATUS
 import json
 from django.db import transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
-from orders.utils import SteadFastParcelAPI
 
 
 class DeliveryOptionListAPIView(APIView):
@@ -107,30 +108,6 @@ class OrderDeliveryOptionSubmitView(LoginRequiredMixin, View):
         except Exception as e:
             raise Exception(str(e))
     
-    def get_order_data(self, order):
-        email = (order.customer.email or order.customer.user.email if order.customer.user else None) or None
-        whatsapp = order.customer.whatsapp if order.customer.whatsapp else None
-        data = {
-            "invoice": order.order_id,
-            "recipient_name": order.customer.full_name,
-            "recipient_phone": order.customer.phone,
-            "recipient_address": order.shipping_address,
-            "cod_amount": float(order.get_total_order_amount),
-            "note": order.note,
-            "total_lot": order.items.count(),
-            "delivery_type": 1 if order.delivery_type == DELIVERY_TYPE.PICKUP else 0,
-        }
-        if whatsapp:
-            data["alternative_phone"] = whatsapp
-        if email:
-            data["recipient_email"] = email
-        return data
-    
-    def steadfast_response(self, logistics_partner, order):
-        order_data = self.get_order_data(order)
-        steadfast = SteadFastParcelAPI(logistics_partner.id)
-        return steadfast.create_order(order_data)
-    
     def get_logistics_partners(self, data):
         logistics_partner_id = data.get("logistics_partner")
         return DeliveryOption.objects.get(id=logistics_partner_id)
@@ -163,19 +140,86 @@ class OrderDeliveryOptionSubmitView(LoginRequiredMixin, View):
                 data = json.loads(request.body)
                 logistics_partner = self.get_logistics_partners(data)
                 order = self.get_order(kwargs.get("pk"))
-                steadfast_response = self.steadfast_response(logistics_partner, order)
-                print("steadfast_response: ", steadfast_response)
-                if steadfast_response.get("status") == 200:
-                    order_shipped_data = order.shipments.create(
-                        courier=logistics_partner,
-                        tracking_number=steadfast_response["consignment"]["consignment_id"],
-                        status=steadfast_response["consignment"]["status"],
-                    )
-                    return self.return_response(True, steadfast_response.get("message"), data=order_shipped_data, status=HTTPStatus.OK)
-                else:
-                    return self.return_response(False, steadfast_response.get("message"), status=HTTPStatus.BAD_REQUEST)
+                CourierRegistry.get_adapter_class(logistics_partner.type)
+                # Booking happens in run_courier_booking_worker; this only queues it
+                job = CourierBookingJob.enqueue(order, logistics_partner)
+            if job.status == BOOKING_JOB_STATUS.SUCCEEDED and job.shipment:
+                return self.return_response(True, "Consignment already booked", data=job.shipment, status=HTTPStatus.OK)
+            return JsonResponse({
+                "success": True,
+                "message": "Consignment booking queued",
+                "job": {**job.get_status_data(), "poll_url": reverse("courier_booking_job_status", args=[job.id])},
+            }, status=HTTPStatus.ACCEPTED)
         except Exception as e:
             return self.return_response(False, f"{str(e)}", status=HTTPStatus.BAD_REQUEST)
 
 
+class OrderBulkDeliveryOptionSubmitView(LoginRequiredMixin, View):
+    login_url = "admin_login"
+    MAX_ORDERS = 2000
+
+    @staticmethod
+    def get_id(value, label):
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+            raise ValueError(f"Invalid {label}: {value}")
+        return int(value)
+
+    def get_payload(self, request):
+        data = json.loads(request.body or "{}")
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        order_ids = data.get("order_ids") or []
+        if not isinstance(order_ids, list):
+            raise ValueError("order_ids must be a list")
+        order_ids = list(dict.fromkeys(self.get_id(order_id, "order id") for order_id in order_ids))
+        return order_ids, self.get_id(data.get("logistics_partner"), "logistics partner")
+
+    def post(self, request, *args, **kwargs):
+        try:
+            order_ids, logistics_partner_id = self.get_payload(request)
+            if not order_ids or len(order_ids) > self.MAX_ORDERS:
+                return JsonResponse({
+                    "success": False,
+                    "message": f"Select between 1 and {self.MAX_ORDERS} orders",
+                }, status=HTTPStatus.BAD_REQUEST)
+            logistics_partner = DeliveryOption.objects.get(id=logistics_partner_id)
+            CourierRegistry.get_adapter_class(logistics_partner.type)
+            orders = {order.id: order for order in Order.objects.filter(id__in=order_ids).only("id", "order_id")}
+            with transaction.atomic():
+                jobs = CourierBookingJob.enqueue_many(orders.values(), logistics_partner)
+                jobs_by_order = {job.order_id: job for job in jobs}
+            results = []
+            for order_id in order_ids:
+                job = jobs_by_order.get(order_id)
+                if order_id not in orders:
+                    results.append({"id": order_id, "success": False, "message": "Order not found"})
+                elif not orders[order_id].order_id:
+                    results.append({"id": order_id, "success": False, "message": "Order has no order ID to book with"})
+                elif job is None:
+                    results.append({"id": order_id, "success": False, "message": "Booking could not be queued"})
+                else:
+                    results.append({"id": order_id, "success": True, "job": job.get_status_data()})
+            return JsonResponse({
+                "success": True,
+                "message": f"{len(jobs_by_order)} consignment bookings queued",
+                "results": results,
+            }, status=HTTPStatus.ACCEPTED)
+        except (ValueError, DeliveryOption.DoesNotExist) as e:
+            return JsonResponse({
+                "success": False,
+                "message": str(e)
+            }, status=HTTPStatus.BAD_REQUEST)
+
 
+class CourierBookingJobStatusView(LoginRequiredMixin, View):
+    login_url = "admin_login"
+
+    def get(self, request, *args, **kwargs):
+        job = get_object_or_404(CourierBookingJob.objects.select_related("shipment__courier"), id=kwargs.get("pk"))
+        response = {
+            "success": True,
+            "job": job.get_status_data(),
+        }
+        if job.shipment:
+            response["data"] = ShipmentSerializer(job.shipment).data
+        return JsonResponse(response, status=HTTPStatus.OK)
@@ -0,0 +1,64 @@
+from datetime import datetime, time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from orders.models import Order, DailySalesRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySalesRollup table from Order and OrderItem history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days on or after this date (YYYY-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def get_since(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+    def handle(self, *args, **options):
+        since = self.get_since(options["since"])
+        batch_size = options["batch_size"]
+
+        orders = Order.objects.filter(placed_at__isnull=False)
+        rollups = DailySalesRollup.objects.all()
+        if since:
+            orders = orders.filter(placed_at__gte=datetime.combine(since, time.min))
+            rollups = rollups.filter(date__gte=since)
+
+        rows = (
+            orders.order_by()
+            .values("order_status", "payment_status", "delivery_type", day=TruncDate("placed_at"))
+            .annotate(**DailySalesRollup.get_order_aggregates())
+            .order_by("day")
+        )
+
+        created = 0
+        with transaction.atomic():
+            rollups.delete()
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(DailySalesRollup(
+                    date=row["day"],
+                    order_status=row["order_status"],
+                    payment_status=row["payment_status"],
+                    delivery_type=row["delivery_type"],
+                    order_count=row["order_count"],
+                    item_quantity=row["item_quantity"] or 0,
+                    gross_total=row["gross_total"] or 0,
+                    discount_total=row["discount_total"] or 0,
+                    shipping_total=row["shipping_total"] or 0,
+                ))
+                if len(batch) >= batch_size:
+                    DailySalesRollup.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            if batch:
+                DailySalesRollup.objects.bulk_create(batch)
+                created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} daily sales rollup rows."))
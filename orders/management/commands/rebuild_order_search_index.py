@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from orders.models import Order, OrderSearchDocument
+
+
+class Command(BaseCommand):
+    help = "Rebuild the OrderSearchDocument row of every order."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = OrderSearchDocument.index_queryset(Order.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} orders."))
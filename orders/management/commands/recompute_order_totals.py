@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized item totals stored on every Order."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = Order.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        updated = 0
+        # Walk primary key ranges so each UPDATE stays short
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                updated += Order.recalculate_totals_for(
+                    Order.objects.filter(id__gte=start, id__lt=start + batch_size)
+                )
+        self.stdout.write(self.style.SUCCESS(f"Recomputed totals for {updated} orders."))
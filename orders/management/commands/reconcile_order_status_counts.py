@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from orders.models import OrderStatusCount
+
+
+class Command(BaseCommand):
+    help = "Recount orders per status and repair the stored tab badge counters. Run periodically from cron."
+
+    def handle(self, *args, **options):
+        drift = OrderStatusCount.reconcile()
+        for status, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f"{status}: stored {stored}, actual {actual}"))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled order status counts ({len(drift)} drifted)."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from orders.utils import CourierBookingWorker
+from orders.utix import BOOKING_JOB_STATUS
+import time
+
+
+class Command(BaseCommand):
+    help = "Book queued courier consignments. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process one batch and exit.")
+        parser.add_argument("--batch-size", type=int, default=20)
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        worker = CourierBookingWorker(batch_size=options["batch_size"])
+        while True:
+            jobs = worker.run_once()
+            for job in jobs:
+                style = self.style.SUCCESS if job.status == BOOKING_JOB_STATUS.SUCCEEDED else self.style.WARNING
+                self.stdout.write(style(f"{job.idempotency_key}: {job.status} (attempt {job.attempts}) {job.last_error or ''}"))
+            if options["once"]:
+                break
+            if not jobs:
+                time.sleep(options["sleep"])
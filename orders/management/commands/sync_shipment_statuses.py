@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from orders.utils import ShipmentStatusSync
+
+
+class Command(BaseCommand):
+    help = "Poll the courier for in-flight shipments and update shipment and order statuses. Run from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--limit", type=int, default=1000, help="Shipments to check per run, least recently checked first.")
+
+    def handle(self, *args, **options):
+        sync_run = ShipmentStatusSync(concurrency=options["concurrency"], limit=options["limit"]).run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {sync_run.checked} shipments in {sync_run.duration_seconds:.1f}s ({sync_run.per_second or 0}/s): "
+            f"{sync_run.changed} changed, {sync_run.orders_updated} orders updated, {sync_run.errors} errors."
+        ))
+        for error in sync_run.error_samples:
+            self.stdout.write(self.style.WARNING(error))
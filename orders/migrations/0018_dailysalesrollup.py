@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0017_alter_shipment_courier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_status', models.CharField(choices=[('new', 'New'), ('follow_up', 'Follow Up'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned'), ('refunded', 'Refunded')], max_length=50)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('partial', 'Partial'), ('paid', 'Paid'), ('refund_processing', 'Refund Processing'), ('refund', 'Refund')], max_length=50)),
+                ('delivery_type', models.CharField(choices=[('COD', 'Cod'), ('online_payment', 'Online Payment'), ('delivery', 'Delivery'), ('pickup', 'Pickup')], max_length=50)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('item_quantity', models.IntegerField(default=0)),
+                ('gross_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('shipping_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('date', 'order_status', 'payment_status', 'delivery_type')},
+            },
+        ),
+    ]
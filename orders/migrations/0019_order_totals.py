@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-18 16:13
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, F, Value, OuterRef, Subquery, DecimalField, IntegerField
+from django.db.models.functions import Coalesce
+
+
+def items_sum(OrderItem, field_name, output_field, aggregate=Sum):
+    items_total = (
+        OrderItem.objects
+        .filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=aggregate(field_name))
+        .values("total")
+    )
+    return Coalesce(Subquery(items_total, output_field=output_field), Value(0), output_field=output_field)
+
+
+def fill_order_totals(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderItem = apps.get_model("orders", "OrderItem")
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    discount_total = items_sum(OrderItem, "discount_total_price", amount)
+    Order.objects.update(
+        items_count=items_sum(OrderItem, "id", IntegerField(), aggregate=Count),
+        total_quantity=items_sum(OrderItem, "quantity", IntegerField()),
+        gross_total=items_sum(OrderItem, "total_price", amount),
+        discount_total=discount_total,
+        grand_total=discount_total + F("shipping_total"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='discount_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='grand_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='gross_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+FTS_TABLE = "orders_ordersearchdocument_fts"
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS orders_osd_document_trgm ON orders_ordersearchdocument USING gin (document gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS orders_osd_document_trgm",
+]
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='orders_ordersearchdocument', content_rowid='order_id', tokenize='trigram')",
+    f"""CREATE TRIGGER orders_osd_ai AFTER INSERT ON orders_ordersearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.order_id, new.document);
+    END""",
+    f"""CREATE TRIGGER orders_osd_ad AFTER DELETE ON orders_ordersearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.order_id, old.document);
+    END""",
+    f"""CREATE TRIGGER orders_osd_au AFTER UPDATE ON orders_ordersearchdocument BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.order_id, old.document);
+        INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.order_id, new.document);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS orders_osd_ai",
+    "DROP TRIGGER IF EXISTS orders_osd_ad",
+    "DROP TRIGGER IF EXISTS orders_osd_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run_statements(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        run_statements(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite":
+        try:
+            run_statements(schema_editor, SQLITE_FORWARD)
+        except OperationalError:
+            # SQLite built without FTS5 or the trigram tokenizer (< 3.34):
+            # search falls back to LIKE on the document column.
+            run_statements(schema_editor, SQLITE_BACKWARD)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        run_statements(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == "sqlite":
+        run_statements(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchDocument',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='orders.order')),
+                ('document', models.TextField(blank=True, default='')),
+                ('phone', models.CharField(blank=True, db_index=True, default='', max_length=20)),
+                ('whatsapp', models.CharField(blank=True, db_index=True, default='', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
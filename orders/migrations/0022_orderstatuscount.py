@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 16:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_status_counts(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    OrderStatusCount = apps.get_model("orders", "OrderStatusCount")
+    rows = Order.objects.order_by().values("order_status").annotate(total=Count("id"))
+    OrderStatusCount.objects.bulk_create([
+        OrderStatusCount(status=row["order_status"], count=row["total"]) for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0021_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'New'), ('follow_up', 'Follow Up'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned'), ('refunded', 'Refunded')], max_length=50, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_status_counts, migrations.RunPython.noop),
+    ]
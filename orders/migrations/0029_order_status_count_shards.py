@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0028_daily_sales_rollup_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatuscount',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='orderstatuscount',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('follow_up', 'Follow Up'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('returned', 'Returned'), ('refunded', 'Refunded')], max_length=50),
+        ),
+        migrations.AlterUniqueTogether(
+            name='orderstatuscount',
+            unique_together={('status', 'shard')},
+        ),
+    ]
@@ -3,9 +3,19 @@ from accounts.models import CustomUser, CustomerProfile
 from catalog.models import Product, ProductVariant
 from .utix import *
 from catalog.utix import PRODUCT_MEDIA_ROLE
-import random, string
 import uuid
 from django.core.validators import FileExtensionValidator
+from django.core.cache import cache
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Count, Sum, F, Q, Value, OuterRef, Subquery, DecimalField, IntegerField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import random
 
 class Cart(models.Model):
     user = models.ForeignKey(CustomUser, null=True, blank=True, on_delete=models.CASCADE)
@@ -34,9 +44,25 @@ class CartItem(models.Model):
 
 
 
+class OrderQuerySet(models.QuerySet):
+    LIST_FIELDS = (
+        "id", "order_id", "order_status", "payment_status", "delivery_type", "delivery_date",
+        "placed_at", "shipping_total", "items_count", "grand_total",
+        "customer__id", "customer__full_name", "customer__phone",
+    )
+
+    def for_list(self):
+        # Only the columns the order tables render, customer joined in the same query
+        return self.select_related("customer").only(*self.LIST_FIELDS)
+
+
 class Order(models.Model):
     order_uuid = models.CharField(max_length=255, unique=True, editable=False)
     order_id = models.CharField(max_length=128, unique=True, blank=True, null=True)
+    # Set by CheckoutService; a repeated submission hits the unique constraint instead of a second order
+    idempotency_key = models.CharField(max_length=128, unique=True, blank=True, null=True, editable=False)
+    # sha256 of the submitted checkout payload; a reused key with a different payload is rejected
+    idempotency_hash = models.CharField(max_length=64, blank=True, null=True, editable=False, db_index=True)
     customer = models.ForeignKey(CustomerProfile, null=True, blank=True, on_delete=models.SET_NULL)
 
     # currency = models.CharField(max_length=3, default='USD')
@@ -58,6 +84,42 @@ class Order(models.Model):
     note = models.TextField(blank=True, null=True)
     work_assign = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="assigned_orders")
 
+    # Denormalized from OrderItem, kept in sync by the OrderItem signals below
+    items_count = models.PositiveIntegerField(default=0)
+    total_quantity = models.IntegerField(default=0)
+    gross_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    grand_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # order list / keyset pages / date ranges, all tab and per status tab
+            models.Index(fields=["-placed_at", "-id"], name="order_placed_id_idx"),
+            models.Index(fields=["order_status", "-placed_at", "-id"], name="order_status_placed_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the values as loaded so signal handlers can see what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_value(self, attname, default=None):
+        return getattr(self, "_loaded_values", {}).get(attname, default)
+
+    @property
+    def rollup_values(self):
+        return {name: getattr(self, name) for name in DailySalesRollup.ORDER_FIELDS}
+
+    @property
+    def loaded_rollup_values(self):
+        if not hasattr(self, "_loaded_values"):
+            return None
+        return {name: self.get_loaded_value(name) for name in DailySalesRollup.ORDER_FIELDS}
+
     def get_order_status_choise(self):
         return ORDER_STATUS.choices
     
@@ -66,56 +128,106 @@ class Order(models.Model):
 
     @property
     def get_items_total(self):
-        product_item = len(self.items.all())
-        return product_item
+        return self.items_count
     
     @property
     def get_total_quantity(self):
-        total_quantity = sum(item.quantity for item in self.items.all())
-        return total_quantity
-        
+        return self.total_quantity
     
     @property
     def get_discount_total(self):
-        discount_total = sum(item.discount_total_price for item in self.items.all())
-        return discount_total
+        return self.discount_total
     
     @property
     def get_current_total(self):
-        current_total = sum(item.total_price for item in self.items.all())
-        return current_total
+        return self.gross_total
     
     @property
     def get_discount_percentage(self):
-        if not self.get_discount_total or self.get_discount_total >= self.get_current_total:
+        if not self.discount_total or self.discount_total >= self.gross_total:
             return 0
-        discount_amount = self.get_current_total - self.get_discount_total
-        discount_percentage = (discount_amount / self.get_current_total) * 100
+        discount_amount = self.gross_total - self.discount_total
+        discount_percentage = (discount_amount / self.gross_total) * 100
         return round(discount_percentage, 2)
     
     @property
     def get_total_order_amount(self):
-        return self.get_discount_total + self.shipping_total
-
-    def generate_order_id(self):
-        while True:
-            prefix = ''.join(random.choices(string.ascii_uppercase, k=3))
-            suffix = ''.join(random.choices(string.digits, k=6))
-            unique_id = prefix + suffix
-            if not Order.objects.filter(order_id=unique_id).exists():
-                return unique_id
+        return self.grand_total
+
+    def get_grand_total(self):
+        return Decimal(str(self.discount_total or 0)) + Decimal(str(self.shipping_total or 0))
+
+    def recalculate_totals(self):
+        totals = self.items.aggregate(
+            items_count=Count("id"),
+            total_quantity=Coalesce(Sum("quantity"), Value(0)),
+            gross_total=Coalesce(Sum("total_price"), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            discount_total=Coalesce(Sum("discount_total_price"), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        for name, value in totals.items():
+            setattr(self, name, value)
+        self.grand_total = self.get_grand_total()
+        Order.objects.filter(pk=self.pk).update(grand_total=self.grand_total, **totals)
+        if hasattr(self, "_loaded_values"):
+            self._loaded_values.update(grand_total=self.grand_total, **totals)
+        return totals
+
+    @classmethod
+    def recalculate_totals_for(cls, orders):
+        # Set based version of recalculate_totals, for bulk repair
+        discount_total = order_items_sum("discount_total_price")
+        return orders.update(
+            items_count=order_items_sum("id", IntegerField(), aggregate=Count),
+            total_quantity=order_items_sum("quantity", IntegerField()),
+            gross_total=order_items_sum("total_price"),
+            discount_total=discount_total,
+            grand_total=discount_total + F("shipping_total"),
+        )
+
+    def generate_order_id(self, discard=False):
+        from .utils import OrderNumberAllocator
+        allocator = OrderNumberAllocator.get_default()
+        if discard:
+            allocator.discard()
+        return allocator.next_order_id()
 
     def save(self, *args, **kwargs):
-        if not self.order_id:
+        generated = not self.order_id
+        if generated:
             self.order_id = self.generate_order_id()
         if not self.order_uuid:
             self.order_uuid = uuid.uuid4().hex
-
-        super().save(*args, **kwargs)
+        self.grand_total = self.get_grand_total()
+
+        if not generated:
+            super().save(*args, **kwargs)
+        else:
+            # Allocated ids do not repeat, but one can land on a legacy random id; the
+            # insert is then retried with a fresh block. Other conflicts are re-raised.
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        super().save(*args, **kwargs)
+                    break
+                except IntegrityError:
+                    if attempt == 2 or not Order.objects.filter(order_id=self.order_id).exists():
+                        raise
+                    self.order_id = self.generate_order_id(discard=True)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
 
     def __str__(self):
         return f"Order {self.order_id}"
 
+class OrderNumberBlock(models.Model):
+    # Ledger of order number blocks handed to OrderNumberAllocator instances. The row id
+    # is the block number; ids come from the table's sequence, so every block is unique.
+    reserved_by = models.CharField(max_length=100, blank=True, null=True)
+    block_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order number block {self.id} ({self.block_size})"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
@@ -130,12 +242,18 @@ class OrderItem(models.Model):
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     # fulfillment_status = models.CharField(max_length=50, default='pending')
 
+    class Meta:
+        indexes = [
+            # product filter semi join: product -> order ids without touching the table
+            models.Index(fields=["product", "order"], name="orderitem_product_order_idx"),
+        ]
+
     @property
     def getPrimaryImage(self):
-        image = self.variant.images.all().first() if self.variant else self.product.images.filter(role=PRODUCT_MEDIA_ROLE.PRIMARY)
-        if image:
-            return image
-        return self.product.images.first()
+        variant_images = list(self.variant.images.all()) if self.variant else []
+        if variant_images:
+            return variant_images[0]
+        return self.product.primary_image_object if self.product else None
 
     def save(self, *args, **kwargs):
         if not self.total_price:
@@ -160,9 +278,16 @@ class Shipment(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True)
     shipping_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     label_url = models.URLField(blank=True, null=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"], name="shipment_status_idx"),
+            models.Index(fields=["status", "checked_at"], name="shipment_sync_idx"),
+        ]
+
     def __str__(self):
         return f"Shipment {self.courier} for {self.order.order_id}"
 
@@ -221,3 +346,481 @@ class DeliveryOption(models.Model):
             return f'{self.name} - {self.type}'
         return self.name
 
+
+
+class CourierBookingJob(models.Model):
+    # Outbound consignment booking, processed by the run_courier_booking_worker command.
+    # One job per invoice (idempotency_key), so resubmitting never books twice.
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="booking_jobs")
+    courier = models.ForeignKey(DeliveryOption, on_delete=models.CASCADE, related_name="booking_jobs")
+    idempotency_key = models.CharField(max_length=128, unique=True)
+    status = models.CharField(max_length=20, choices=BOOKING_JOB_STATUS.choices, default=BOOKING_JOB_STATUS.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    response = models.JSONField(default=dict, blank=True)
+    shipment = models.ForeignKey(Shipment, on_delete=models.SET_NULL, null=True, blank=True, related_name="booking_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="booking_job_due_idx"),
+        ]
+
+    @classmethod
+    def enqueue(cls, order, courier):
+        job, created = cls.objects.get_or_create(
+            idempotency_key=order.order_id,
+            defaults={"order": order, "courier": courier},
+        )
+        if not created and job.status == BOOKING_JOB_STATUS.FAILED:
+            job.courier = courier
+            job.status = BOOKING_JOB_STATUS.QUEUED
+            job.attempts = 0
+            job.next_attempt_at = timezone.now()
+            job.last_error = None
+            job.save(update_fields=["courier", "status", "attempts", "next_attempt_at", "last_error", "updated_at"])
+        return job
+
+    @classmethod
+    def enqueue_many(cls, orders, courier):
+        keys = [order.order_id for order in orders if order.order_id]
+        cls.objects.bulk_create(
+            [cls(order=order, courier=courier, idempotency_key=order.order_id) for order in orders if order.order_id],
+            ignore_conflicts=True,
+        )
+        cls.objects.filter(idempotency_key__in=keys, status=BOOKING_JOB_STATUS.FAILED).update(
+            courier=courier, status=BOOKING_JOB_STATUS.QUEUED, attempts=0,
+            next_attempt_at=timezone.now(), last_error=None, updated_at=timezone.now(),
+        )
+        return cls.objects.filter(idempotency_key__in=keys)
+
+    def get_status_data(self):
+        return {
+            "job_id": self.id,
+            "invoice": self.idempotency_key,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "next_attempt_at": self.next_attempt_at,
+            "last_error": self.last_error,
+        }
+
+    def __str__(self):
+        return f"Booking {self.idempotency_key} ({self.status})"
+
+
+class ShipmentSyncRun(models.Model):
+    # One row per sync_shipment_statuses run: throughput and error metrics
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    checked = models.PositiveIntegerField(default=0)
+    changed = models.PositiveIntegerField(default=0)
+    orders_updated = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    error_samples = models.JSONField(default=list, blank=True)
+    concurrency = models.PositiveIntegerField(default=1)
+
+    @property
+    def duration_seconds(self):
+        if not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def per_second(self):
+        duration = self.duration_seconds
+        return round(self.checked / duration, 2) if duration else None
+
+    def __str__(self):
+        return f"Shipment sync {self.started_at:%Y-%m-%d %H:%M} | {self.checked} checked, {self.changed} changed, {self.errors} errors"
+
+
+def order_items_sum(field_name, output_field=None, aggregate=Sum):
+    # Per order subquery, so a join on items never repeats order level columns
+    output_field = output_field or DecimalField(max_digits=14, decimal_places=2)
+    items_total = (
+        OrderItem.objects
+        .filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=aggregate(field_name))
+        .values("total")
+    )
+    return Coalesce(Subquery(items_total, output_field=output_field), Value(0), output_field=output_field)
+
+
+class DailySalesRollup(models.Model):
+    # Per day and (status, payment, delivery) sales totals for the dashboard. Order and
+    # OrderItem writes apply F() deltas in the same transaction, spread over SHARDS rows
+    # per bucket so concurrent checkouts do not queue on one hot row. Readers Sum() the
+    # shards; backfill_sales_rollup rebuilds the table from Order.
+    SHARDS = 8
+    KEY_FIELDS = ["date", "order_status", "payment_status", "delivery_type"]
+    ORDER_FIELDS = ["placed_at", "order_status", "payment_status", "delivery_type", "total_quantity", "gross_total", "discount_total", "shipping_total"]
+
+    date = models.DateField()
+    order_status = models.CharField(max_length=50, choices=ORDER_STATUS.choices)
+    payment_status = models.CharField(max_length=50, choices=ORDER_PAYMENT_STATUS.choices)
+    delivery_type = models.CharField(max_length=50, choices=DELIVERY_TYPE.choices)
+    shard = models.PositiveSmallIntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+    item_quantity = models.IntegerField(default=0)
+    gross_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shipping_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('date', 'order_status', 'payment_status', 'delivery_type', 'shard'),)
+
+    @staticmethod
+    def get_key(placed_at, order_status, payment_status, delivery_type):
+        if not placed_at:
+            return None
+        return (placed_at.date(), order_status, payment_status, delivery_type)
+
+    @classmethod
+    def get_order_aggregates(cls):
+        return {
+            "order_count": Count("id"),
+            "item_quantity": Sum("total_quantity"),
+            "gross_total": Sum("gross_total"),
+            "discount_total": Sum("discount_total"),
+            "shipping_total": Sum("shipping_total"),
+        }
+
+    @classmethod
+    def add_order(cls, deltas, values, sign=1):
+        # Adds (or with sign=-1 removes) one order, given as a dict of ORDER_FIELDS, to deltas
+        key = cls.get_key(values["placed_at"], values["order_status"], values["payment_status"], values["delivery_type"]) if values else None
+        if key is None:
+            return deltas
+        bucket = deltas.setdefault(key, {})
+        amounts = {
+            "order_count": 1,
+            "item_quantity": values["total_quantity"] or 0,
+            "gross_total": values["gross_total"] or 0,
+            "discount_total": values["discount_total"] or 0,
+            "shipping_total": values["shipping_total"] or 0,
+        }
+        for name, amount in amounts.items():
+            bucket[name] = bucket.get(name, 0) + sign * amount
+        return deltas
+
+    @classmethod
+    def apply_change(cls, old=None, new=None):
+        deltas = cls.add_order({}, old, -1)
+        cls.apply_deltas(cls.add_order(deltas, new))
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        for key, amounts in deltas.items():
+            changes = {name: F(name) + amount for name, amount in amounts.items() if amount}
+            if not changes:
+                continue
+            bucket = dict(zip(cls.KEY_FIELDS, key))
+            lookup = dict(bucket, shard=random.randrange(cls.SHARDS))
+            changes["updated_at"] = timezone.now()
+            if not cls.objects.filter(**lookup).update(**changes):
+                # First write to the bucket creates all of its shards at once
+                cls.objects.bulk_create([cls(**bucket, shard=shard) for shard in range(cls.SHARDS)], ignore_conflicts=True)
+                cls.objects.filter(**lookup).update(**changes)
+
+    def __str__(self):
+        return f"Sales {self.date} | {self.order_status} | {self.order_count} orders"
+
+
+@receiver(post_save, sender=Order)
+def order_sales_rollup_update(sender, instance, created, **kwargs):
+    DailySalesRollup.apply_change(None if created else instance.loaded_rollup_values, instance.rollup_values)
+
+
+@receiver(post_delete, sender=Order)
+def order_sales_rollup_delete(sender, instance, **kwargs):
+    DailySalesRollup.apply_change(instance.rollup_values, None)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, **kwargs):
+    # Items deleted along with their order are covered by the order's own post_delete
+    origin = kwargs.get("origin")
+    if isinstance(origin, Order) or getattr(origin, "model", None) is Order:
+        return
+    try:
+        order = instance.order
+    except Order.DoesNotExist:
+        return
+    if order:
+        with transaction.atomic():
+            before = Order.objects.select_for_update().filter(pk=order.pk).values(*DailySalesRollup.ORDER_FIELDS).first()
+            totals = order.recalculate_totals()
+            if before:
+                DailySalesRollup.apply_change(before, {**before, **totals})
+
+
+class OrderStatusCount(models.Model):
+    # Running order count per status for the order list tabs. Changed with F() deltas in
+    # the same transaction as the order write, on one of SHARDS rows per status picked at
+    # random, so concurrent checkouts do not queue on the "new" row. Readers sum the
+    # shards; reconcile_order_status_counts repairs drift.
+    CACHE_KEY = "orders:status_counts"
+    CACHE_TIMEOUT = 60
+    SHARDS = 8
+
+    status = models.CharField(max_length=50, choices=ORDER_STATUS.choices)
+    shard = models.PositiveSmallIntegerField(default=0)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('status', 'shard'),)
+
+    @classmethod
+    def create_shards(cls, statuses):
+        cls.objects.bulk_create(
+            [cls(status=status, shard=shard) for status in statuses for shard in range(cls.SHARDS)], ignore_conflicts=True,
+        )
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        deltas = {status: delta for status, delta in deltas.items() if status and delta}
+        if not deltas:
+            return
+        for status, delta in deltas.items():
+            lookup = {"status": status, "shard": random.randrange(cls.SHARDS)}
+            if not cls.objects.filter(**lookup).update(count=F("count") + delta):
+                cls.create_shards([status])
+                cls.objects.filter(**lookup).update(count=F("count") + delta)
+        transaction.on_commit(cls.clear_cache, robust=True)
+
+    @classmethod
+    def apply_transition(cls, old_status, new_status, count=1):
+        if old_status == new_status:
+            return
+        deltas = {}
+        if old_status:
+            deltas[old_status] = deltas.get(old_status, 0) - count
+        if new_status:
+            deltas[new_status] = deltas.get(new_status, 0) + count
+        cls.apply_deltas(deltas)
+
+    @classmethod
+    def clear_cache(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    @classmethod
+    def get_counts(cls, cached=None):
+        counts = cached if cached is not None else cache.get(cls.CACHE_KEY)
+        if counts is None:
+            counts = {status: 0 for status, _ in ORDER_STATUS.choices}
+            counts.update(dict(cls.objects.values("status").annotate(total=Sum("count")).order_by().values_list("status", "total")))
+            counts["all"] = sum(counts.values())
+            cache.set(cls.CACHE_KEY, counts, cls.CACHE_TIMEOUT)
+        return counts
+
+    @classmethod
+    def reconcile(cls):
+        # Recount from Order and overwrite; returns {status: (stored, actual)} for drifted rows.
+        # Orders are counted while every counter row is locked, so a write in between
+        # either is in the count or applies its delta after the overwrite.
+        drift = {}
+        with transaction.atomic():
+            cls.create_shards({*ORDER_STATUS.values, *cls.objects.values_list("status", flat=True)})
+            stored = {}
+            for status, count in cls.objects.select_for_update().values_list("status", "count"):
+                stored[status] = stored.get(status, 0) + count
+            actual = dict(
+                Order.objects.order_by().values("order_status").annotate(total=Count("id")).values_list("order_status", "total")
+            )
+            cls.create_shards(set(actual) - set(stored))
+            for status in set(stored) | set(actual):
+                if stored.get(status, 0) != actual.get(status, 0):
+                    drift[status] = (stored.get(status, 0), actual.get(status, 0))
+            cls.objects.exclude(shard=0).update(count=0, updated_at=timezone.now())
+            cls.objects.bulk_create(
+                [cls(status=status, shard=0, count=actual.get(status, 0)) for status in set(stored) | set(actual)],
+                update_conflicts=True, unique_fields=["status", "shard"], update_fields=["count", "updated_at"],
+            )
+        cls.clear_cache()
+        return drift
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+
+@receiver(post_save, sender=Order)
+def order_status_count_update(sender, instance, created, **kwargs):
+    old_status = None if created else instance.get_loaded_value("order_status")
+    OrderStatusCount.apply_transition(old_status, instance.order_status)
+
+
+@receiver(post_delete, sender=Order)
+def order_status_count_delete(sender, instance, **kwargs):
+    OrderStatusCount.apply_transition(instance.order_status, None)
+
+
+class OrderAuditLog(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="audit_logs")
+    changed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="order_audit_logs")
+    field = models.CharField(max_length=50)
+    old_value = models.CharField(max_length=255, blank=True, null=True)
+    new_value = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "-created_at"], name="order_audit_order_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} | {self.field}: {self.old_value} -> {self.new_value}"
+
+
+class OrderSearchDocument(models.Model):
+    # One lower cased search text per order. PostgreSQL serves substring search from a
+    # pg_trgm GIN index on document, SQLite from an FTS5 trigram table kept in sync by
+    # triggers (both created in the migration). Phones are stored as bare digits so a
+    # phone prefix is an index range scan.
+    FTS_TABLE = "orders_ordersearchdocument_fts"
+    SEARCH_FIELDS = ("order_id", "customer_id", "shipping_address")
+    CUSTOMER_FIELDS = ("full_name", "phone", "whatsapp")
+    MIN_TRIGRAM_LENGTH = 3
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    document = models.TextField(blank=True, default="")
+    phone = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    whatsapp = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def normalize_phone(value):
+        digits = "".join(char for char in str(value or "") if char.isdigit())
+        # +880 1711... and 880 1711... are stored as the local 01711...
+        if digits.startswith("880") and len(digits) == 13:
+            digits = digits[2:]
+        return digits
+
+    @staticmethod
+    def normalize_phone_query(term):
+        # A typed prefix may be partial, so +880 18..., 8801811 and 01811 all become 01811...
+        digits = "".join(char for char in str(term or "") if char.isdigit())
+        if digits.startswith("880") and len(digits) > 3:
+            digits = digits[2:]
+        return digits
+
+    @staticmethod
+    def normalize_text(value):
+        if isinstance(value, dict):
+            value = " ".join(str(part) for part in value.values() if part)
+        return " ".join(str(value or "").lower().split())
+
+    @classmethod
+    def build_for(cls, order):
+        customer = order.customer
+        phone = cls.normalize_phone(customer.phone if customer else "")
+        whatsapp = cls.normalize_phone(customer.whatsapp if customer else "")
+        parts = [
+            order.order_id,
+            customer.full_name if customer else "",
+            phone,
+            whatsapp,
+            cls.normalize_text(order.shipping_address),
+        ]
+        document = " ".join(cls.normalize_text(part) for part in parts if part)
+        return cls(order_id=order.pk, document=document, phone=phone, whatsapp=whatsapp)
+
+    @classmethod
+    def index_orders(cls, orders, batch_size=1000):
+        # Upsert documents for the given orders, one statement per batch
+        documents = [cls.build_for(order) for order in orders]
+        cls.objects.bulk_create(
+            documents, batch_size=batch_size, update_conflicts=True,
+            unique_fields=["order"], update_fields=["document", "phone", "whatsapp", "updated_at"],
+        )
+        return len(documents)
+
+    @classmethod
+    def index_queryset(cls, orders, batch_size=1000):
+        orders = orders.select_related("customer").only(
+            "id", "order_id", "shipping_address", "customer__full_name", "customer__phone", "customer__whatsapp",
+        ).order_by("id")
+        indexed, batch = 0, []
+        for order in orders.iterator(chunk_size=batch_size):
+            batch.append(order)
+            if len(batch) >= batch_size:
+                indexed += cls.index_orders(batch, batch_size)
+                batch = []
+        if batch:
+            indexed += cls.index_orders(batch, batch_size)
+        return indexed
+
+    @staticmethod
+    def is_phone_query(term):
+        stripped = term.replace("+", "").replace("-", "").replace(" ", "")
+        return stripped.isdigit() and len(stripped) >= 3
+
+    @staticmethod
+    def get_prefix_range(prefix):
+        # Every string starting with prefix sorts in [prefix, prefix with last char + 1)
+        if not prefix:
+            return None
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    @classmethod
+    def has_fts_table(cls):
+        if not hasattr(cls, "_has_fts_table"):
+            cls._has_fts_table = cls.FTS_TABLE in connection.introspection.table_names()
+        return cls._has_fts_table
+
+    @classmethod
+    def get_phone_prefix_filter(cls, term):
+        prefix_range = cls.get_prefix_range(cls.normalize_phone_query(term))
+        if prefix_range is None:
+            return Q(pk__in=[])
+        low, high = prefix_range
+        return Q(phone__gte=low, phone__lt=high) | Q(whatsapp__gte=low, whatsapp__lt=high)
+
+    @classmethod
+    def get_text_filter(cls, term):
+        if connection.vendor == "sqlite" and len(term) >= cls.MIN_TRIGRAM_LENGTH and cls.has_fts_table():
+            match = '"' + term.replace('"', '""') + '"'
+            return Q(order_id__in=RawSQL(f"SELECT rowid FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s", [match]))
+        # Stored lower cased, so a plain LIKE (which the trigram index serves) is enough
+        return Q(document__contains=term)
+
+    @classmethod
+    def search(cls, term):
+        # Matching order ids, for use as id__in=... Phone looking terms also match as a phone prefix.
+        term = cls.normalize_text(term)
+        documents = cls.objects.all()
+        if not term:
+            return documents.values("order_id")
+        condition = cls.get_text_filter(term)
+        if cls.is_phone_query(term):
+            condition |= cls.get_phone_prefix_filter(term)
+        return documents.filter(condition).values("order_id")
+
+    def __str__(self):
+        return f"Search document for order {self.order_id}"
+
+
+@receiver(post_save, sender=Order)
+def order_search_document_update(sender, instance, created, **kwargs):
+    changed = any(instance.get_loaded_value(name) != getattr(instance, name) for name in OrderSearchDocument.SEARCH_FIELDS)
+    if created or changed:
+        OrderSearchDocument.index_orders([instance])
+
+
+@receiver(post_save, sender=CustomerProfile)
+def customer_search_document_update(sender, instance, created, **kwargs):
+    if created:
+        return
+    changed = any(instance.get_loaded_value(name) != getattr(instance, name) for name in OrderSearchDocument.CUSTOMER_FIELDS)
+    if changed:
+        OrderSearchDocument.index_queryset(Order.objects.filter(customer=instance))
@@ -1,3 +1,522 @@
-from django.test import TestCase
+from django.db import connection, connections, OperationalError
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import threading
+import time
+from unittest import mock
+from accounts.models import CustomerProfile, CustomerAddress
+from catalog.models import Product, ProductVariant
+from .models import Order, OrderItem, OrderSearchDocument, DailySalesRollup, OrderStatusCount, OrderNumberBlock, Shipment, DeliveryOption, CourierBookingJob, ShipmentSyncRun, OrderAuditLog
+from .utils import SteadFastParcelAPI, CourierBookingWorker, ShipmentStatusSync, CourierRegistry, SteadFastAdapter, CheckoutService, CheckoutError, OrderBulkUpdater
+from .utils import OrderIdCodec, OrderNumberAllocator, BlockSequenceAllocator
+from .utix import BOOKING_JOB_STATUS, ORDER_STATUS, ORDER_PAYMENT_STATUS
 
-# Create your tests here.
+
+class FakeSteadFastHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def record(self, payload=None):
+        self.server.requests.append({"method": self.command, "path": self.path, "headers": dict(self.headers), "json": payload})
+        self.server.connections.add(self.client_address)
+
+    def book(self, item):
+        if len(str(item.get("recipient_phone") or "")) != 11:
+            return {"invoice": item.get("invoice"), "consignment_id": None, "status": "error", "note": "Invalid recipient phone"}
+        self.server.next_consignment += 1
+        return {
+            "invoice": item.get("invoice"), "consignment_id": self.server.next_consignment,
+            "tracking_code": f"TRK{self.server.next_consignment}", "status": "success",
+        }
+
+    def do_POST(self):
+        payload = self.read_json()
+        self.record(payload)
+        if self.server.fail_with:
+            return self.send_json({"message": "unavailable"}, status=self.server.fail_with)
+        if self.path == "/create_order":
+            result = self.book(payload)
+            if result["status"] == "error":
+                return self.send_json({"status": 400, "message": result["note"]})
+            return self.send_json({"status": 200, "message": "Consignment has been created successfully.", "consignment": {
+                "consignment_id": result["consignment_id"], "invoice": result["invoice"], "status": "in_review",
+            }})
+        if self.path == "/create_order/bulk-order":
+            return self.send_json({"status": 200, "data": [self.book(item) for item in payload.get("data", [])]})
+        self.send_json({"message": "not found"}, status=404)
+
+    def do_GET(self):
+        self.record()
+        if self.server.fail_with:
+            return self.send_json({"message": "unavailable"}, status=self.server.fail_with)
+        if self.path.startswith("/status_by_cid/"):
+            consignment_id = self.path.rsplit("/", 1)[-1]
+            return self.send_json({"status": 200, "delivery_status": self.server.statuses.get(consignment_id, "in_review")})
+        self.send_json({"message": "not found"}, status=404)
+
+
+class FakeSteadFastServer:
+    # Local stand-in for the SteadFast API: create_order, bulk-order and status_by_cid
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeSteadFastHandler)
+        self.httpd.requests = []
+        self.httpd.connections = set()
+        self.httpd.statuses = {}
+        self.httpd.fail_with = None
+        self.httpd.next_consignment = 1000
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CourierBookingTests(TestCase):
+    def setUp(self):
+        self.server = FakeSteadFastServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.courier = DeliveryOption.objects.create(
+            name="SteadFast", type="STEADFAST", api_url=self.server.url, api_key="key", secret_key="secret",
+        )
+        self.customer = CustomerProfile.objects.create(full_name="Rahim", phone="01711111111")
+
+    def create_order(self, phone="01711111111"):
+        customer = self.customer if phone == self.customer.phone else CustomerProfile.objects.create(full_name="Karim", phone=phone)
+        return Order.objects.create(customer=customer, shipping_address="Dhaka")
+
+    def test_client_loads_credentials_once_and_reuses_connection(self):
+        client = SteadFastParcelAPI(self.courier.id)
+        with self.assertNumQueries(1):
+            client.create_order({"invoice": "A1", "recipient_phone": "01711111111"})
+            client.delivery_status_checking(1001)
+            client.delivery_status_checking(1001)
+        client.close()
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.requests[0]["headers"]["Api-Key"], "key")
+
+    def test_bulk_booking_maps_results_to_shipments(self):
+        orders = [self.create_order(), self.create_order(), self.create_order(phone="0171")]
+        CourierBookingJob.enqueue_many(orders, self.courier)
+
+        CourierBookingWorker(batch_size=50).run_once()
+
+        self.assertEqual([request["path"] for request in self.server.requests], ["/create_order/bulk-order"])
+        self.assertEqual(len(self.server.requests[0]["json"]["data"]), 3)
+        jobs = {job.order_id: job for job in CourierBookingJob.objects.select_related("shipment")}
+        for order in orders[:2]:
+            self.assertEqual(jobs[order.id].status, BOOKING_JOB_STATUS.SUCCEEDED)
+            self.assertEqual(jobs[order.id].shipment.order_id, order.id)
+        self.assertEqual(jobs[orders[2].id].status, BOOKING_JOB_STATUS.FAILED)
+        self.assertEqual(jobs[orders[2].id].last_error, "Invalid recipient phone")
+        self.assertEqual(Shipment.objects.count(), 2)
+
+    def test_courier_outage_requeues_with_backoff(self):
+        orders = [self.create_order(), self.create_order()]
+        CourierBookingJob.enqueue_many(orders, self.courier)
+        self.server.httpd.fail_with = 503
+
+        CourierBookingWorker(batch_size=50).run_once()
+
+        for job in CourierBookingJob.objects.all():
+            self.assertEqual(job.status, BOOKING_JOB_STATUS.QUEUED)
+            self.assertEqual(job.attempts, 1)
+            self.assertGreater(job.next_attempt_at, job.updated_at)
+        self.assertFalse(Shipment.objects.exists())
+
+    def test_broken_order_fails_alone_in_a_batch(self):
+        orders = [self.create_order(), Order.objects.create(shipping_address="Dhaka")]
+        CourierBookingJob.enqueue_many(orders, self.courier)
+
+        CourierBookingWorker(batch_size=50).run_once()
+
+        jobs = {job.order_id: job for job in CourierBookingJob.objects.all()}
+        self.assertEqual(jobs[orders[0].id].status, BOOKING_JOB_STATUS.SUCCEEDED)
+        self.assertEqual(jobs[orders[1].id].status, BOOKING_JOB_STATUS.FAILED)
+        self.assertIn("AttributeError", jobs[orders[1].id].last_error)
+        self.assertEqual(len(self.server.requests[0]["json"]["data"]), 1)
+
+    def test_unexpected_error_fails_job_instead_of_stopping_the_worker(self):
+        CourierBookingJob.enqueue(Order.objects.create(shipping_address="Dhaka"), self.courier)
+
+        CourierBookingWorker().run_once()
+
+        job = CourierBookingJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (BOOKING_JOB_STATUS.FAILED, 1))
+        self.assertEqual(self.server.requests, [])
+
+    def test_stale_job_on_its_last_attempt_is_failed(self):
+        job = CourierBookingJob.enqueue(self.create_order(), self.courier)
+        CourierBookingJob.objects.filter(id=job.id).update(
+            status=BOOKING_JOB_STATUS.RUNNING, attempts=job.max_attempts, locked_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertEqual(CourierBookingWorker().run_once(), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BOOKING_JOB_STATUS.FAILED)
+        self.assertEqual(self.server.requests, [])
+
+    def test_registry_reuses_adapter_per_courier(self):
+        adapter = CourierRegistry.get_adapter(self.courier)
+        self.assertIsInstance(adapter, SteadFastAdapter)
+        self.assertIs(CourierRegistry.get_adapter(DeliveryOption.objects.get(id=self.courier.id)), adapter)
+        other = DeliveryOption.objects.create(name="SteadFast 2", type="steadfast", api_url=self.server.url, api_key="k2")
+        self.assertIsNot(CourierRegistry.get_adapter(other), adapter)
+        self.assertIs(CourierRegistry.get_adapter(other).get_rate_limiter(), adapter.get_rate_limiter())
+
+    def test_unsupported_courier_fails_job(self):
+        courier = DeliveryOption.objects.create(name="Pathao", type="PATHAO", api_url=self.server.url)
+        CourierBookingJob.enqueue(self.create_order(), courier)
+
+        CourierBookingWorker().run_once()
+
+        job = CourierBookingJob.objects.get()
+        self.assertEqual(job.status, BOOKING_JOB_STATUS.FAILED)
+        self.assertIn("PATHAO", job.last_error)
+        self.assertEqual(self.server.requests, [])
+
+
+class ShipmentStatusSyncTests(TestCase):
+    def setUp(self):
+        self.server = FakeSteadFastServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.courier = DeliveryOption.objects.create(
+            name="SteadFast", type="STEADFAST", api_url=self.server.url, api_key="key", secret_key="secret",
+        )
+        self.customer = CustomerProfile.objects.create(full_name="Rahim", phone="01711111111")
+
+    def create_shipment(self, tracking_number, order_status=ORDER_STATUS.CONFIRMED, status="in_review"):
+        order = Order.objects.create(customer=self.customer, order_status=order_status)
+        return Shipment.objects.create(order=order, courier=self.courier, tracking_number=tracking_number, status=status)
+
+    def test_sync_updates_changed_shipments_and_cascades_orders(self):
+        picked = self.create_shipment("1")
+        delivered = self.create_shipment("2", order_status=ORDER_STATUS.SHIPPED, status="pending")
+        unchanged = self.create_shipment("3")
+        finished = self.create_shipment("4", order_status=ORDER_STATUS.DELIVERED, status="delivered")
+        self.server.httpd.statuses.update({"1": "pending", "2": "delivered", "3": "in_review"})
+
+        sync_run = ShipmentStatusSync(concurrency=4).run()
+
+        self.assertEqual((sync_run.checked, sync_run.changed, sync_run.orders_updated, sync_run.errors), (3, 2, 2, 0))
+        self.assertEqual(len(self.server.requests), 3)
+        picked.refresh_from_db()
+        delivered.refresh_from_db()
+        unchanged.refresh_from_db()
+        self.assertEqual(picked.status, "pending")
+        self.assertIsNotNone(picked.shipped_at)
+        self.assertEqual(delivered.status, "delivered")
+        self.assertIsNotNone(delivered.delivered_at)
+        self.assertIsNotNone(unchanged.checked_at)
+        self.assertEqual(Order.objects.get(id=picked.order_id).order_status, ORDER_STATUS.SHIPPED)
+        self.assertEqual(Order.objects.get(id=delivered.order_id).order_status, ORDER_STATUS.DELIVERED)
+        self.assertEqual(Order.objects.get(id=finished.order_id).order_status, ORDER_STATUS.DELIVERED)
+        self.assertEqual(OrderAuditLog.objects.count(), 2)
+
+    def test_sync_records_courier_errors(self):
+        self.create_shipment("1")
+        self.server.httpd.statuses["1"] = "pending"
+        self.server.httpd.fail_with = 500
+
+        sync_run = ShipmentStatusSync().run()
+
+        self.assertEqual((sync_run.checked, sync_run.changed, sync_run.errors), (1, 0, 1))
+        self.assertEqual(len(sync_run.error_samples), 1)
+        self.assertEqual(ShipmentSyncRun.objects.count(), 1)
+
+    def test_unexpected_error_is_recorded_per_tracking_number(self):
+        self.create_shipment("1")
+        good = self.create_shipment("2")
+        self.server.httpd.statuses["2"] = "pending"
+        status = SteadFastAdapter.status
+
+        def broken_status(adapter, tracking_number):
+            if tracking_number == "1":
+                raise KeyError("delivery_status")
+            return status(adapter, tracking_number)
+
+        with mock.patch.object(SteadFastAdapter, "status", broken_status):
+            sync_run = ShipmentStatusSync().run()
+
+        self.assertEqual((sync_run.checked, sync_run.changed, sync_run.errors), (2, 1, 1))
+        self.assertEqual(Order.objects.get(id=good.order_id).order_status, ORDER_STATUS.SHIPPED)
+
+    def test_order_changed_by_staff_during_sync_is_left_alone(self):
+        shipment = self.create_shipment("1")
+        self.server.httpd.statuses["1"] = "delivered"
+
+        class StaffCancelsSync(ShipmentStatusSync):
+            def update_orders(self, order_statuses):
+                Order.objects.filter(id=shipment.order_id).update(order_status=ORDER_STATUS.CANCELLED)
+                return super().update_orders(order_statuses)
+
+        sync_run = StaffCancelsSync().run()
+
+        self.assertEqual((sync_run.changed, sync_run.orders_updated), (1, 0))
+        self.assertEqual(Order.objects.get(id=shipment.order_id).order_status, ORDER_STATUS.CANCELLED)
+
+    def test_more_orders_than_one_bulk_update_are_chunked(self):
+        shipments = [self.create_shipment(str(number)) for number in range(1, 4)]
+        self.server.httpd.statuses.update({"1": "pending", "2": "pending", "3": "pending"})
+
+        with mock.patch.object(OrderBulkUpdater, "MAX_ORDERS", 2):
+            sync_run = ShipmentStatusSync().run()
+
+        self.assertEqual((sync_run.changed, sync_run.orders_updated), (3, 3))
+        self.assertEqual(Order.objects.filter(id__in=[shipment.order_id for shipment in shipments], order_status=ORDER_STATUS.SHIPPED).count(), 3)
+
+
+class OrderSearchDocumentTests(TestCase):
+    def test_phone_prefix_matches_local_and_international_forms(self):
+        customer = CustomerProfile.objects.create(full_name="Rahim", phone="+8801811223344")
+        order = Order.objects.create(customer=customer)
+        Order.objects.create(customer=CustomerProfile.objects.create(full_name="Karim", phone="01911223344"))
+
+        for term in ("01811", "+8801811", "8801811", "+880 1811-22", "+8801811223344"):
+            with self.subTest(term=term):
+                self.assertEqual(list(Order.objects.filter(id__in=OrderSearchDocument.search(term)).values_list("id", flat=True)), [order.id])
+
+
+class CheckoutServiceTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(title="Panjabi", price=100, discount_price=90)
+        self.variant = ProductVariant.objects.create(product=self.product, sku="PJ-M", price=120, discount_price=110)
+
+    def checkout(self, **kwargs):
+        data = {
+            "product_id": self.product.id, "quantity": 2, "name": "Rahim", "phone": "01711111111",
+            "district": "Dhaka", "address": "House 1", "shipping_total": 80,
+        }
+        data.update(kwargs)
+        return CheckoutService(**data).place()
+
+    def test_order_is_written_with_totals(self):
+        result = self.checkout(variant_sku="PJ-M")
+
+        order = Order.objects.get(id=result.order.id)
+        self.assertTrue(result.created)
+        self.assertEqual((order.items_count, order.total_quantity), (1, 2))
+        self.assertEqual((order.gross_total, order.discount_total, order.grand_total), (240, 220, 300))
+        item = order.items.get()
+        self.assertEqual((item.variant_id, item.total_price, item.discount_total_price), (self.variant.id, 240, 220))
+
+    def test_double_submit_returns_the_first_order(self):
+        first = self.checkout()
+        second = self.checkout()
+        keyed = self.checkout(idempotency_key="cart-1", quantity=1)
+        replay = self.checkout(idempotency_key="cart-1", quantity=1)
+
+        self.assertFalse(second.created)
+        self.assertEqual(second.order.id, first.order.id)
+        self.assertFalse(replay.created)
+        self.assertEqual(replay.order.id, keyed.order.id)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_reused_key_with_different_details_is_rejected(self):
+        self.checkout(idempotency_key="form-1")
+        with self.assertRaises(CheckoutError):
+            self.checkout(idempotency_key="form-1", quantity=5)
+        self.assertTrue(self.checkout(idempotency_key="form-2").created)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_keyless_double_submit_across_a_window_edge_is_merged(self):
+        first = self.checkout()
+        Order.objects.filter(id=first.order.id).update(idempotency_key="auto:previous-window")
+
+        second = self.checkout()
+
+        self.assertFalse(second.created)
+        self.assertEqual(second.order.id, first.order.id)
+
+    def test_customer_and_address_are_reused(self):
+        self.checkout(idempotency_key="form-1")
+        with CaptureQueriesContext(connection) as queries:
+            self.checkout(quantity=3, name="Rahim Uddin", idempotency_key="form-2")
+
+        self.assertEqual(CustomerProfile.objects.get().full_name, "Rahim Uddin")
+        self.assertEqual(CustomerAddress.objects.count(), 1)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertLessEqual(len(queries), 17)
+
+    def test_price_mismatch_is_rejected(self):
+        with self.assertRaises(CheckoutError):
+            self.checkout(expected_unit_price="80")
+        with self.assertRaises(CheckoutError):
+            self.checkout(variant_sku="missing")
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderIdCodecTests(TestCase):
+    def test_numbers_map_one_to_one_onto_the_order_id_format(self):
+        codec = OrderIdCodec(key="test-key")
+        numbers = list(range(5000)) + [OrderIdCodec.SPACE - 1 - index for index in range(5000)]
+        order_ids = [codec.encode(number) for number in numbers]
+
+        self.assertEqual(len(set(order_ids)), len(numbers))
+        self.assertTrue(all(re.fullmatch(r"[A-Z]{3}\d{6}", order_id) for order_id in order_ids))
+        self.assertEqual([codec.decode(order_id) for order_id in order_ids], numbers)
+        self.assertNotEqual(order_ids[:5], [OrderIdCodec(key="other-key").encode(number) for number in range(5)])
+        with self.assertRaises(ValueError):
+            codec.decode("AB1234567")
+
+
+class OrderNumberAllocatorTests(TestCase):
+    def setUp(self):
+        OrderNumberAllocator.reset_default()
+        self.addCleanup(OrderNumberAllocator.reset_default)
+
+    def test_orders_get_ids_without_probing_the_orders_table(self):
+        Order.objects.create()
+        with CaptureQueriesContext(connection) as queries:
+            order = Order.objects.create()
+
+        self.assertRegex(order.order_id, r"^[A-Z]{3}\d{6}$")
+        self.assertFalse([query for query in queries if "order_id" in query["sql"] and query["sql"].startswith("SELECT")])
+        self.assertEqual(OrderNumberBlock.objects.count(), 1)
+
+    def test_legacy_id_collision_moves_to_a_fresh_block(self):
+        allocator = OrderNumberAllocator.get_default()
+        taken = allocator.codec.encode(allocator.next_number() + 1)
+        legacy = Order.objects.create(order_id=taken)
+
+        order = Order.objects.create()
+
+        self.assertNotEqual(order.order_id, legacy.order_id)
+        self.assertEqual(OrderNumberBlock.objects.count(), 2)
+
+
+class OrderNumberConcurrencyTests(TransactionTestCase):
+    def test_parallel_allocators_never_repeat_an_id(self):
+        allocators = [BlockSequenceAllocator(block_size=7) for _ in range(4)]
+        results, errors = [], []
+        start = threading.Barrier(8)
+
+        def next_order_id(allocator):
+            # SQLite's shared in-memory test database raises on a locked table instead of waiting
+            for _ in range(100):
+                try:
+                    return allocator.next_order_id()
+                except OperationalError:
+                    time.sleep(0.01)
+            return allocator.next_order_id()
+
+        def allocate(allocator):
+            try:
+                start.wait()
+                order_ids = [next_order_id(allocator) for _ in range(150)]
+                results.extend(order_ids)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=allocate, args=(allocators[index % 4],)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 1200)
+        self.assertEqual(len(set(results)), 1200)
+        self.assertEqual(OrderNumberBlock.objects.count(), 4 * -(-300 // 7))
+
+
+class DailySalesRollupTests(TestCase):
+    FIELDS = ["order_count", "item_quantity", "gross_total", "discount_total", "shipping_total"]
+
+    def setUp(self):
+        self.product = Product.objects.create(title="Panjabi", price=100, discount_price=90)
+
+    def get_rollup(self):
+        rows = (
+            DailySalesRollup.objects.values(*DailySalesRollup.KEY_FIELDS)
+            .annotate(**{name: Sum(name) for name in self.FIELDS}).order_by()
+        )
+        return {tuple(row[name] for name in DailySalesRollup.KEY_FIELDS): [row[name] for name in self.FIELDS] for row in rows if row["order_count"]}
+
+    def get_expected(self):
+        rows = (
+            Order.objects.values("order_status", "payment_status", "delivery_type", day=TruncDate("placed_at"))
+            .annotate(**DailySalesRollup.get_order_aggregates()).order_by()
+        )
+        return {
+            (row["day"], row["order_status"], row["payment_status"], row["delivery_type"]): [row[name] or 0 for name in self.FIELDS]
+            for row in rows
+        }
+
+    def test_order_and_item_writes_apply_deltas(self):
+        orders = [Order.objects.create(shipping_total=60) for _ in range(3)]
+        for order in orders:
+            OrderItem.objects.create(order=order, product=self.product, quantity=2, c_unit_price=100, d_unit_price=90)
+        item = OrderItem.objects.create(order=orders[0], product=self.product, quantity=1, c_unit_price=100, d_unit_price=90)
+        self.assertEqual(self.get_rollup(), self.get_expected())
+
+        orders[1].order_status = ORDER_STATUS.CONFIRMED
+        orders[1].save()
+        OrderBulkUpdater([orders[2].id], {"payment_status": ORDER_PAYMENT_STATUS.PAID}).run()
+        item.quantity = 3
+        item.save()
+        self.assertEqual(self.get_rollup(), self.get_expected())
+
+        orders[0].delete()
+        self.assertEqual(self.get_rollup(), self.get_expected())
+        self.assertEqual(sum(values[0] for values in self.get_rollup().values()), 2)
+
+
+class OrderStatusCountTests(TestCase):
+    def test_sharded_counts_follow_orders_and_reconcile_repairs_drift(self):
+        orders = [Order.objects.create() for _ in range(20)]
+        orders[0].order_status = ORDER_STATUS.CONFIRMED
+        orders[0].save()
+        orders[1].delete()
+
+        counts = OrderStatusCount.get_counts()
+        self.assertEqual((counts[ORDER_STATUS.NEW], counts[ORDER_STATUS.CONFIRMED], counts["all"]), (18, 1, 19))
+        self.assertGreater(OrderStatusCount.objects.filter(status=ORDER_STATUS.NEW).count(), 1)
+
+        OrderStatusCount.objects.filter(status=ORDER_STATUS.NEW).update(count=5)
+        drift = OrderStatusCount.reconcile()
+
+        self.assertEqual(drift[ORDER_STATUS.NEW][1], 18)
+        self.assertEqual(OrderStatusCount.get_counts()[ORDER_STATUS.NEW], 18)
+        self.assertEqual(OrderStatusCount.reconcile(), {})
@@ -1,8 +1,10 @@
 from django.urls import path
-from .api_views import DeliveryOptionListAPIView, OrderDeliveryOptionSubmitView, ShipmentInfoAPIView
+from .api_views import DeliveryOptionListAPIView, OrderDeliveryOptionSubmitView, ShipmentInfoAPIView, OrderBulkDeliveryOptionSubmitView, CourierBookingJobStatusView
 
 urlpatterns = [
     path('api/v1/delivery-options/', DeliveryOptionListAPIView.as_view(), name="delivery-options"),
     path('api/v1/shipment-info/<int:order_id>/', ShipmentInfoAPIView.as_view(), name="shipment-info"),
     path('api/v1/orders/delivery-option-submit/<int:pk>/', OrderDeliveryOptionSubmitView.as_view(), name='order_delivery_option_submit'),
+    path('api/v1/orders/delivery-option-submit/bulk/', OrderBulkDeliveryOptionSubmitView.as_view(), name='order_bulk_delivery_option_submit'),
+    path('api/v1/orders/courier-booking-jobs/<int:pk>/', CourierBookingJobStatusView.as_view(), name='courier_booking_job_status'),
 ]
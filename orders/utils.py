@@ -1,38 +1,1058 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from .models import DeliveryOption
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.text import slugify
+from accounts.models import CustomUser, CustomerProfile, CustomerAddress
+from catalog.models import Product, ProductVariant
+from accounts.utix import USER_TYPE
+from .models import DeliveryOption, Order, OrderItem, OrderAuditLog, OrderStatusCount, DailySalesRollup, CourierBookingJob, Shipment, ShipmentSyncRun, OrderNumberBlock
+from .utix import ORDER_STATUS, ORDER_PAYMENT_STATUS, DELIVERY_TYPE, BOOKING_JOB_STATUS, LOGISTIC_SERVICE_PROVIDER
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from requests.adapters import HTTPAdapter
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
 import requests
 
 
 class SteadFastParcelAPI:
-    def __init__(self, id):
-        self.id = id
-    
+    # Credentials are loaded once per client and every call goes through one pooled,
+    # keep-alive session, so a batch costs one DB read and one TLS handshake.
+    TIMEOUT = (5, 30)
+    BULK_CHUNK_SIZE = 500
+    POOL_SIZE = 10
+
+    def __init__(self, id=None, courier=None):
+        self.id = courier.id if courier else id
+        self.courier = courier
+        self._session = None
+
     def get_steadfast_credentials(self):
-        try:
-            steadfast = get_object_or_404(DeliveryOption, id=self.id)
-            return steadfast
-        except DeliveryOption.DoesNotExist:
-            return None
+        if self.courier is None:
+            self.courier = get_object_or_404(DeliveryOption, id=self.id)
+        return self.courier
+
+    @property
+    def session(self):
+        if self._session is None:
+            steadfast = self.get_steadfast_credentials()
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Content-Type": "application/json",
+                "Api-Key": steadfast.api_key or "",
+                "Secret-Key": steadfast.secret_key or "",
+            })
+            self._session = session
+        return self._session
+
+    def get_url(self, path):
+        return f"{self.get_steadfast_credentials().api_url}{path}"
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def create_order(self, order_data):
-        url = f"{self.get_steadfast_credentials().api_url}/create_order"
-        headers = {
-            "Content-Type": "application/json",
-            "Api-Key": self.get_steadfast_credentials().api_key,
-            "Secret-Key": self.get_steadfast_credentials().secret_key
-        }
-        response = requests.post(url, headers=headers, json=order_data)
+        response = self.session.post(self.get_url("/create_order"), json=order_data, timeout=self.TIMEOUT)
         response.raise_for_status()
         return response.json()
 
+    def bulk_create_order(self, orders_data):
+        # One bulk-order call per BULK_CHUNK_SIZE orders; returns the per invoice results
+        results = []
+        for start in range(0, len(orders_data), self.BULK_CHUNK_SIZE):
+            chunk = orders_data[start:start + self.BULK_CHUNK_SIZE]
+            response = self.session.post(self.get_url("/create_order/bulk-order"), json={"data": chunk}, timeout=self.TIMEOUT)
+            response.raise_for_status()
+            payload = response.json()
+            data = payload.get("data") if isinstance(payload, dict) else payload
+            results.extend(data or [])
+        return results
+
     def delivery_status_checking(self, consignment_id):
-        steadfast = self.get_steadfast_credentials()
-        url = f"{steadfast.api_url}/status_by_cid/{consignment_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Api-Key": steadfast.api_key,
-            "Secret-Key": steadfast.secret_key
-        }
-        response = requests.get(url=url, headers=headers, timeout=10)
+        response = self.session.get(self.get_url(f"/status_by_cid/{consignment_id}"), timeout=self.TIMEOUT)
         response.raise_for_status()
         return response.json()
+
+class OrderBulkUpdater:
+    # Applies one set of field changes to many orders with a single UPDATE. Queryset
+    # update() skips the Order signals, so the audit log, status counters and sales
+    # rollup are written here directly. With from_statuses, only orders whose status is
+    # one of them when their row is locked are changed.
+    FIELDS = {
+        "order_status": "order_status",
+        "payment_status": "payment_status",
+        "work_assign": "work_assign_id",
+    }
+    MAX_ORDERS = 1000
+
+    def __init__(self, order_ids, changes, user=None, from_statuses=None):
+        self.order_ids = self.clean_order_ids(order_ids)
+        self.changes = self.clean_changes(changes)
+        self.user = user
+        self.from_statuses = from_statuses
+
+    def clean_order_ids(self, order_ids):
+        if not isinstance(order_ids, (list, tuple)):
+            raise ValueError("order_ids must be a list")
+        cleaned = []
+        for order_id in order_ids:
+            try:
+                cleaned.append(int(order_id))
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid order id: {order_id}")
+        cleaned = list(dict.fromkeys(cleaned))
+        if not cleaned:
+            raise ValueError("No orders selected")
+        if len(cleaned) > self.MAX_ORDERS:
+            raise ValueError(f"At most {self.MAX_ORDERS} orders can be updated at once")
+        return cleaned
+
+    def clean_changes(self, changes):
+        cleaned = {}
+        if changes.get("order_status"):
+            if changes["order_status"] not in ORDER_STATUS.values:
+                raise ValueError("Invalid order status")
+            cleaned["order_status"] = changes["order_status"]
+        if changes.get("payment_status"):
+            if changes["payment_status"] not in ORDER_PAYMENT_STATUS.values:
+                raise ValueError("Invalid payment status")
+            cleaned["payment_status"] = changes["payment_status"]
+        if "work_assign" in changes:
+            cleaned["work_assign_id"] = self.clean_work_assign(changes["work_assign"])
+        if not cleaned:
+            raise ValueError("Nothing to update")
+        return cleaned
+
+    def clean_work_assign(self, value):
+        if value in (None, ""):
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+            raise ValueError("Invalid staff for work assign")
+        value = int(value)
+        staff = CustomUser.objects.filter(
+            id=value, user_type__in=[USER_TYPE.ADMIN, USER_TYPE.STAFF, USER_TYPE.SUPER_ADMIN]
+        ).values_list("id", flat=True).first()
+        if staff is None:
+            raise ValueError("Invalid staff for work assign")
+        return staff
+
+    def run(self):
+        with transaction.atomic():
+            rows = {
+                row["id"]: row for row in
+                Order.objects.select_for_update()
+                .filter(id__in=self.order_ids)
+                .values("id", *dict.fromkeys([*DailySalesRollup.ORDER_FIELDS, *self.FIELDS.values()]))
+            }
+            changed, blocked = {}, set()
+            for order_id, row in rows.items():
+                if self.from_statuses is not None and row["order_status"] not in self.from_statuses:
+                    blocked.add(order_id)
+                    continue
+                fields = [name for name, value in self.changes.items() if row[name] != value]
+                if fields:
+                    changed[order_id] = fields
+            if changed:
+                Order.objects.filter(id__in=list(changed)).update(**self.changes, updated_at=timezone.now())
+                self.write_audit_logs(rows, changed)
+                self.update_bookkeeping(rows, changed)
+        return self.build_results(rows, changed, blocked)
+
+    def write_audit_logs(self, rows, changed):
+        labels = {attname: name for name, attname in self.FIELDS.items()}
+        OrderAuditLog.objects.bulk_create([
+            OrderAuditLog(
+                order_id=order_id,
+                changed_by=self.user,
+                field=labels[attname],
+                old_value=self.as_text(rows[order_id][attname]),
+                new_value=self.as_text(self.changes[attname]),
+            )
+            for order_id, fields in changed.items() for attname in fields
+        ])
+
+    @staticmethod
+    def as_text(value):
+        return None if value is None else str(value)
+
+    def update_bookkeeping(self, rows, changed):
+        status_deltas = {}
+        rollup_deltas = {}
+        for order_id in changed:
+            row = rows[order_id]
+            new_row = {**row, **self.changes}
+            if row["order_status"] != new_row["order_status"]:
+                status_deltas[row["order_status"]] = status_deltas.get(row["order_status"], 0) - 1
+                status_deltas[new_row["order_status"]] = status_deltas.get(new_row["order_status"], 0) + 1
+            DailySalesRollup.add_order(rollup_deltas, row, -1)
+            DailySalesRollup.add_order(rollup_deltas, new_row)
+        OrderStatusCount.apply_deltas(status_deltas)
+        DailySalesRollup.apply_deltas(rollup_deltas)
+
+    def build_results(self, rows, changed, blocked=()):
+        labels = {attname: name for name, attname in self.FIELDS.items()}
+        results = []
+        for order_id in self.order_ids:
+            if order_id not in rows:
+                results.append({"id": order_id, "success": False, "message": "Order not found"})
+            elif order_id in blocked:
+                results.append({"id": order_id, "success": False, "message": f"Order is {rows[order_id]['order_status']}, not updated"})
+            elif order_id in changed:
+                results.append({"id": order_id, "success": True, "updated": [labels[name] for name in changed[order_id]]})
+            else:
+                results.append({"id": order_id, "success": True, "updated": [], "message": "Already up to date"})
+        return results
+
+
+class CourierNotSupported(ValueError):
+    pass
+
+
+@dataclass
+class BookingResult:
+    invoice: str
+    success: bool
+    consignment_id: str = None
+    status: str = None
+    message: str = None
+    raw: dict = field(default_factory=dict)
+
+
+class RateLimiter:
+    # Token bucket shared by every thread in the process
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CourierAdapter:
+    # Common interface for courier integrations. Subclasses register with CourierRegistry
+    # under a LOGISTIC_SERVICE_PROVIDER value matching DeliveryOption.type. Adapters are
+    # cached for the life of the process, so each courier account keeps one HTTP session
+    # pool, and every adapter of a provider shares that provider's rate limiter.
+    type = None
+    RATE_LIMIT = 5
+    BULK_CHUNK_SIZE = 1
+    POOL_SIZE = 10
+    FINAL_STATUSES = []
+    ORDER_STATUS_MAP = {}
+    rate_limiters = {}
+    rate_limiters_lock = threading.Lock()
+
+    def __init__(self, courier):
+        self.courier = courier
+
+    @classmethod
+    def get_rate_limiter(cls):
+        with cls.rate_limiters_lock:
+            if cls.type not in cls.rate_limiters:
+                cls.rate_limiters[cls.type] = RateLimiter(cls.RATE_LIMIT)
+            return cls.rate_limiters[cls.type]
+
+    def throttle(self):
+        self.get_rate_limiter().acquire()
+
+    def get_order_status(self, status):
+        return self.ORDER_STATUS_MAP.get(status)
+
+    def get_order_data(self, order):
+        # Courier payload for one order. Adapters without a payload step book the order itself.
+        return order
+
+    def book(self, order):
+        raise NotImplementedError
+
+    def bulk_book(self, orders):
+        return [self.book(order) for order in orders]
+
+    def bulk_book_data(self, orders_data):
+        return self.bulk_book(orders_data)
+
+    def status(self, tracking_number):
+        raise NotImplementedError
+
+    def bulk_status(self, tracking_numbers, concurrency=None):
+        # {tracking_number: (status, error)}
+        def fetch(tracking_number):
+            try:
+                return tracking_number, self.status(tracking_number), None
+            except Exception as e:
+                # One bad response or parcel must not abort the whole run
+                return tracking_number, None, f"{tracking_number}: {e}"
+
+        workers = max(1, min(concurrency or self.POOL_SIZE, self.POOL_SIZE))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return {tracking_number: (status, error) for tracking_number, status, error in executor.map(fetch, tracking_numbers)}
+
+    def cancel(self, tracking_number):
+        raise NotImplementedError(f"{self.courier} does not support cancelling consignments")
+
+    def close(self):
+        pass
+
+
+class CourierRegistry:
+    adapters = {}
+    instances = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def register(cls, adapter_class):
+        cls.adapters[adapter_class.type] = adapter_class
+        return adapter_class
+
+    @classmethod
+    def get_adapter_class(cls, courier_type):
+        adapter_class = cls.adapters.get((courier_type or "").upper())
+        if adapter_class is None:
+            raise CourierNotSupported(f"No courier integration for '{courier_type}'")
+        return adapter_class
+
+    @classmethod
+    def get_adapter(cls, courier):
+        adapter_class = cls.get_adapter_class(courier.type)
+        key = (adapter_class, courier.api_url, courier.api_key, courier.secret_key)
+        with cls.lock:
+            cached = cls.instances.get(courier.id)
+            if cached and cached[0] == key:
+                return cached[1]
+            if cached:
+                cached[1].close()
+            adapter = adapter_class(courier)
+            cls.instances[courier.id] = (key, adapter)
+            return adapter
+
+    @classmethod
+    def get_final_statuses(cls):
+        return sorted({status for adapter_class in cls.adapters.values() for status in adapter_class.FINAL_STATUSES})
+
+
+@CourierRegistry.register
+class SteadFastAdapter(CourierAdapter):
+    type = LOGISTIC_SERVICE_PROVIDER.STEADFAST
+    RATE_LIMIT = 10
+    BULK_CHUNK_SIZE = SteadFastParcelAPI.BULK_CHUNK_SIZE
+    POOL_SIZE = SteadFastParcelAPI.POOL_SIZE
+    FINAL_STATUSES = ["delivered", "partial_delivered", "cancelled"]
+    ORDER_STATUS_MAP = {
+        "pending": ORDER_STATUS.SHIPPED,
+        "hold": ORDER_STATUS.SHIPPED,
+        "delivered_approval_pending": ORDER_STATUS.SHIPPED,
+        "partial_delivered_approval_pending": ORDER_STATUS.SHIPPED,
+        "cancelled_approval_pending": ORDER_STATUS.SHIPPED,
+        "delivered": ORDER_STATUS.DELIVERED,
+        "partial_delivered": ORDER_STATUS.DELIVERED,
+        "cancelled": ORDER_STATUS.RETURNED,
+    }
+
+    def __init__(self, courier):
+        super().__init__(courier)
+        self.client = SteadFastParcelAPI(courier=courier)
+
+    @staticmethod
+    def get_order_data(order):
+        customer = order.customer
+        email = (customer.user.email if customer.user else None) or None
+        data = {
+            "invoice": order.order_id,
+            "recipient_name": customer.full_name,
+            "recipient_phone": customer.phone,
+            "recipient_address": order.shipping_address,
+            "cod_amount": float(order.get_total_order_amount),
+            "note": order.note,
+            "total_lot": order.items_count,
+            "delivery_type": 1 if order.delivery_type == DELIVERY_TYPE.PICKUP else 0,
+        }
+        if customer.whatsapp:
+            data["alternative_phone"] = customer.whatsapp
+        if email:
+            data["recipient_email"] = email
+        return data
+
+    def book(self, order):
+        self.throttle()
+        response = self.client.create_order(self.get_order_data(order))
+        if response.get("status") != 200:
+            return BookingResult(order.order_id, False, message=response.get("message") or "Courier rejected the order", raw=response)
+        consignment = response.get("consignment") or {}
+        return BookingResult(
+            order.order_id, True, consignment_id=str(consignment.get("consignment_id")),
+            status=consignment.get("status") or "in_review", message=response.get("message"), raw=response,
+        )
+
+    def bulk_book(self, orders):
+        return self.bulk_book_data([self.get_order_data(order) for order in orders])
+
+    def bulk_book_data(self, orders_data):
+        results = []
+        for start in range(0, len(orders_data), self.BULK_CHUNK_SIZE):
+            self.throttle()
+            for item in self.client.bulk_create_order(orders_data[start:start + self.BULK_CHUNK_SIZE]):
+                if item.get("consignment_id") and item.get("status") != "error":
+                    results.append(BookingResult(
+                        str(item.get("invoice")), True, consignment_id=str(item["consignment_id"]),
+                        status=item.get("delivery_status") or "in_review", raw=item,
+                    ))
+                else:
+                    results.append(BookingResult(
+                        str(item.get("invoice")), False,
+                        message=item.get("note") or item.get("message") or "Courier rejected the order", raw=item,
+                    ))
+        return results
+
+    def status(self, tracking_number):
+        self.throttle()
+        return self.client.delivery_status_checking(tracking_number).get("delivery_status")
+
+    def close(self):
+        self.client.close()
+
+
+class CourierBookingWorker:
+    # Books queued CourierBookingJob rows. Jobs are claimed with a conditional UPDATE
+    # (status queued -> running), so several workers can run side by side, and the courier
+    # call happens outside any DB transaction.
+    LEASE_SECONDS = 300
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 3600
+    MAX_BATCH_SIZE = 500
+
+    def __init__(self, worker_id=None, batch_size=20):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = min(batch_size, self.MAX_BATCH_SIZE)
+
+    def release_stale(self):
+        # Jobs whose worker died mid-call go back to the queue after the lease expires,
+        # unless they have used up their attempts, so a job that keeps killing the worker
+        # ends up FAILED instead of looping forever.
+        now = timezone.now()
+        stale = CourierBookingJob.objects.filter(
+            status=BOOKING_JOB_STATUS.RUNNING, locked_at__lt=now - timedelta(seconds=self.LEASE_SECONDS),
+        )
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status=BOOKING_JOB_STATUS.FAILED, locked_at=None, locked_by=None, updated_at=now,
+            last_error="Worker lease expired on the last attempt",
+        )
+        return stale.update(status=BOOKING_JOB_STATUS.QUEUED, locked_at=None, locked_by=None, updated_at=now)
+
+    def claim(self):
+        now = timezone.now()
+        due = list(
+            CourierBookingJob.objects
+            .filter(status=BOOKING_JOB_STATUS.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", "attempts", "max_attempts")[:self.batch_size]
+        )
+        exhausted = [job_id for job_id, attempts, max_attempts in due if attempts >= max_attempts]
+        if exhausted:
+            CourierBookingJob.objects.filter(id__in=exhausted, status=BOOKING_JOB_STATUS.QUEUED).update(
+                status=BOOKING_JOB_STATUS.FAILED, updated_at=now,
+            )
+        due = [job_id for job_id, attempts, max_attempts in due if attempts < max_attempts]
+        if not due:
+            return []
+        CourierBookingJob.objects.filter(id__in=due, status=BOOKING_JOB_STATUS.QUEUED).update(
+            status=BOOKING_JOB_STATUS.RUNNING, locked_at=now, locked_by=self.worker_id,
+            attempts=F("attempts") + 1, updated_at=now,
+        )
+        return list(
+            CourierBookingJob.objects
+            .filter(id__in=due, status=BOOKING_JOB_STATUS.RUNNING, locked_by=self.worker_id, locked_at=now)
+            .select_related("order__customer__user", "courier")
+        )
+
+    def get_backoff(self, attempts):
+        delay = min(self.BACKOFF_BASE * 2 ** max(attempts - 1, 0), self.BACKOFF_MAX)
+        return timedelta(seconds=delay + random.uniform(0, self.BACKOFF_BASE))
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            code = error.response.status_code
+            return code == 429 or code >= 500
+        return True
+
+    @staticmethod
+    def describe_error(error):
+        return f"{type(error).__name__}: {error}"
+
+    def process(self, adapter, job):
+        try:
+            result = adapter.book(job.order)
+        except requests.RequestException as e:
+            return self.fail(job, str(e), retryable=self.is_retryable(e))
+        except Exception as e:
+            return self.fail(job, self.describe_error(e), retryable=False)
+        if not result.success:
+            return self.fail(job, result.message, retryable=False, response=result.raw)
+        return self.succeed(job, result)
+
+    def process_bulk(self, adapter, jobs):
+        # Payloads are built one order at a time, so a broken order fails on its own
+        ready, orders_data = [], []
+        for job in jobs:
+            try:
+                orders_data.append(adapter.get_order_data(job.order))
+                ready.append(job)
+            except Exception as e:
+                self.fail(job, self.describe_error(e), retryable=False)
+        if not ready:
+            return jobs
+
+        try:
+            results = adapter.bulk_book_data(orders_data)
+        except requests.RequestException as e:
+            retryable = self.is_retryable(e)
+            for job in ready:
+                self.fail(job, str(e), retryable=retryable)
+            return jobs
+        except Exception as e:
+            for job in ready:
+                self.fail(job, self.describe_error(e), retryable=False)
+            return jobs
+
+        pending = {job.idempotency_key: job for job in ready}
+        booked, shipments = [], []
+        for result in results:
+            job = pending.pop(result.invoice, None)
+            if job is None:
+                continue
+            if result.success:
+                booked.append((job, result))
+                shipments.append(Shipment(
+                    order=job.order, courier=job.courier,
+                    tracking_number=result.consignment_id, status=result.status,
+                ))
+            else:
+                self.fail(job, result.message, retryable=False, response=result.raw)
+
+        if booked:
+            now = timezone.now()
+            with transaction.atomic():
+                Shipment.objects.bulk_create(shipments)
+                for (job, result), shipment in zip(booked, shipments):
+                    job.updated_at = now
+                    job.status = BOOKING_JOB_STATUS.SUCCEEDED
+                    job.shipment = shipment
+                    job.response = result.raw
+                    job.last_error = None
+                    job.locked_at = job.locked_by = None
+                CourierBookingJob.objects.bulk_update(
+                    [job for job, _ in booked],
+                    ["status", "shipment", "response", "last_error", "locked_at", "locked_by", "updated_at"],
+                )
+        for job in pending.values():
+            self.fail(job, "No result returned by courier")
+        return jobs
+
+    def succeed(self, job, result):
+        with transaction.atomic():
+            shipment = job.order.shipments.create(
+                courier=job.courier, tracking_number=result.consignment_id, status=result.status,
+            )
+            job.status = BOOKING_JOB_STATUS.SUCCEEDED
+            job.shipment = shipment
+            job.response = result.raw
+            job.last_error = None
+            job.locked_at = job.locked_by = None
+            job.save(update_fields=["status", "shipment", "response", "last_error", "locked_at", "locked_by", "updated_at"])
+        return job
+
+    def fail(self, job, error, retryable=True, response=None):
+        if retryable and job.attempts < job.max_attempts:
+            job.status = BOOKING_JOB_STATUS.QUEUED
+            job.next_attempt_at = timezone.now() + self.get_backoff(job.attempts)
+        else:
+            job.status = BOOKING_JOB_STATUS.FAILED
+        job.last_error = error
+        job.response = response or {}
+        job.locked_at = job.locked_by = None
+        job.save(update_fields=["status", "next_attempt_at", "last_error", "response", "locked_at", "locked_by", "updated_at"])
+        return job
+
+    def run_once(self):
+        self.release_stale()
+        jobs = self.claim()
+        by_courier = defaultdict(list)
+        for job in jobs:
+            by_courier[job.courier_id].append(job)
+        for courier_jobs in by_courier.values():
+            try:
+                adapter = CourierRegistry.get_adapter(courier_jobs[0].courier)
+            except CourierNotSupported as e:
+                for job in courier_jobs:
+                    self.fail(job, str(e), retryable=False)
+                continue
+            except Exception as e:
+                for job in courier_jobs:
+                    self.fail(job, self.describe_error(e), retryable=False)
+                continue
+            if len(courier_jobs) == 1 or adapter.BULK_CHUNK_SIZE == 1:
+                for job in courier_jobs:
+                    self.process(adapter, job)
+            else:
+                self.process_bulk(adapter, courier_jobs)
+        return jobs
+
+
+class ShipmentStatusSync:
+    # Polls the courier for in-flight shipments, least recently checked first. Each courier
+    # adapter polls on its own bounded thread pool; all DB work stays on the calling thread
+    # and is written back with bulk_update, and order status changes go through
+    # OrderBulkUpdater. Orders only move forward: a delivered order is never set back to shipped.
+    ORDER_STATUS_FROM = {
+        ORDER_STATUS.SHIPPED: [ORDER_STATUS.NEW, ORDER_STATUS.FOLLOW_UP, ORDER_STATUS.CONFIRMED],
+        ORDER_STATUS.DELIVERED: [ORDER_STATUS.NEW, ORDER_STATUS.FOLLOW_UP, ORDER_STATUS.CONFIRMED, ORDER_STATUS.SHIPPED],
+        ORDER_STATUS.RETURNED: [ORDER_STATUS.NEW, ORDER_STATUS.FOLLOW_UP, ORDER_STATUS.CONFIRMED, ORDER_STATUS.SHIPPED],
+    }
+    MAX_ERROR_SAMPLES = 20
+
+    def __init__(self, concurrency=8, limit=1000):
+        self.concurrency = max(1, concurrency)
+        self.limit = limit
+
+    def get_shipments(self):
+        return list(
+            Shipment.objects
+            .filter(tracking_number__isnull=False, courier__isnull=False)
+            .exclude(status__in=CourierRegistry.get_final_statuses())
+            .select_related("courier")
+            .only("id", "order_id", "status", "tracking_number", "shipped_at", "delivered_at", "checked_at", "courier")
+            .order_by(F("checked_at").asc(nulls_first=True), "id")[:self.limit]
+        )
+
+    def apply_status(self, shipment, status, order_status, now):
+        shipment.status = status
+        shipment.updated_at = now
+        if order_status == ORDER_STATUS.SHIPPED and not shipment.shipped_at:
+            shipment.shipped_at = now
+        if order_status == ORDER_STATUS.DELIVERED and not shipment.delivered_at:
+            shipment.delivered_at = now
+
+    def update_orders(self, order_statuses):
+        # The allowed "from" statuses are checked by OrderBulkUpdater under the row locks,
+        # so an order cancelled by staff meanwhile is left alone
+        targets = defaultdict(list)
+        for order_id, order_status in order_statuses.items():
+            if order_status in self.ORDER_STATUS_FROM:
+                targets[order_status].append(order_id)
+        updated = 0
+        size = OrderBulkUpdater.MAX_ORDERS
+        for target, order_ids in targets.items():
+            for start in range(0, len(order_ids), size):
+                results = OrderBulkUpdater(
+                    order_ids[start:start + size], {"order_status": target}, from_statuses=self.ORDER_STATUS_FROM[target]
+                ).run()
+                updated += sum(1 for result in results if result.get("updated"))
+        return updated
+
+    def run(self):
+        sync_run = ShipmentSyncRun.objects.create(started_at=timezone.now(), concurrency=self.concurrency)
+        shipments = self.get_shipments()
+        by_courier = defaultdict(list)
+        for shipment in shipments:
+            by_courier[shipment.courier_id].append(shipment)
+
+        changed, errors, order_statuses = [], [], {}
+        now = timezone.now()
+        for courier_shipments in by_courier.values():
+            try:
+                adapter = CourierRegistry.get_adapter(courier_shipments[0].courier)
+            except CourierNotSupported as e:
+                errors.extend(f"{shipment.tracking_number}: {e}" for shipment in courier_shipments)
+                continue
+            statuses = adapter.bulk_status([shipment.tracking_number for shipment in courier_shipments], self.concurrency)
+            for shipment in courier_shipments:
+                status, error = statuses[shipment.tracking_number]
+                if error:
+                    errors.append(error)
+                elif status and status != shipment.status:
+                    order_status = adapter.get_order_status(status)
+                    self.apply_status(shipment, status, order_status, now)
+                    order_statuses[shipment.order_id] = order_status
+                    changed.append(shipment)
+
+        checked_ids = [shipment.id for shipment in shipments]
+        with transaction.atomic():
+            Shipment.objects.filter(id__in=checked_ids).update(checked_at=now)
+            Shipment.objects.bulk_update(changed, ["status", "shipped_at", "delivered_at", "updated_at"])
+            orders_updated = self.update_orders(order_statuses)
+
+        sync_run.finished_at = timezone.now()
+        sync_run.checked = len(shipments)
+        sync_run.changed = len(changed)
+        sync_run.orders_updated = orders_updated
+        sync_run.errors = len(errors)
+        sync_run.error_samples = errors[:self.MAX_ERROR_SAMPLES]
+        sync_run.save()
+        return sync_run
+
+
+class CheckoutError(ValueError):
+    pass
+
+
+@dataclass
+class CheckoutResult:
+    order: object
+    created: bool
+
+
+class CheckoutService:
+    # Places a single-product storefront order: product and variant in one read, the
+    # customer and address upserted (an identical address is reused), and the order
+    # inserted with its totals already computed, so there is no follow-up recalculation.
+    # The idempotency key is unique on Order, so a double submit returns the first order;
+    # the payload hash stored next to it rejects a reused key carrying different details.
+    # Storefront forms send a per-form key. Without one, the same payload within
+    # IDEMPOTENCY_WINDOW seconds counts as a double submit.
+    IDEMPOTENCY_WINDOW = 120
+
+    def __init__(
+        self, product_id, quantity, name, phone, district, address, variant_sku=None, whatsapp=None, email=None,
+        upazila=None, area=None, shipping_total=0, metadata=None, idempotency_key=None, expected_unit_price=None,
+    ):
+        self.product_id = product_id
+        self.variant_sku = variant_sku or None
+        self.quantity = self.get_quantity(quantity)
+        self.name = (name or "").strip()
+        self.phone = str(phone or "").strip()
+        self.whatsapp = (whatsapp or "").strip() or None
+        self.email = (email or "").strip() or None
+        self.district = (district or "").strip()
+        self.address = (address or "").strip()
+        self.upazila = (upazila or "").strip() or None
+        self.area = (area or "").strip() or None
+        self.shipping_total = Decimal(str(shipping_total or 0))
+        self.metadata = metadata or {}
+        self.expected_unit_price = expected_unit_price
+        self.client_key = str(idempotency_key)[:100] if idempotency_key else None
+        self.payload_hash = self.get_payload_hash()
+        self.idempotency_key = self.get_idempotency_key()
+
+    @staticmethod
+    def get_quantity(quantity):
+        try:
+            quantity = int(quantity or 1)
+        except (TypeError, ValueError):
+            raise CheckoutError("Quantity must be a number")
+        if quantity <= 0:
+            raise CheckoutError("Quantity must be greater than 0")
+        return quantity
+
+    def get_payload_hash(self):
+        payload = json.dumps([
+            str(self.product_id), self.variant_sku, self.quantity, self.name, self.phone, self.whatsapp, self.email,
+            self.district, self.address, self.upazila, self.area, str(self.shipping_total), self.metadata,
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get_idempotency_key(self):
+        if self.client_key:
+            return f"client:{self.client_key}"
+        # Guards concurrent double submits; get_recent covers the window across bucket edges
+        return f"auto:{self.payload_hash}:{int(time.time() // self.IDEMPOTENCY_WINDOW)}"
+
+    def get_product(self):
+        if self.variant_sku:
+            variant = (
+                ProductVariant.objects.select_related("product")
+                .filter(product_id=self.product_id, sku=self.variant_sku).first()
+            )
+            if variant is None:
+                raise CheckoutError("Product Variant Not Found or Wrong Product ID")
+            return variant.product, variant
+        product = Product.objects.filter(id=self.product_id).first()
+        if product is None:
+            raise CheckoutError("Product Not Found or Wrong Product ID")
+        return product, None
+
+    @staticmethod
+    def get_prices(product, variant=None):
+        source = variant or product
+        return source.price, source.discount_price or source.price
+
+    def resolve_customer(self):
+        # Returns (customer, created). Only changed fields are written back.
+        if self.email:
+            user = CustomUser.objects.select_related("customer_profile").filter(email=self.email).first()
+            if user is None:
+                user = CustomUser.objects.create(
+                    email=self.email, full_name=self.name, username=self.get_unique_username(),
+                )
+                customer = CustomerProfile.objects.get(user=user)
+                self.update_customer(customer, full_name=self.name, phone=self.phone, whatsapp=self.whatsapp)
+                return customer, True
+            customer = user.customer_profile
+            self.update_customer(customer, whatsapp=self.whatsapp)
+            return customer, False
+
+        customer = CustomerProfile.objects.filter(phone=self.phone).order_by("id").first()
+        if customer is None:
+            return CustomerProfile.objects.create(phone=self.phone, whatsapp=self.whatsapp, full_name=self.name), True
+        self.update_customer(customer, full_name=self.name, whatsapp=self.whatsapp)
+        return customer, False
+
+    @staticmethod
+    def update_customer(customer, **values):
+        changed = [name for name, value in values.items() if value and getattr(customer, name) != value]
+        for name in changed:
+            setattr(customer, name, values[name])
+        if changed:
+            customer.save(update_fields=changed)
+        return customer
+
+    def get_unique_username(self):
+        return f"{slugify(self.name) or 'user'}-{uuid.uuid4().hex[:8]}"
+
+    def resolve_address(self, customer, customer_created):
+        values = {
+            "address": self.address, "district": self.district, "upazila": self.upazila, "area": self.area,
+        }
+        address = None
+        if not customer_created:
+            address = CustomerAddress.objects.filter(customer=customer, **values).first()
+        if address is None:
+            address = CustomerAddress.objects.create(customer=customer, **values)
+        return address.get_address
+
+    def get_existing(self):
+        order = Order.objects.filter(idempotency_key=self.idempotency_key).first()
+        if order is not None and order.idempotency_hash and order.idempotency_hash != self.payload_hash:
+            raise CheckoutError("This order was already submitted with different details")
+        return order
+
+    def get_recent(self):
+        since = timezone.now() - timedelta(seconds=self.IDEMPOTENCY_WINDOW)
+        return Order.objects.filter(idempotency_hash=self.payload_hash, placed_at__gte=since).order_by("-id").first()
+
+    def place(self):
+        product, variant = self.get_product()
+        c_unit_price, d_unit_price = self.get_prices(product, variant)
+        if self.expected_unit_price is not None and Decimal(str(self.expected_unit_price)) != Decimal(d_unit_price):
+            raise CheckoutError("Input Price and Product Price not Same!")
+
+        if self.client_key is None:
+            recent = self.get_recent()
+            if recent is not None:
+                return CheckoutResult(recent, False)
+
+        with transaction.atomic():
+            customer, customer_created = self.resolve_customer()
+            address = self.resolve_address(customer, customer_created)
+            total_price = Decimal(c_unit_price) * self.quantity
+            discount_total_price = Decimal(d_unit_price) * self.quantity
+            order = Order(
+                customer=customer,
+                idempotency_key=self.idempotency_key,
+                idempotency_hash=self.payload_hash,
+                billing_address=address,
+                shipping_address=address,
+                shipping_total=self.shipping_total,
+                metadata=self.metadata,
+                items_count=1,
+                total_quantity=self.quantity,
+                gross_total=total_price,
+                discount_total=discount_total_price,
+            )
+            try:
+                with transaction.atomic():
+                    order.save()
+            except IntegrityError:
+                existing = self.get_existing()
+                if existing is None:
+                    raise
+                return CheckoutResult(existing, False)
+
+            OrderItem.objects.bulk_create([OrderItem(
+                order=order,
+                product=product,
+                variant=variant,
+                quantity=self.quantity,
+                c_unit_price=c_unit_price,
+                d_unit_price=d_unit_price,
+                total_price=total_price,
+                discount_total_price=discount_total_price,
+                product_snapshot={
+                    "product_id": product.id,
+                    "title": product.title,
+                    "variant_id": variant.id if variant else None,
+                    "attributes": getattr(variant, "attributes", None),
+                },
+            )])
+        return CheckoutResult(order, True)
+
+
+
+class OrderIdCodec:
+    # Keyed Feistel permutation of the order counter into the public AAA999999 format.
+    # It is a bijection on [0, SPACE), so distinct counters always give distinct ids,
+    # while consecutive orders still look random. ORDER_ID_KEY (or SECRET_KEY) must stay
+    # the same for the lifetime of the shop, otherwise new ids can repeat old ones.
+    LETTERS = 3
+    DIGITS = 6
+    SPACE = 26 ** LETTERS * 10 ** DIGITS
+    HALF_BITS = 18
+    HALF_MASK = (1 << HALF_BITS) - 1
+    ROUNDS = 4
+
+    def __init__(self, key=None):
+        key = key if key is not None else getattr(settings, "ORDER_ID_KEY", settings.SECRET_KEY)
+        self.key = key.encode() if isinstance(key, str) else key
+        self.round_keys = [
+            hmac.new(self.key, f"order-id:{index}".encode(), hashlib.sha256).digest() for index in range(self.ROUNDS)
+        ]
+
+    def round(self, index, value):
+        digest = hashlib.blake2b(value.to_bytes(4, "big"), key=self.round_keys[index], digest_size=4).digest()
+        return int.from_bytes(digest, "big") & self.HALF_MASK
+
+    def permute(self, value):
+        left, right = value >> self.HALF_BITS, value & self.HALF_MASK
+        for index in range(self.ROUNDS):
+            left, right = right, left ^ self.round(index, right)
+        return (left << self.HALF_BITS) | right
+
+    def unpermute(self, value):
+        left, right = value >> self.HALF_BITS, value & self.HALF_MASK
+        for index in reversed(range(self.ROUNDS)):
+            left, right = right ^ self.round(index, left), left
+        return (left << self.HALF_BITS) | right
+
+    def scramble(self, number):
+        # Cycle walking: the 36 bit permutation is applied until it lands inside SPACE
+        if not 0 <= number < self.SPACE:
+            raise ValueError(f"Order number {number} is out of range")
+        value = self.permute(number)
+        while value >= self.SPACE:
+            value = self.permute(value)
+        return value
+
+    def unscramble(self, value):
+        number = self.unpermute(value)
+        while number >= self.SPACE:
+            number = self.unpermute(number)
+        return number
+
+    def encode(self, number):
+        value = self.scramble(number)
+        letters, digits = divmod(value, 10 ** self.DIGITS)
+        prefix = ""
+        for _ in range(self.LETTERS):
+            letters, letter = divmod(letters, 26)
+            prefix = chr(ord("A") + letter) + prefix
+        return f"{prefix}{digits:0{self.DIGITS}d}"
+
+    def decode(self, order_id):
+        order_id = (order_id or "").upper()
+        prefix, digits = order_id[:self.LETTERS], order_id[self.LETTERS:]
+        if len(prefix) != self.LETTERS or not prefix.isalpha() or not prefix.isascii() or len(digits) != self.DIGITS or not digits.isdigit():
+            raise ValueError(f"'{order_id}' is not an order id")
+        letters = 0
+        for letter in prefix:
+            letters = letters * 26 + ord(letter) - ord("A")
+        return self.unscramble(letters * 10 ** self.DIGITS + int(digits))
+
+
+class OrderNumberAllocator:
+    # Hands out order numbers without reading the orders table. The class in
+    # settings.ORDER_NUMBER_ALLOCATOR is used, one instance per process.
+    default_path = "orders.utils.BlockSequenceAllocator"
+    _default = None
+    _lock = threading.Lock()
+
+    def __init__(self, codec=None):
+        self.codec = codec or OrderIdCodec()
+
+    @classmethod
+    def get_default(cls):
+        with cls._lock:
+            if cls._default is None:
+                allocator_class = import_string(getattr(settings, "ORDER_NUMBER_ALLOCATOR", cls.default_path))
+                cls._default = allocator_class()
+            return cls._default
+
+    @classmethod
+    def reset_default(cls):
+        with cls._lock:
+            cls._default = None
+
+    def next_number(self):
+        raise NotImplementedError
+
+    def next_order_id(self):
+        return self.codec.encode(self.next_number())
+
+    def discard(self):
+        pass
+
+
+class BlockSequenceAllocator(OrderNumberAllocator):
+    # Reserves a block of numbers with one INSERT into OrderNumberBlock; block n owns
+    # [n * BLOCK_STRIDE, n * BLOCK_STRIDE + block_size). Block ids come from the table's
+    # sequence, which on PostgreSQL never hands a value out twice, even after a rollback,
+    # so processes never share a number. Unused numbers in a block are skipped, and
+    # block_size can change between deploys as long as it stays within BLOCK_STRIDE.
+    BLOCK_SIZE = 100
+    BLOCK_STRIDE = 1000
+
+    def __init__(self, block_size=None, codec=None):
+        super().__init__(codec)
+        self.block_size = min(block_size or getattr(settings, "ORDER_NUMBER_BLOCK_SIZE", self.BLOCK_SIZE), self.BLOCK_STRIDE)
+        self.lock = threading.Lock()
+        self.next_value = 0
+        self.block_end = 0
+
+    def reserve_block(self):
+        block = OrderNumberBlock.objects.create(
+            reserved_by=f"{socket.gethostname()}:{os.getpid()}"[:100], block_size=self.block_size,
+        )
+        start = block.id * self.BLOCK_STRIDE
+        return start, start + self.block_size
+
+    def next_number(self):
+        with self.lock:
+            if self.next_value >= self.block_end:
+                self.next_value, self.block_end = self.reserve_block()
+            number = self.next_value
+            self.next_value += 1
+            return number
+
+    def discard(self):
+        # Backends that reuse rolled back ids (SQLite, MySQL) can hand a block out twice;
+        # Order.save drops the block on a duplicate order_id and takes a fresh one.
+        with self.lock:
+            self.next_value = self.block_end = 0
@@ -37,3 +37,9 @@ class LOGISTIC_SERVICE_PROVIDER(models.TextChoices):
     STEADFAST = "STEADFAST"
 
 
+
+class BOOKING_JOB_STATUS(models.TextChoices):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 18:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The default cache is the database backend; deploys that only run `migrate` still get
+    # its table. createcachetable skips other backends and tables that already exist.
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings_app', '0005_mainslider'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]